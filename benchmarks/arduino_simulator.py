@@ -0,0 +1,282 @@
+# arduino_simulator.py
+# 虚拟 Arduino：打开一对伪终端 (pty)，按 arduinoCODE/sketch_mar7a/sketch_mar7a.ino 的串口协议应答，
+# 用于在没有硬件的开发机/CI 上测试和压测 dht_and_radar_monitor.py、main_app.py (雷达/arduino_comm.py)。
+# 仅支持 Linux (依赖 pty 的 POLLHUP 检测串口打开/关闭)。
+#
+# 用法: python benchmarks/arduino_simulator.py [--link /tmp/ttyVARDUINO] [--time-scale 10] [--autostart]
+#       然后把打印出的设备路径 (或 --link 指定的路径) 作为串口号交给被测程序。
+#
+# 支持的命令 (与固件一致):
+#   command=arduino1..4     开灯/关灯/读温度/读湿度
+#   RADAR_ON / RADAR_OFF    开始/停止扫描
+#   ALARM n                 报警级别 0-3
+#   A<n> a<n> S<n> D<n>     最大角度/最小角度/步进/延迟 (应答 OK <cmd> 或 ERR <cmd>)
+#   PING?                   应答 PONG!
+
+import argparse
+import math
+import os
+import random
+import select
+import sys
+import time
+import tty
+
+RADAR_MAX_DISTANCE_CM = 200
+RADAR_INVALID_DISTANCE_MARKER = RADAR_MAX_DISTANCE_CM + 1.0
+ALARM_OFF, ALARM_FAST = 0, 3
+IDLE_LOOP_DELAY_S = 0.005  # 固件在雷达关闭时每次循环 delay(5)
+
+
+class VirtualArduino:
+    """固件状态机：process_command() 处理一条命令并返回应答行，next_radar_step() 产生下一条扫描数据。"""
+
+    def __init__(self, seed=0, invalid_rate=0.05, dht_fail_rate=0.0, scene=None,
+                 scan_step=5, scan_delay_ms=50, autostart=False):
+        self.rng = random.Random(seed)
+        self.invalid_rate = invalid_rate
+        self.dht_fail_rate = dht_fail_rate
+        # 场景: [(中心角度, 半宽度, 距离)]，其余方向是 150 cm 处的墙
+        self.scene = scene if scene is not None else [(40, 8, 35.0), (95, 5, 60.0), (150, 12, 90.0)]
+        self.initial_scan_step = scan_step
+        self.initial_scan_delay_ms = scan_delay_ms
+        self.autostart = autostart
+        self.temperature = 24.0
+        self.humidity = 55.0
+        self.commands_received = 0
+        self.reset()
+
+    def reset(self):
+        """相当于打开串口时 DTR 触发的板子复位：参数和状态回到初始值。"""
+        self.radar_min_angle = 0
+        self.radar_max_angle = 180
+        self.radar_scan_step = self.initial_scan_step
+        self.radar_scan_delay_ms = self.initial_scan_delay_ms
+        self.current_servo_pos = 0
+        self.radar_scanning_forward = True
+        self.is_radar_active = self.autostart
+        self.current_alarm_level = ALARM_OFF
+        self.led_on = False
+
+    # --- 命令处理 (processReceivedCommand) ---
+    def process_command(self, command):
+        command = command.strip()
+        if not command:
+            return []
+        self.commands_received += 1
+        if command.startswith("command=arduino"):
+            if command.startswith("command=arduino1"):
+                self.led_on = True
+                return ["command=arduino1;light=on;"]
+            if command.startswith("command=arduino2"):
+                self.led_on = False
+                return ["command=arduino2;light=off;"]
+            if command.startswith("command=arduino3"):
+                return [self._read_temperature()]
+            if command.startswith("command=arduino4"):
+                return [self._read_humidity()]
+            return ["ERROR=Unknown arduino command;"]
+        if command.upper() == "RADAR_ON":
+            if self.is_radar_active:
+                return ["INFO RADAR_ON (already on)"]
+            self.is_radar_active = True
+            return ["OK RADAR_ON"]
+        if command.upper() == "RADAR_OFF":
+            if not self.is_radar_active:
+                return ["INFO RADAR_OFF (already off)"]
+            self.is_radar_active = False
+            self.current_alarm_level = ALARM_OFF
+            return ["OK RADAR_OFF"]
+        if command.startswith("ALARM "):
+            try:
+                level = int(command[6:].strip() or 0)
+            except ValueError:
+                level = 0  # String.toInt() 对非数字返回 0
+            if not ALARM_OFF <= level <= ALARM_FAST:
+                return ["ERROR Invalid ALARM level"]
+            if level == self.current_alarm_level:
+                return []  # 级别未变化时固件不应答
+            self.current_alarm_level = level
+            return [f"OK ALARM level set to {level}"]
+        if len(command) > 1 and command[0].isalpha() and (command[1].isdigit() or command[1] == '-'):
+            return [self._process_radar_parameter(command)]
+        if command.upper() == "PING?":
+            return ["PONG!"]
+        return [f"ERROR=Unknown command format:{command}"]
+
+    def _process_radar_parameter(self, command):
+        """processRadarParameterCommand。
+        注意：固件用 toupper(type) 做 switch，'a' 实际会落入 'A' 分支；这里按协议本意区分大小写。"""
+        kind = command[0]
+        try:
+            value = int(command[1:])
+        except ValueError:
+            value = 0
+        success = False
+        if kind == 'A' and 0 <= value <= 180 and value > self.radar_min_angle:
+            self.radar_max_angle, success = value, True
+        elif kind == 'a' and 0 <= value <= 180 and value < self.radar_max_angle:
+            self.radar_min_angle, success = value, True
+        elif kind.upper() == 'S' and 0 < value <= 30:
+            self.radar_scan_step, success = value, True
+        elif kind.upper() == 'D' and 10 <= value <= 200:
+            self.radar_scan_delay_ms, success = value, True
+        return f"{'OK' if success else 'ERR'} {command}"
+
+    def _read_temperature(self):
+        if self.rng.random() < self.dht_fail_rate:
+            return "command=arduino3;error=Failed to read temperature;"
+        self.temperature = min(45.0, max(5.0, self.temperature + self.rng.gauss(0, 0.1)))
+        return f"command=arduino3;temp={self.temperature:.1f};"
+
+    def _read_humidity(self):
+        if self.rng.random() < self.dht_fail_rate:
+            return "command=arduino4;error=Failed to read humidity;"
+        self.humidity = min(95.0, max(10.0, self.humidity + self.rng.gauss(0, 0.3)))
+        return f"command=arduino4;humi={self.humidity:.1f};"
+
+    # --- 雷达扫描 (performRadarScanStep) ---
+    def next_radar_step(self):
+        """前进一步，返回 (舵机移动后应等待的秒数, 数据行)。"""
+        if self.radar_scanning_forward:
+            next_pos = self.current_servo_pos + self.radar_scan_step
+            if next_pos >= self.radar_max_angle:
+                next_pos, self.radar_scanning_forward = self.radar_max_angle, False
+        else:
+            next_pos = self.current_servo_pos - self.radar_scan_step
+            if next_pos <= self.radar_min_angle:
+                next_pos, self.radar_scanning_forward = self.radar_min_angle, True
+        if next_pos != self.current_servo_pos:
+            self.current_servo_pos = next_pos
+            wait_s = self.radar_scan_delay_ms / 1000.0
+        else:
+            wait_s = 0.001
+        return wait_s, f"{self.current_servo_pos},{self._measure_distance(self.current_servo_pos):.2f}"
+
+    def _measure_distance(self, angle):
+        if self.rng.random() < self.invalid_rate:
+            return RADAR_INVALID_DISTANCE_MARKER
+        distance = 150.0
+        for center, half_width, obj_distance in self.scene:
+            if abs(angle - center) <= half_width:
+                distance = min(distance, obj_distance)
+        distance += self.rng.gauss(0, 0.8)
+        return distance if 0 < distance <= RADAR_MAX_DISTANCE_CM else RADAR_INVALID_DISTANCE_MARKER
+
+
+def open_pty(link=None):
+    """创建 pty 对，返回 (master_fd, 设备路径)。可选地创建一个指向从设备的符号链接。
+    从设备端立即关闭，这样可以通过 POLLHUP 判断被测程序是否打开了串口。"""
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+    os.close(slave)
+    if link:
+        if os.path.islink(link):
+            os.remove(link)
+        os.symlink(path, link)
+        path = link
+    return master, path
+
+
+def run(device, master, args):
+    """
+    主循环：读取命令、按 (缩放后的) 扫描延迟输出雷达数据，直到被中断或达到 --duration。
+    被测程序每次打开串口都相当于一次复位 (与 Arduino 的 DTR 自动复位一致)，会重新输出启动信息。
+    """
+    def write_lines(lines):
+        if lines:
+            os.write(master, ''.join(f"{line}\r\n" for line in lines).encode())  # Serial.println 输出 \r\n
+        return len(lines)
+
+    poller = select.poll()
+    poller.register(master, select.POLLIN)
+    connected = False
+    lines_sent = 0
+    pending = b''
+    next_radar_time = time.perf_counter()
+    start = last_report = time.perf_counter()
+    end = start + args.duration if args.duration > 0 else math.inf
+    while time.perf_counter() < end:
+        now = time.perf_counter()
+        if connected and device.is_radar_active:
+            timeout = max(0.0, next_radar_time - now)
+        else:
+            timeout = IDLE_LOOP_DELAY_S
+        events = poller.poll(timeout * 1000.0)
+        if any(event & select.POLLHUP for _, event in events):
+            if connected:
+                print("[sim] 串口已被关闭，等待重新打开", file=sys.stderr)
+                connected = False
+            time.sleep(0.05)
+            continue
+        if not connected:
+            connected = True
+            device.reset()
+            pending = b''
+            lines_sent += write_lines(["INFO: Arduino Ready.", "Radar Start"])
+            next_radar_time = time.perf_counter()
+            print("[sim] 串口已打开 (复位)", file=sys.stderr)
+        if any(event & select.POLLIN for _, event in events):
+            try:
+                pending += os.read(master, 4096)
+            except OSError:  # 从设备全部关闭时 Linux 返回 EIO
+                continue
+            *commands, pending = pending.split(b'\n')
+            for command in commands:
+                was_active = device.is_radar_active
+                lines_sent += write_lines(device.process_command(command.decode('utf-8', errors='ignore')))
+                if device.is_radar_active and not was_active:
+                    next_radar_time = time.perf_counter()
+        now = time.perf_counter()
+        if device.is_radar_active and now >= next_radar_time:
+            # 落后太多时按批输出，直到追上时间表 (不限速模式下每次输出一批)
+            batch = []
+            while now >= next_radar_time and len(batch) < args.max_burst:
+                wait_s, line = device.next_radar_step()
+                batch.append(line)
+                next_radar_time += wait_s / args.time_scale if args.time_scale > 0 else 0.0
+            if now - next_radar_time > 1.0:  # 输出跟不上时不再补发积压
+                next_radar_time = now
+            lines_sent += write_lines(batch)
+        if args.report_interval > 0 and now - last_report >= args.report_interval:
+            elapsed = now - start
+            print(f"[sim] {elapsed:7.1f}s 已发送 {lines_sent} 行 ({lines_sent / elapsed:.0f} 行/秒), "
+                  f"收到命令 {device.commands_received}, 雷达 {'开' if device.is_radar_active else '关'}, "
+                  f"报警 {device.current_alarm_level}", file=sys.stderr)
+            last_report = now
+    return lines_sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="虚拟 Arduino (pty)，模拟 sketch_mar7a 固件的串口协议")
+    parser.add_argument('--link', help="创建指向虚拟串口的符号链接，例如 /tmp/ttyVARDUINO")
+    parser.add_argument('--autostart', action='store_true', help="启动后立即开始雷达扫描 (不等待 RADAR_ON)")
+    parser.add_argument('--step', type=int, default=5, help="初始扫描步进 (度)")
+    parser.add_argument('--delay-ms', type=int, default=50, help="初始扫描延迟 (毫秒)")
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help="时间加速倍数 (10 表示比硬件快 10 倍)；0 表示不限速，尽可能快地输出")
+    parser.add_argument('--max-burst', type=int, default=256, help="每次最多连续输出的雷达行数")
+    parser.add_argument('--invalid-rate', type=float, default=0.05, help="无效距离 (201) 的比例")
+    parser.add_argument('--dht-fail-rate', type=float, default=0.0, help="温湿度读取失败的比例")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--duration', type=float, default=0.0, help="运行秒数，0 表示一直运行")
+    parser.add_argument('--report-interval', type=float, default=5.0, help="统计输出间隔 (秒)，0 表示不输出")
+    args = parser.parse_args()
+
+    device = VirtualArduino(seed=args.seed, invalid_rate=args.invalid_rate, dht_fail_rate=args.dht_fail_rate,
+                            scan_step=args.step, scan_delay_ms=args.delay_ms, autostart=args.autostart)
+    master, path = open_pty(args.link)
+    print(f"虚拟 Arduino 已就绪: {path}", flush=True)
+    try:
+        run(device, master, args)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(master)
+        if args.link and os.path.islink(args.link):
+            os.remove(args.link)
+
+
+if __name__ == '__main__':
+    main()
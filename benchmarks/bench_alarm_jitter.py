@@ -0,0 +1,121 @@
+# bench_alarm_jitter.py
+# 对比距离报警逻辑在抖动输入下发送的 ALARM 命令数：
+#   legacy — 旧实现，逐样本按 30/60/100 cm 阈值计算级别，变化就发命令
+#   engine — monitor_core.AlarmEngine (完整扫描内的最近距离 + 滞回 + 驻留时间)，样本带舵机角度
+# 使用模拟时钟按硬件节奏 (默认每 50 ms 一个样本) 生成样本，不需要串口。
+# 用法: python benchmarks/bench_alarm_jitter.py [--seconds 120] [--sample-ms 50] [--noise 2.0]
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitor_core import AlarmEngine, alarm_level_for_distance  # noqa: E402
+
+
+def jitter_at(center):
+    """目标停在 center cm 附近，距离测量带高斯噪声，偶有无效读数。"""
+    def scenario(rng, t, angle, noise, invalid_rate):
+        if rng.random() < invalid_rate:
+            return None
+        return max(1.0, rng.gauss(center, noise))
+    return scenario
+
+
+def sweep_with_object(rng, t, angle, noise, invalid_rate):
+    """扫描中: 40° 附近 (±8°) 有一个 35 cm 的目标，其他方向超出量程。"""
+    if abs(angle - 40) > 8 or rng.random() < invalid_rate:
+        return None
+    return max(1.0, rng.gauss(35.0, noise))
+
+
+def sweep_with_two_objects(rng, t, angle, noise, invalid_rate):
+    """扫描中: 40° 附近有 35 cm 的目标，140° 附近 (±10°) 有 80 cm 的目标。报警级别应一直保持 3。"""
+    if rng.random() < invalid_rate:
+        return None
+    if abs(angle - 40) <= 8:
+        return max(1.0, rng.gauss(35.0, noise))
+    if abs(angle - 140) <= 10:
+        return max(1.0, rng.gauss(80.0, noise))
+    return None
+
+
+def sweep_object_leaves_and_returns(rng, t, angle, noise, invalid_rate):
+    """扫描中: 40° 附近的 35 cm 目标每 30 秒出现 20 秒、离开 10 秒，每个周期报警应只升降各一次。"""
+    if t % 30.0 >= 20.0:
+        return None
+    return sweep_with_object(rng, t, angle, noise, invalid_rate)
+
+
+def approach_and_leave(rng, t, angle, noise, invalid_rate):
+    """目标从 120 cm 匀速靠近到 10 cm 再离开 (每 60 秒一个来回)，经过每个阈值各一次。"""
+    phase = (t % 60.0) / 60.0
+    center = 120.0 - 220.0 * phase if phase < 0.5 else 10.0 + 220.0 * (phase - 0.5)
+    if rng.random() < invalid_rate:
+        return None
+    return max(1.0, rng.gauss(center, noise))
+
+
+SCENARIOS = {
+    'jitter@30cm': jitter_at(30.0),
+    'jitter@60cm': jitter_at(60.0),
+    'jitter@100cm': jitter_at(100.0),
+    'sweep+object': sweep_with_object,
+    'sweep+2 objects': sweep_with_two_objects,
+    'sweep+leave/return': sweep_object_leaves_and_returns,
+    'approach/leave': approach_and_leave,
+}
+
+
+def run(scenario, args):
+    rng = random.Random(args.seed)
+    engine = AlarmEngine(hysteresis=args.hysteresis, dwell_s=args.dwell, window_s=args.window,
+                         max_sweep_s=args.max_sweep)
+    legacy_level = engine_level = 0
+    legacy_commands = engine_commands = 0
+    samples = int(args.seconds * 1000 / args.sample_ms)
+    angle, step = 0, 5
+    for i in range(samples):
+        t = i * args.sample_ms / 1000.0
+        dist = scenario(rng, t, angle, args.noise, args.invalid_rate)
+        level = alarm_level_for_distance(dist)
+        if level != legacy_level:
+            legacy_level = level
+            legacy_commands += 1
+        level = engine.update(dist, now=t, angle=None if args.no_angle else angle)
+        if level != engine_level:
+            engine_level = level
+            engine_commands += 1
+        # 与固件相同的往复扫描
+        if not 0 <= angle + step <= 180:
+            step = -step
+        angle += step
+    return legacy_commands, engine_commands
+
+
+def main():
+    parser = argparse.ArgumentParser(description="报警逻辑在抖动输入下的 ALARM 命令数对比")
+    parser.add_argument('--seconds', type=float, default=120.0, help="模拟时长 (秒)")
+    parser.add_argument('--sample-ms', type=float, default=50.0, help="样本间隔 (毫秒)，硬件默认 50")
+    parser.add_argument('--noise', type=float, default=2.0, help="距离噪声标准差 (cm)")
+    parser.add_argument('--invalid-rate', type=float, default=0.05, help="无效读数比例")
+    parser.add_argument('--hysteresis', type=float, default=5.0, help="AlarmEngine 滞回带 (cm)")
+    parser.add_argument('--dwell', type=float, default=0.5, help="AlarmEngine 降级驻留时间 (秒)")
+    parser.add_argument('--window', type=float, default=2.0, help="AlarmEngine 不带角度时的最近距离窗口 (秒)")
+    parser.add_argument('--max-sweep', type=float, default=5.0, help="AlarmEngine 上一次扫描结果的最长保留时间 (秒)")
+    parser.add_argument('--no-angle', action='store_true', help="不向 AlarmEngine 传角度，测试按时间窗口的退路")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    minutes = args.seconds / 60.0
+    print(f"{'场景':20} {'legacy 命令/分钟':>16} {'engine 命令/分钟':>16} {'减少':>8}")
+    for name, scenario in SCENARIOS.items():
+        legacy, engine = run(scenario, args)
+        reduction = 1.0 - engine / legacy if legacy else 0.0
+        print(f"{name:20} {legacy / minutes:16.1f} {engine / minutes:16.1f} {reduction:8.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# bench_anomaly_flatline.py
+# 检查服务器温湿度卡死 (flatline) 检测在 DHT11 这类整数步进传感器上的误报：
+#   legacy  — 旧规则，连续 60 个完全相同的读数判定为卡死
+#   默认    — 服务器当前配置 (ANOMALY_FLATLINE_S，DHT11 默认不启用)
+#   启用    — 按时间判定，读数不变超过 --flatline-s 秒 (容差 --tolerance)
+# 正常传感器在 "默认" 和 "启用" 下都不应出现卡死事件，真正卡死的传感器在 "启用" 下应恰好报告一次；
+# 不满足时以非零状态退出。不需要数据库和网络。
+# 用法: python benchmarks/bench_anomaly_flatline.py [--hours 24] [--interval 1.0] [--flatline-s 7200]
+
+import argparse
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import 服务器 as server  # noqa: E402
+
+LEGACY_FLATLINE_SAMPLES = 60
+
+
+def dht11_series(center, daily_swing, noise, seconds, interval, seed, stuck_from=None):
+    """按 DHT11 的整数步进生成 (时间戳, 读数)：缓慢的日变化 + 测量噪声。stuck_from 之后读数冻结。"""
+    rng = random.Random(seed)
+    samples, t, stuck_value = [], 0.0, None
+    while t < seconds:
+        if stuck_from is not None and t >= stuck_from:
+            if stuck_value is None:
+                stuck_value = samples[-1][1]
+            value = stuck_value
+        else:
+            value = float(round(center + daily_swing * math.sin(2 * math.pi * t / 86400.0) + rng.gauss(0.0, noise)))
+        samples.append((t, value))
+        t += interval
+    return samples
+
+
+def legacy_flatline_events(samples):
+    """旧规则：连续 LEGACY_FLATLINE_SAMPLES 个相同读数记一次卡死。"""
+    events, last, repeat = 0, None, 0
+    for _, value in samples:
+        repeat = repeat + 1 if value == last else 1
+        last = value
+        if repeat == LEGACY_FLATLINE_SAMPLES:
+            events += 1
+    return events
+
+
+def count_events(samples, sensor_type, flatline_s, tolerance):
+    """返回 (新的卡死事件数, 新的尖峰事件数)。"""
+    detector = server.OnlineAnomalyDetector(server.ANOMALY_MIN_STD.get(sensor_type, 0.5),
+                                            flatline_s=flatline_s, flatline_tolerance=tolerance)
+    events = {'flatline': 0, 'spike': 0}
+    for t, value in samples:
+        flag, _, new = detector.update(value, t)
+        if new:
+            events[flag] += 1
+    return events['flatline'], events['spike']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DHT11 整数步进读数下的卡死检测误报检查")
+    parser.add_argument('--hours', type=float, default=24.0, help="每个序列的时长 (小时)")
+    parser.add_argument('--interval', type=float, default=1.0, help="采样间隔 (秒)，GUI 数据视图默认 1 秒")
+    parser.add_argument('--flatline-s', type=float, default=7200.0, help="\"启用\" 列使用的卡死判定时长 (秒)")
+    parser.add_argument('--tolerance', type=float, default=0.0, help="\"启用\" 列使用的容差")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    seconds = args.hours * 3600.0
+    # (名称, 传感器, 序列, 是否真的卡死)
+    scenarios = [
+        ('DHT11 温度 稳定房间', 'temp', dht11_series(22.6, 0.4, 0.15, seconds, args.interval, args.seed), False),
+        ('DHT11 湿度 稳定房间', 'humi', dht11_series(45.4, 2.0, 0.3, seconds, args.interval, args.seed + 1), False),
+        ('DHT11 温度 中途卡死', 'temp', dht11_series(22.6, 2.0, 0.3, seconds, args.interval, args.seed + 2,
+                                                 stuck_from=seconds / 2), True),
+    ]
+    enabled = f"启用 {args.flatline_s:.0f}s"
+    print(f"{'序列':18} {'legacy 卡死':>10} {'默认 卡死':>10} {enabled + ' 卡死':>16} {'尖峰':>6}")
+    failures = []
+    for name, sensor_type, samples, stuck in scenarios:
+        legacy = legacy_flatline_events(samples)
+        default, spikes = count_events(samples, sensor_type, server.ANOMALY_FLATLINE_S.get(sensor_type),
+                                       server.ANOMALY_FLATLINE_TOLERANCE.get(sensor_type, 0.0))
+        opted_in, _ = count_events(samples, sensor_type, args.flatline_s, args.tolerance)
+        print(f"{name:18} {legacy:10d} {default:10d} {opted_in:16d} {spikes:6d}")
+        if not stuck and (default or opted_in):
+            failures.append(f"{name}: 正常传感器被判定为卡死")
+        if stuck and opted_in != 1:
+            failures.append(f"{name}: 启用后应报告 1 次卡死，实际 {opted_in} 次")
+    for failure in failures:
+        print(f"失败 - {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
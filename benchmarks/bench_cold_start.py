@@ -0,0 +1,83 @@
+# bench_cold_start.py
+# 测量监控 GUI 的冷启动：
+#   1. python -X importtime 导入 dht_and_radar_monitor 的总耗时和最重的模块 (不需要显示器)
+#   2. 从启动解释器到主窗口第一次绘制完成的墙钟时间，分别在图片缓存为空 (首次启动) 和已生成 (再次启动) 时测量
+#      (需要图形显示环境)
+# 每次都在新的子进程和临时工作目录中运行。用法: python benchmarks/bench_cold_start.py [--runs 5] [--no-window]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_WINDOW_SCRIPT = """
+import os, sys, time
+import tkinter as tk
+sys.path.insert(0, {repo!r})
+import dht_and_radar_monitor as monitor
+monitor.IMAGE_CACHE_DIR = {cache_dir!r}
+root = tk.Tk()
+app = monitor.ArduinoMonitorApp(root)
+root.update()  # 主窗口第一次绘制完成
+print(time.time(), flush=True)
+os._exit(0)  # 不做正常关闭，避免把关闭耗时算进来
+"""
+
+
+def import_profile(top):
+    """用 -X importtime 导入 dht_and_radar_monitor，返回 (总耗时 ms, [(累计 ms, 顶层模块名)], 所有导入的模块名)。"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import dht_and_radar_monitor'],
+                            cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((int(cumulative) / 1000.0, name.strip()))
+    total = next(ms for ms, name in entries if name == 'dht_and_radar_monitor')
+    top_level = [(ms, name) for ms, name in entries if '.' not in name and name != 'dht_and_radar_monitor']
+    return total, sorted(top_level, reverse=True)[:top], {name for _, name in entries}
+
+
+def time_to_first_window(cache_dir):
+    """启动一个新进程直到主窗口绘制完成，返回墙钟时间 (ms)。"""
+    with tempfile.TemporaryDirectory(prefix='cold_start_') as workdir:
+        start = time.time()
+        script = FIRST_WINDOW_SCRIPT.format(repo=REPO_ROOT, cache_dir=cache_dir)
+        result = subprocess.run([sys.executable, '-c', script],
+                                cwd=workdir, capture_output=True, text=True, timeout=60)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "子进程失败")
+        return (float(result.stdout.strip().splitlines()[-1]) - start) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="监控 GUI 冷启动耗时 (导入 + 首个窗口)")
+    parser.add_argument('--runs', type=int, default=5, help="缓存已生成时的重复启动次数")
+    parser.add_argument('--top', type=int, default=8, help="列出最重的顶层模块数")
+    parser.add_argument('--no-window', action='store_true', help="只做 -X importtime 分析 (没有显示器时)")
+    args = parser.parse_args()
+
+    total, heaviest, imported = import_profile(args.top)
+    print(f"导入 dht_and_radar_monitor: {total:8.1f} ms")
+    for ms, name in heaviest:
+        print(f"  {name:30} {ms:8.1f} ms")
+    for name in ('numpy', 'matplotlib', 'PIL'):
+        print(f"  启动时导入 {name}: {'是' if name in imported else '否'}")
+
+    if args.no_window:
+        return
+    with tempfile.TemporaryDirectory(prefix='image_cache_') as cache_dir:
+        cold_ms = time_to_first_window(cache_dir)
+        warm = [time_to_first_window(cache_dir) for _ in range(args.runs)]
+    print(f"首个窗口 (图片缓存为空): {cold_ms:8.1f} ms")
+    print(f"首个窗口 (图片缓存命中): 中位数 {statistics.median(warm):8.1f} ms, 最小 {min(warm):8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+# bench_data_processor.py
+# 对比雷达 DataProcessor 的旧实现 (legacy_data_processor.py) 与当前实现 (雷达/data_processor.py)：
+#   samples — process_new_data 的吞吐量 (样本/秒)，往复扫描 0-180°，带无效读数
+#   batch   — 每批 --batch-size 个样本: 旧实现逐个处理 vs 当前实现 process_batch 一次处理
+#   frame   — 每帧绘图准备 (update_fade_effect + get_plot_data_fade) 的耗时，每帧之间处理若干新样本
+#   objects — 一次完整扫描后的对象分割耗时 (detect_objects)，以及相邻两个不同距离物体是否被分开
+# 不需要串口和图形界面。用法: python benchmarks/bench_data_processor.py [--samples 200000] [--frames 20000]
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from 雷达 import config  # noqa: E402
+from 雷达.data_processor import DataProcessor  # noqa: E402
+from legacy_data_processor import LegacyDataProcessor  # noqa: E402  (与本脚本同目录)
+
+IMPLEMENTATIONS = {'legacy': LegacyDataProcessor, 'current': DataProcessor}
+
+
+def generate_samples(count, seed=0, invalid_rate=0.05, step=1):
+    """按固件的往复扫描生成 (角度, 原始距离)，场景中有几个物体，其余方向超出量程。"""
+    rng = random.Random(seed)
+    scene = [(40, 8, 35.0), (95, 5, 60.0), (150, 12, 90.0)]
+    samples, angle = [], 0
+    for _ in range(count):
+        dist = config.ARDUINO_INVALID_DIST_MARKER
+        if rng.random() >= invalid_rate:
+            for center, half_width, distance in scene:
+                if abs(angle - center) <= half_width:
+                    dist = max(1.0, rng.gauss(distance, 1.5))
+                    break
+        samples.append((angle, dist))
+        if not 0 <= angle + step <= 180:
+            step = -step
+        angle += step
+    return samples
+
+
+def bench_samples(cls, samples):
+    processor = cls()
+    start = time.perf_counter()
+    for angle, dist in samples:
+        processor.process_new_data(angle, dist)
+    return len(samples) / (time.perf_counter() - start)
+
+
+def bench_batch(samples, batch_size):
+    """返回 {名称: 样本/秒}。旧实现没有批处理接口，逐个调用 process_new_data。"""
+    batches = [samples[i:i + batch_size] for i in range(0, len(samples) - batch_size + 1, batch_size)]
+    columns = [([a for a, _ in batch], [d for _, d in batch]) for batch in batches]
+    total = len(batches) * batch_size
+    rates = {}
+    processor = LegacyDataProcessor()
+    start = time.perf_counter()
+    for batch in batches:
+        for angle, dist in batch:
+            processor.process_new_data(angle, dist)
+    rates['legacy (逐个)'] = total / (time.perf_counter() - start)
+    processor = DataProcessor()
+    start = time.perf_counter()
+    for angles, dists in columns:
+        processor.process_batch(angles, dists)
+    rates['current (批)'] = total / (time.perf_counter() - start)
+    return rates
+
+
+def bench_frame(cls, samples, frames, samples_per_frame):
+    """先完整扫描一遍让所有角度都有活动点，再逐帧: 处理新样本 (不计时) + 计时的绘图准备。"""
+    processor = cls()
+    for angle, dist in samples[:362]:
+        processor.process_new_data(angle, dist)
+    durations_us = []
+    position = 362
+    for _ in range(frames):
+        for _ in range(samples_per_frame):
+            angle, dist = samples[position % len(samples)]
+            processor.process_new_data(angle, dist)
+            position += 1
+        start = time.perf_counter()
+        processor.update_fade_effect()
+        processor.get_plot_data_fade()
+        durations_us.append((time.perf_counter() - start) * 1e6)
+    durations_us.sort()
+    return statistics.mean(durations_us), durations_us[int(0.99 * (len(durations_us) - 1))]
+
+
+def bench_objects(samples, repeats):
+    """返回 {名称: (每次分割耗时 us, 模拟场景对象数, 相邻物体场景对象数)}。"""
+    angles_rad = np.arange(181) * (np.pi / 180.0)
+    adjacent = np.full(181, np.nan)
+    adjacent[30:40], adjacent[40:50] = 40.0, 80.0  # 30-39° 处 40 cm，紧挨着 40-49° 处 80 cm
+    results = {}
+    for name, cls in IMPLEMENTATIONS.items():
+        processor = cls()
+        for angle, dist in samples[:362]:
+            processor.process_new_data(angle, dist)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            objects = processor.detect_objects(angles_rad)
+        elapsed_us = (time.perf_counter() - start) / repeats * 1e6
+        scene_count = len(objects) if isinstance(objects, list) else objects.count
+        processor.filtered_dists = adjacent
+        objects = processor.detect_objects(angles_rad)
+        adjacent_count = len(objects) if isinstance(objects, list) else objects.count
+        results[name] = (elapsed_us, scene_count, adjacent_count)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="雷达 DataProcessor 新旧实现的吞吐量和帧准备耗时对比")
+    parser.add_argument('--tests', nargs='+', choices=('samples', 'batch', 'frame', 'objects'),
+                        default=['samples', 'batch', 'frame', 'objects'])
+    parser.add_argument('--samples', type=int, default=200000, help="吞吐量测试的样本数")
+    parser.add_argument('--batch-size', type=int, default=1000, help="批处理测试每批的样本数")
+    parser.add_argument('--frames', type=int, default=20000, help="帧准备测试的帧数")
+    parser.add_argument('--samples-per-frame', type=int, default=1,
+                        help="每帧之间处理的样本数 (硬件 50 ms/步、20 fps 时约为 1)")
+    parser.add_argument('--object-repeats', type=int, default=20000, help="对象分割测试的重复次数")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    samples = generate_samples(max(args.samples, 1000), seed=args.seed)
+    results = {}
+    if 'samples' in args.tests:
+        print(f"{'实现':10} {'样本/秒':>14}")
+        for name, cls in IMPLEMENTATIONS.items():
+            results[('samples', name)] = rate = bench_samples(cls, samples[:args.samples])
+            print(f"{name:10} {rate:14,.0f}")
+        print(f"加速比: {results[('samples', 'current')] / results[('samples', 'legacy')]:.2f}x\n")
+    if 'batch' in args.tests:
+        rates = bench_batch(samples[:args.samples], args.batch_size)
+        print(f"{'每批 ' + str(args.batch_size) + ' 个样本':16} {'样本/秒':>14}")
+        for name, rate in rates.items():
+            print(f"{name:16} {rate:14,.0f}")
+        legacy_rate, batch_rate = rates.values()
+        print(f"加速比: {batch_rate / legacy_rate:.2f}x\n")
+    if 'frame' in args.tests:
+        print(f"{'实现':10} {'帧准备 平均 us':>16} {'p99 us':>10}")
+        for name, cls in IMPLEMENTATIONS.items():
+            mean_us, p99_us = bench_frame(cls, samples, args.frames, args.samples_per_frame)
+            results[('frame', name)] = mean_us
+            print(f"{name:10} {mean_us:16.1f} {p99_us:10.1f}")
+        print(f"加速比: {results[('frame', 'legacy')] / results[('frame', 'current')]:.2f}x\n")
+    if 'objects' in args.tests:
+        objects = bench_objects(samples, args.object_repeats)
+        print(f"{'实现':10} {'分割 us':>10} {'模拟场景对象数':>14} {'相邻物体场景对象数':>18}")
+        for name, (elapsed_us, scene_count, adjacent_count) in objects.items():
+            print(f"{name:10} {elapsed_us:10.1f} {scene_count:14d} {adjacent_count:18d}")
+        print(f"加速比: {objects['legacy'][0] / objects['current'][0]:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
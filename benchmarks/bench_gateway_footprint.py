@@ -0,0 +1,119 @@
+# bench_gateway_footprint.py
+# 对比 GUI 模式 (dht_and_radar_monitor.py) 与无界面网关 (headless_gateway.py) 的 CPU 占用和常驻内存 (RSS)。
+# 两种模式都连接 arduino_simulator.py 提供的虚拟串口，在各自的临时目录中运行 (数据库互不影响)，
+# 预热后从 /proc/<pid> 采样。仅支持 Linux；GUI 模式需要图形显示环境和 Pillow。
+#
+# 用法: python benchmarks/bench_gateway_footprint.py [--modes headless gui] [--duration 30] [--time-scale 1]
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIMULATOR = os.path.join(REPO_ROOT, 'benchmarks', 'arduino_simulator.py')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+def read_cpu_seconds(pid):
+    """进程累计的用户态 + 内核态 CPU 时间 (秒)。"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime, stime
+
+
+def read_memory_kb(pid):
+    """返回 (当前 RSS, 峰值 RSS)，单位 KB。"""
+    values = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('VmRSS', 'VmHWM'):
+                values[key] = int(rest.split()[0])
+    return values.get('VmRSS', 0), values.get('VmHWM', 0)
+
+
+def build_command(mode, port, args):
+    if mode == 'headless':
+        command = [sys.executable, os.path.join(REPO_ROOT, 'headless_gateway.py'), '--port', port,
+                   '--stats-interval', str(args.duration * 10)]
+        if args.server:
+            host, _, server_port = args.server.rpartition(':')
+            command += ['--server-ip', host, '--server-port', server_port]
+        else:
+            command.append('--no-socket')
+        return command
+    # GUI 通过环境变量 ARDUINO_PORT 使用指定串口；上传目标由 dht_and_radar_monitor.py 中的常量决定
+    return [sys.executable, os.path.join(REPO_ROOT, 'dht_and_radar_monitor.py')]
+
+
+def measure(mode, args):
+    with tempfile.TemporaryDirectory(prefix=f'footprint_{mode}_') as workdir:
+        link = os.path.join(workdir, 'ttyVARDUINO')
+        sim_command = [sys.executable, SIMULATOR, '--link', link, '--time-scale', str(args.time_scale),
+                       '--report-interval', '0']
+        if args.autostart:
+            sim_command.append('--autostart')
+        simulator = subprocess.Popen(sim_command, cwd=workdir,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        target = None
+        try:
+            deadline = time.monotonic() + 5.0
+            while not os.path.exists(link) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            env = dict(os.environ, ARDUINO_PORT=link)
+            target = subprocess.Popen(build_command(mode, link, args), cwd=workdir, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            time.sleep(args.warmup)
+            if target.poll() is not None:
+                print(f"[{mode:8}] 进程已退出 (返回码 {target.returncode})，无法测量")
+                return None
+            cpu_start, wall_start = read_cpu_seconds(target.pid), time.monotonic()
+            rss_samples = []
+            while time.monotonic() - wall_start < args.duration and target.poll() is None:
+                rss_samples.append(read_memory_kb(target.pid)[0])
+                time.sleep(args.sample_interval)
+            cpu_used = read_cpu_seconds(target.pid) - cpu_start
+            wall = time.monotonic() - wall_start
+            peak_kb = read_memory_kb(target.pid)[1]
+        finally:
+            for proc in (target, simulator):
+                if proc and proc.poll() is None:
+                    proc.terminate()
+                    try:
+                        proc.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        proc.kill()
+    result = {
+        'cpu_percent': 100.0 * cpu_used / wall,
+        'rss_mb': sum(rss_samples) / len(rss_samples) / 1024.0,
+        'peak_rss_mb': peak_kb / 1024.0,
+    }
+    print(f"[{mode:8}] CPU {result['cpu_percent']:6.2f}% (单核), "
+          f"RSS 平均 {result['rss_mb']:7.1f} MB, 峰值 {result['peak_rss_mb']:7.1f} MB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GUI 模式与无界面网关的 CPU/内存占用对比")
+    parser.add_argument('--modes', nargs='+', choices=('headless', 'gui'), default=['headless', 'gui'])
+    parser.add_argument('--duration', type=float, default=30.0, help="每种模式的测量时长 (秒)")
+    parser.add_argument('--warmup', type=float, default=5.0, help="启动后多久开始测量 (秒)")
+    parser.add_argument('--sample-interval', type=float, default=0.5, help="RSS 采样间隔 (秒)")
+    parser.add_argument('--time-scale', type=float, default=1.0, help="传给模拟器的时间加速倍数")
+    parser.add_argument('--autostart', action='store_true',
+                        help="模拟器启动即开始扫描 (GUI 未打开雷达窗口时也会收到雷达数据)")
+    parser.add_argument('--server', help="网关上传目标 host:port，默认不上传")
+    args = parser.parse_args()
+
+    results = {mode: measure(mode, args) for mode in args.modes}
+    if results.get('headless') and results.get('gui'):
+        headless, gui = results['headless'], results['gui']
+        print(f"无界面网关 / GUI: CPU {headless['cpu_percent'] / max(gui['cpu_percent'], 1e-9):.2f}x, "
+              f"RSS {headless['rss_mb'] / gui['rss_mb']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# bench_history_chart.py
+# 测量数据视图历史曲线的每次刷新耗时：旧实现 (delete("all") 后全部重建) vs HistoryChart 增量更新。
+# 需要图形显示环境 (Tk)。用法: python benchmarks/bench_history_chart.py [--points 50 500 5000] [--repeat 50]
+
+import argparse
+import os
+import random
+import sys
+import time
+import tkinter as tk
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dht_and_radar_monitor import (HistoryChart, PLOT_CANVAS_WIDTH, PLOT_CANVAS_HEIGHT, PLOT_MARGIN,  # noqa: E402
+                                   PLOT_AXIS_COLOR, PLOT_GRID_COLOR, PLOT_TEMP_COLOR, PLOT_HUMI_COLOR)
+
+
+def legacy_redraw(画布, 温度列表, 湿度列表):
+    """旧版 DataViewer._绘制历史曲线图 的精简拷贝：每次清空画布并重建所有元素 (0.0 视为填充值)。"""
+    画布.delete("all")
+    点数 = len(温度列表)
+    绘图宽度 = PLOT_CANVAS_WIDTH - 2 * PLOT_MARGIN
+    绘图高度 = PLOT_CANVAS_HEIGHT - 2 * PLOT_MARGIN
+    X起始, Y起始 = PLOT_MARGIN, PLOT_MARGIN
+    X结束, Y结束 = PLOT_MARGIN + 绘图宽度, PLOT_MARGIN + 绘图高度
+    画布.create_line(X起始, Y结束, X结束, Y结束, fill=PLOT_AXIS_COLOR, width=1)
+    画布.create_line(X起始, Y起始, X起始, Y结束, fill=PLOT_AXIS_COLOR, width=1)
+    绘图数据 = [v for v in 温度列表 + 湿度列表 if v != 0.0]
+    最小值, 最大值 = (min(绘图数据), max(绘图数据)) if 绘图数据 else (0.0, 10.0)
+    if 最大值 <= 最小值:
+        最大值 = 最小值 + 1.0
+    值范围 = 最大值 - 最小值
+    Y轴最小值 = 最小值 - 值范围 * 0.1
+    Y轴范围 = max((最大值 + 值范围 * 0.1) - Y轴最小值, 1.0)
+    Y缩放 = 绘图高度 / Y轴范围
+    X增量 = 绘图宽度 / (点数 - 1) if 点数 > 1 else 绘图宽度
+    for i in range(6):
+        值 = Y轴最小值 + Y轴范围 * i / 5
+        y = Y结束 - (值 - Y轴最小值) * Y缩放
+        画布.create_line(X起始 - 5, y, X起始, y, fill=PLOT_AXIS_COLOR)
+        画布.create_text(X起始 - 10, y, text=f"{值:.1f}", anchor=tk.E, font=("Segoe UI", 7))
+        if i > 0:
+            画布.create_line(X起始, y, X结束, y, fill=PLOT_GRID_COLOR, dash=(2, 2))
+    X刻度间隔 = max(1, (点数 - 1) // 10)
+    for i in range(点数):
+        x = X起始 + i * X增量
+        if i % X刻度间隔 == 0 or i == 点数 - 1:
+            画布.create_line(x, Y结束, x, Y结束 + 5, fill=PLOT_AXIS_COLOR)
+            画布.create_text(x, Y结束 + 10, text=str(i + 1), anchor=tk.N, font=("Segoe UI", 7))
+    for 数据, 颜色 in ((温度列表, PLOT_TEMP_COLOR), (湿度列表, PLOT_HUMI_COLOR)):
+        点列表 = []
+        for i, 值 in enumerate(数据):
+            if 值 != 0.0:
+                点列表.extend([X起始 + i * X增量, Y结束 - max(0, min(绘图高度, (值 - Y轴最小值) * Y缩放))])
+            elif len(点列表) >= 4:
+                画布.create_line(点列表, fill=颜色, width=2)
+                点列表 = []
+        if len(点列表) >= 4:
+            画布.create_line(点列表, fill=颜色, width=2)
+    for 偏移, 颜色, 文本 in ((0, PLOT_TEMP_COLOR, "温度 (°C)"), (100, PLOT_HUMI_COLOR, "湿度 (%)")):
+        画布.create_line(X起始 + 10 + 偏移, Y起始 - 15, X起始 + 30 + 偏移, Y起始 - 15, fill=颜色, width=2)
+        画布.create_text(X起始 + 35 + 偏移, Y起始 - 15, text=文本, fill=颜色, anchor=tk.W, font=("Segoe UI", 8))
+
+
+def measure(root, canvas, redraw, points, repeat):
+    """模拟数据视图的刷新：每次追加一对新读数后重绘，返回 (平均耗时 ms, 画布元素数)。"""
+    rng = random.Random(0)
+    温度 = deque((20 + rng.random() * 5 for _ in range(points)), maxlen=points)
+    湿度 = deque((50 + rng.random() * 10 for _ in range(points)), maxlen=points)
+    redraw(温度, 湿度)
+    root.update()
+    durations = []
+    for _ in range(repeat):
+        温度.append(20 + rng.random() * 5)
+        湿度.append(50 + rng.random() * 10)
+        start = time.perf_counter()
+        redraw(温度, 湿度)
+        root.update_idletasks()  # 包含 Tk 实际重绘的开销
+        durations.append((time.perf_counter() - start) * 1000.0)
+    return sum(durations) / len(durations), len(canvas.find_all())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="历史曲线刷新耗时：全部重建 vs 增量更新")
+    parser.add_argument('--points', type=int, nargs='+', default=[50, 500, 5000], help="历史窗口点数")
+    parser.add_argument('--repeat', type=int, default=50, help="每种情况刷新次数")
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    canvas = tk.Canvas(root, width=PLOT_CANVAS_WIDTH, height=PLOT_CANVAS_HEIGHT, bg="white")
+    canvas.pack()
+    for points in args.points:
+        canvas.delete("all")
+        legacy_ms, legacy_items = measure(root, canvas, lambda t, h: legacy_redraw(canvas, list(t), list(h)),
+                                          points, args.repeat)
+        canvas.delete("all")
+        chart = HistoryChart(canvas)
+        chart_ms, chart_items = measure(root, canvas, lambda t, h: chart.update(t, h, points), points, args.repeat)
+        print(f"{points:6d} 点: 全部重建 {legacy_ms:8.2f} ms ({legacy_items} 个元素), "
+              f"增量更新 {chart_ms:8.2f} ms ({chart_items} 个元素), 加速 {legacy_ms / chart_ms:5.1f}x")
+    root.destroy()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# bench_radar_blit.py
+# 测量雷达视图每帧绘制耗时：完整重绘 (canvas.draw) vs 缓存背景 + Blitting。
+# 图形设置与 dht_and_radar_monitor.RadarWindow 相同，默认用 Agg 后端离屏绘制 (不需要显示器)；
+# 加 --tk 时嵌入真实的 Tk 窗口，包含把像素拷贝到屏幕的开销。
+# 用法: python benchmarks/bench_radar_blit.py [--frames 200] [--width 1920 --height 1080] [--tk]
+
+import argparse
+import time
+
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+
+R_MAX = 100.0
+
+
+def setup_axes(fig):
+    """与 RadarWindow._setup_radar_plot 一致的极坐标图。"""
+    ax = fig.add_subplot(111, polar=True, facecolor='#262626')
+    ax.set_ylim([0.0, R_MAX])
+    ax.set_xlim([0.0, np.pi])
+    ax.tick_params(axis='both', colors='#d0d0d0')
+    ax.grid(color='#808080', alpha=0.4, linestyle='--')
+    ax.set_rticks(np.linspace(0.0, R_MAX, 5))
+    ax.set_rlabel_position(22.5)
+    angles_deg_labels = np.linspace(0.0, 180.0, 7)
+    ax.set_thetagrids(angles_deg_labels, labels=[f'{int(deg)}°' for deg in angles_deg_labels])
+    pols = ax.scatter([], [], s=15, c='cyan', alpha=0.75, animated=True)
+    line1, = ax.plot([], color='lime', linewidth=2.0, animated=True)
+    return ax, pols, line1
+
+
+def make_canvas(fig, use_tk):
+    if not use_tk:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        return FigureCanvasAgg(fig), None
+    import tkinter as tk
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    root = tk.Tk()
+    canvas = FigureCanvasTkAgg(fig, master=root)
+    canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+    root.update()
+    return canvas, root
+
+
+def run(mode, args):
+    fig = Figure(figsize=(args.width / 100.0, args.height / 100.0), dpi=100, facecolor='#1a1a1a')
+    ax, pols, line1 = setup_axes(fig)
+    canvas, root = make_canvas(fig, args.tk)
+    canvas.draw()
+    background = canvas.copy_from_bbox(ax.bbox)
+
+    thetas = np.deg2rad(np.arange(0, 181))
+    rng = np.random.default_rng(0)
+    dists = rng.uniform(10.0, R_MAX, size=thetas.size)
+    durations = []
+    for i in range(args.frames):
+        angle = i % 181
+        dists[angle] = rng.uniform(10.0, R_MAX)
+        pols.set_offsets(np.column_stack((thetas, dists)))
+        line1.set_data([thetas[angle], thetas[angle]], [0, R_MAX])
+        start = time.perf_counter()
+        if mode == 'full':
+            # 完整重绘后仍需把动态元素画上去 (animated=True 的元素不参与 draw)
+            canvas.draw()
+            ax.draw_artist(pols)
+            ax.draw_artist(line1)
+            canvas.blit(ax.bbox)
+        else:
+            canvas.restore_region(background)
+            ax.draw_artist(pols)
+            ax.draw_artist(line1)
+            canvas.blit(ax.bbox)
+        if root is not None:
+            root.update_idletasks()
+        durations.append((time.perf_counter() - start) * 1000.0)
+    if root is not None:
+        root.destroy()
+
+    durations.sort()
+    p50 = durations[len(durations) // 2]
+    p99 = durations[min(len(durations) - 1, int(0.99 * len(durations)))]
+    print(f"[{mode:5}] {args.width}x{args.height} 每帧 p50 {p50:7.2f} ms, p99 {p99:7.2f} ms, "
+          f"可达 {1000.0 / p50:6.1f} FPS")
+    return p50
+
+
+def main():
+    parser = argparse.ArgumentParser(description="雷达视图绘制耗时：完整重绘 vs Blitting")
+    parser.add_argument('--frames', type=int, default=200, help="每种模式绘制的帧数")
+    parser.add_argument('--width', type=int, default=1920, help="画布宽度 (像素)")
+    parser.add_argument('--height', type=int, default=1080, help="画布高度 (像素)")
+    parser.add_argument('--tk', action='store_true', help="使用 TkAgg 真实窗口 (需要显示器)")
+    args = parser.parse_args()
+    if not args.tk:
+        matplotlib.use('Agg')
+    full_ms = run('full', args)
+    blit_ms = run('blit', args)
+    print(f"加速比: {full_ms / blit_ms:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
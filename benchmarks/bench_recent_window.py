@@ -0,0 +1,63 @@
+# bench_recent_window.py
+# 对比 "最近时间窗口" 查询：服务器内存环形缓冲区 vs SQLite。
+# 用法: python benchmarks/bench_recent_window.py [--rows 50000] [--window 300]
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import 服务器 as server  # noqa: E402
+
+
+def _time_call(func, repeat):
+    """返回多次调用的平均耗时 (毫秒)。"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000.0 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="最近窗口查询延迟：环形缓冲区 vs SQLite")
+    parser.add_argument('--rows', type=int, default=50000, help="写入的雷达样本数")
+    parser.add_argument('--window', type=float, default=300.0, help="查询窗口 (秒)")
+    parser.add_argument('--rate', type=float, default=20.0, help="模拟的采样率 (样本/秒)")
+    parser.add_argument('--repeat', type=int, default=50, help="每种查询重复次数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        server.DB_NAME = os.path.join(tmp_dir, 'bench.db')
+        server.init_db()
+        store = server.RecentHistoryStore({'temp': 4096, 'humi': 4096, 'radar': 16384})
+
+        device_id = 'bench_device'
+        now = time.time()
+        rows = []
+        for i in range(args.rows):
+            ts = datetime.datetime.fromtimestamp(now - (args.rows - i) / args.rate)
+            angle, distance = i % 181, 20.0 + (i % 80)
+            rows.append((device_id, angle, distance, ts))
+            store.append(device_id, 'radar', ts, angle, distance)
+        with server.sqlite3.connect(server.DB_NAME) as conn:
+            conn.executemany('INSERT INTO radar_data (device_id, angle, distance, timestamp) VALUES (?, ?, ?, ?)', rows)
+
+        since = now - args.window
+        mem_ms = _time_call(lambda: store.query(device_id, 'radar', since), args.repeat)
+        db_ms = _time_call(lambda: store._query_db(device_id, 'radar', since, None), args.repeat)
+        _, values, source = store.query(device_id, 'radar', since)
+
+        print(f"样本数: {args.rows}, 窗口: {args.window:.0f}s ({len(values)} 个样本, 来源: {source})")
+        print(f"环形缓冲区内存: {store.memory_bytes(device_id) / 1024:.1f} KiB / 设备")
+        print(f"环形缓冲区查询: {mem_ms:.3f} ms")
+        print(f"SQLite 查询:     {db_ms:.3f} ms")
+        if mem_ms > 0:
+            print(f"加速比: {db_ms / mem_ms:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
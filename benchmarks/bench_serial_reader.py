@@ -0,0 +1,94 @@
+# bench_serial_reader.py
+# 用虚拟串口 (pty) 测量监控程序串口读取路径的每行延迟和最大持续行速率。
+# 对比旧实现 (in_waiting + readline + sleep(0.01)) 与批量读取 + 增量分帧。
+# 仅支持 Linux/macOS。用法: python benchmarks/bench_serial_reader.py [--lines 20000] [--rate 500]
+
+import argparse
+import os
+import sys
+import threading
+import time
+import tty
+
+import serial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitor_core import SerialLineFramer, is_radar_line  # noqa: E402
+
+
+def legacy_reader(ser, expected, recv_times, stop_event):
+    """旧实现：每次 readline 一行，然后 sleep 10ms。"""
+    while len(recv_times) < expected and not stop_event.is_set():
+        if ser.in_waiting > 0:
+            line = ser.readline().decode('utf-8', errors='ignore').strip()
+            if line:
+                parts = line.split(',')
+                if len(parts) == 2:
+                    try:
+                        float(parts[0]); float(parts[1])
+                    except ValueError:
+                        pass
+                recv_times.append(time.perf_counter())
+        time.sleep(0.01)
+
+
+def bulk_reader(ser, expected, recv_times, stop_event):
+    """新实现：read(in_waiting or 1) 批量读取 + SerialLineFramer。"""
+    framer = SerialLineFramer()
+    while len(recv_times) < expected and not stop_event.is_set():
+        data = ser.read(ser.in_waiting or 1)
+        if not data:
+            continue
+        now = time.perf_counter()
+        for line in framer.feed(data):
+            is_radar_line(line)
+            recv_times.append(now)
+
+
+def run(mode, lines, rate):
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    ser = serial.Serial(os.ttyname(slave), 115200, timeout=0.5)
+    send_times, recv_times = [], []
+    stop_event = threading.Event()
+    reader = legacy_reader if mode == 'legacy' else bulk_reader
+    thread = threading.Thread(target=reader, args=(ser, lines, recv_times, stop_event), daemon=True)
+    thread.start()
+
+    interval = 1.0 / rate if rate > 0 else 0.0
+    start = time.perf_counter()
+    for i in range(lines):
+        if interval:
+            target = start + i * interval
+            while time.perf_counter() < target:
+                pass
+        send_times.append(time.perf_counter())
+        os.write(master, f"{i % 181},{20 + i % 80}.25\r\n".encode())
+    thread.join(timeout=max(10.0, lines * 0.02))
+    stop_event.set()
+    elapsed = (recv_times[-1] - send_times[0]) if recv_times else float('nan')
+    ser.close()
+    os.close(master)
+    os.close(slave)
+
+    latencies = sorted((r - s) * 1000.0 for s, r in zip(send_times, recv_times))
+    pct = lambda q: latencies[min(len(latencies) - 1, int(q * (len(latencies) - 1)))] if latencies else float('nan')
+    print(f"[{mode:6}] 收到 {len(recv_times)}/{lines} 行, {len(recv_times) / elapsed:10.0f} 行/秒, "
+          f"延迟 p50 {pct(0.5):7.2f} ms, p99 {pct(0.99):7.2f} ms, max {pct(1.0):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="串口读取路径基准测试 (虚拟串口)")
+    parser.add_argument('--lines', type=int, default=5000, help="发送的行数")
+    parser.add_argument('--rate', type=float, default=500.0, help="发送速率 (行/秒)，0 表示尽可能快")
+    args = parser.parse_args()
+    for mode in ('legacy', 'bulk'):
+        run(mode, args.lines, args.rate)
+    print("--- 最大持续速率 (不限速) ---")
+    for mode in ('legacy', 'bulk'):
+        run(mode, args.lines, 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+# soak_server.py
+# 服务器长时间浸泡测试：用模拟设备持续驱动 服务器.py，定期采样
+# RSS、tracemalloc 分配、线程数、fd 数和确认 (ack) 延迟，
+# 结束时对每项指标做线性趋势拟合，增长超过阈值则判定失败 (退出码 1)。
+#
+# 用法: python benchmarks/soak_server.py --hours 6 --devices 10 --report soak.json
+#       python benchmarks/soak_server.py --hours 0.05 --sample-interval 10   # 快速冒烟
+
+import argparse
+import datetime
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中启用 tracemalloc 后再导入并启动服务器
+SERVER_BOOTSTRAP = (
+    "import sys, logging, tracemalloc; tracemalloc.start({frames}); "
+    "sys.path.insert(0, {root!r}); import 服务器 as server; "
+    "logging.getLogger().setLevel({log_level!r}); "
+    "server.HOST = '127.0.0.1'; server.PORT = {port}; server.main()"
+)
+
+# 各项指标允许的绝对增长余量 (避免基线很小时相对阈值过于敏感)
+METRIC_ABS_SLACK = {
+    'rss_mb': 5.0,
+    'traced_mb': 2.0,
+    'threads': 2,
+    'open_fds': 4,
+    'ack_p50_ms': 1.0,
+    'ack_p99_ms': 5.0,
+}
+
+
+class LatencySink:
+    """线程安全地收集一个采样间隔内的 ack 延迟。"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = []
+        self.total = 0
+        self.errors = 0
+
+    def record(self, seconds):
+        with self._lock:
+            self._values.append(seconds)
+            self.total += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def drain(self):
+        """取出并清空当前间隔的延迟列表。"""
+        with self._lock:
+            values, self._values = self._values, []
+        return values
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _envelope(device_id, payload):
+    return (json.dumps({
+        "deviceId": device_id,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "payload": payload,
+    }) + '\n').encode('utf-8')
+
+
+def device_worker(index, args, stop_event, sink):
+    """模拟一个设备：发送雷达扫描和温湿度读数，每条消息等待服务器 ack 并计时。"""
+    device_id = f"soak_dev_{index:03d}"
+    angle, step = 0, 5
+    interval = 1.0 / args.rate
+    seq = 0
+    while not stop_event.is_set():
+        try:
+            sock = socket.create_connection(('127.0.0.1', args.port), timeout=10)
+            reader = sock.makefile('rb')
+        except OSError:
+            sink.record_error()
+            stop_event.wait(1.0)
+            continue
+        try:
+            # 定期重连，覆盖服务器端每连接一个线程的创建/回收路径
+            for _ in range(args.reconnect_every):
+                if stop_event.is_set():
+                    break
+                next_send = time.perf_counter() + interval
+                seq += 1
+                if seq % 20 == 0:
+                    payload = {"type": "temp" if seq % 40 == 0 else "humi", "value": 20.0 + (seq % 7), "unit": ""}
+                else:
+                    payload = {"type": "radar", "angle": angle, "distance": 30.0 + (seq % 50)}
+                    if not 0 <= angle + step <= 180:
+                        step = -step
+                    angle += step
+                t0 = time.perf_counter()
+                sock.sendall(_envelope(device_id, payload))
+                if not reader.readline():
+                    sink.record_error()
+                    break
+                sink.record(time.perf_counter() - t0)
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    stop_event.wait(delay)
+        except OSError:
+            sink.record_error()
+        finally:
+            try:
+                reader.close()
+                sock.close()
+            except OSError:
+                pass
+
+
+def query_diagnostics(port, top_n):
+    """通过 query_diagnostics 消息获取服务器进程的资源状况。"""
+    with socket.create_connection(('127.0.0.1', port), timeout=30) as sock:
+        sock.sendall(_envelope('soak_probe', {"type": "query_diagnostics", "top": top_n}))
+        with sock.makefile('rb') as reader:
+            return json.loads(reader.readline())
+
+
+def wait_for_server(port, timeout_s=30.0):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def linear_trend(xs, ys):
+    """最小二乘拟合，返回 (斜率, 截距)。"""
+    n = len(xs)
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0:
+        return 0.0, mean_y
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+    return slope, mean_y - slope * mean_x
+
+
+def evaluate_trends(samples, warmup_fraction, threshold):
+    """对预热之后的样本做趋势拟合，返回每项指标的结果。"""
+    start = int(len(samples) * warmup_fraction)
+    window = samples[start:]
+    results = {}
+    for metric, slack in METRIC_ABS_SLACK.items():
+        points = [(s['elapsed_s'], s[metric]) for s in window if s.get(metric) is not None]
+        if len(points) < 3:
+            results[metric] = {'status': 'SKIP', 'reason': 'not enough samples'}
+            continue
+        xs, ys = zip(*points)
+        slope, intercept = linear_trend(xs, ys)
+        baseline = intercept + slope * xs[0]
+        growth = slope * (xs[-1] - xs[0])
+        limit = max(abs(baseline) * threshold, slack)
+        results[metric] = {
+            'status': 'FAIL' if growth > limit else 'PASS',
+            'baseline': baseline,
+            'growth': growth,
+            'limit': limit,
+            'slope_per_hour': slope * 3600.0,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="服务器.py 长时间浸泡测试 (内存/线程/fd/延迟漂移)")
+    parser.add_argument('--hours', type=float, default=4.0, help="测试时长 (小时)")
+    parser.add_argument('--devices', type=int, default=10, help="模拟设备数")
+    parser.add_argument('--rate', type=float, default=20.0, help="每个设备每秒发送的消息数")
+    parser.add_argument('--reconnect-every', type=int, default=2000, help="每个设备每发送多少条消息重连一次")
+    parser.add_argument('--sample-interval', type=float, default=60.0, help="采样间隔 (秒)")
+    parser.add_argument('--warmup', type=float, default=0.2, help="趋势拟合时忽略的前段比例")
+    parser.add_argument('--threshold', type=float, default=0.10, help="允许的相对增长 (相对于基线)")
+    parser.add_argument('--port', type=int, default=18888, help="测试服务器端口")
+    parser.add_argument('--tracemalloc-frames', type=int, default=5, help="tracemalloc 保存的栈帧数")
+    parser.add_argument('--top', type=int, default=10, help="报告中列出的分配位置数")
+    parser.add_argument('--server-log-level', default='WARNING', help="服务器日志级别")
+    parser.add_argument('--report', help="JSON 报告输出路径")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='soak_server_')
+    server_log = open(os.path.join(work_dir, 'server.log'), 'wb')
+    bootstrap = SERVER_BOOTSTRAP.format(frames=args.tracemalloc_frames, root=REPO_ROOT,
+                                        log_level=args.server_log_level.upper(), port=args.port)
+    server_proc = subprocess.Popen([sys.executable, '-c', bootstrap], cwd=work_dir,
+                                   stdout=server_log, stderr=subprocess.STDOUT)
+    print(f"服务器 PID {server_proc.pid}，工作目录 {work_dir}")
+    if not wait_for_server(args.port):
+        print("错误：服务器未能在超时内启动。")
+        server_proc.kill()
+        return 2
+
+    stop_event = threading.Event()
+    sink = LatencySink()
+    workers = [threading.Thread(target=device_worker, args=(i, args, stop_event, sink), daemon=True)
+               for i in range(args.devices)]
+    for w in workers:
+        w.start()
+
+    samples = []
+    first_diag = last_diag = None
+    start_time = time.time()
+    end_time = start_time + args.hours * 3600.0
+    print(f"{'elapsed':>8} {'rss_mb':>8} {'traced':>8} {'threads':>7} {'fds':>5} {'p50_ms':>8} {'p99_ms':>8} {'msgs':>9} {'errors':>6}")
+    try:
+        while time.time() < end_time and server_proc.poll() is None:
+            time.sleep(min(args.sample_interval, max(0.0, end_time - time.time())))
+            try:
+                diag = query_diagnostics(args.port, args.top)
+            except (OSError, ValueError) as e:
+                print(f"诊断查询失败: {e}")
+                continue
+            first_diag = first_diag or diag
+            last_diag = diag
+            latencies = sorted(sink.drain())
+            sample = {
+                'elapsed_s': time.time() - start_time,
+                'rss_mb': diag['rss_bytes'] / 2**20 if diag.get('rss_bytes') else None,
+                'traced_mb': diag['traced_bytes'] / 2**20 if diag.get('traced_bytes') is not None else None,
+                'threads': diag.get('threads'),
+                'open_fds': diag.get('open_fds'),
+                'ack_p50_ms': _percentile(latencies, 0.50) * 1000.0 if latencies else None,
+                'ack_p99_ms': _percentile(latencies, 0.99) * 1000.0 if latencies else None,
+                'messages': sink.total,
+                'errors': sink.errors,
+            }
+            samples.append(sample)
+            fmt = lambda v, spec: format(v, spec) if v is not None else '-'
+            print(f"{sample['elapsed_s']:8.0f} {fmt(sample['rss_mb'], '8.1f')} {fmt(sample['traced_mb'], '8.1f')} "
+                  f"{fmt(sample['threads'], '7d')} {fmt(sample['open_fds'], '5d')} {fmt(sample['ack_p50_ms'], '8.2f')} "
+                  f"{fmt(sample['ack_p99_ms'], '8.2f')} {sample['messages']:9d} {sample['errors']:6d}")
+    except KeyboardInterrupt:
+        print("\n已中断，按现有样本生成报告。")
+    finally:
+        stop_event.set()
+        for w in workers:
+            w.join(timeout=5)
+        server_proc.terminate()
+        try:
+            server_proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server_proc.kill()
+        server_log.close()
+
+    crashed = server_proc.returncode not in (0, -15) and time.time() < end_time
+    results = evaluate_trends(samples, args.warmup, args.threshold)
+    print("\n--- 趋势报告 ---")
+    for metric, res in results.items():
+        if res['status'] == 'SKIP':
+            print(f"{metric:>12}: SKIP ({res['reason']})")
+        else:
+            print(f"{metric:>12}: {res['status']}  基线 {res['baseline']:.2f}, 增长 {res['growth']:+.2f} "
+                  f"(上限 {res['limit']:.2f}, {res['slope_per_hour']:+.3f}/小时)")
+    if last_diag and last_diag.get('top_allocations'):
+        print("\n--- 结束时 tracemalloc 分配最多的位置 ---")
+        for entry in last_diag['top_allocations']:
+            print(f"{entry['size'] / 1024:10.1f} KiB {entry['count']:8d} 块  {entry['where']}")
+    if crashed:
+        print(f"\n服务器进程提前退出 (返回码 {server_proc.returncode})，日志见 {work_dir}/server.log")
+
+    failed = crashed or any(r['status'] == 'FAIL' for r in results.values())
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'samples': samples, 'trends': results,
+                       'first_diagnostics': first_diag, 'last_diagnostics': last_diag,
+                       'passed': not failed}, f, indent=2, ensure_ascii=False)
+        print(f"\n报告已写入 {args.report}")
+    print("\n结果:", "FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
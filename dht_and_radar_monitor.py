@@ -3,41 +3,48 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, Canvas
 import serial
-import serial.tools.list_ports
 import sqlite3
 import datetime
 import time
 import threading
 import traceback
-import queue
-from PIL import Image, ImageTk
 import os
 import math
 import socket
 import json
-import numpy as np
-import matplotlib
-matplotlib.use('TkAgg')
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-# from matplotlib.widgets import Slider # Using tk.Scale
+import hashlib
+from collections import deque
+# numpy / matplotlib / PIL 较重，不在启动时导入：
+# numpy 和 matplotlib 在首次打开雷达或数据视图时导入 (_ensure_numpy / _ensure_matplotlib)，
+# PIL 只在图片缓存未命中时导入 (见 ArduinoMonitorApp._加载图片)
+from monitor_core import (SerialLineFramer, is_radar_line, parse_radar_line, parse_sensor_response,
+                          AlarmEngine, AlarmController, build_uplink_envelope, SENSOR_SCHEMA_STATEMENTS,
+                          ResponseDispatcher, RenderScheduler, StatusLogBuffer, LocalStorageWriter, UplinkOutbox,
+                          UplinkSender)
+from monitor_config import (DB_NAME, LOCAL_DB_BATCH_SIZE, LOCAL_DB_FLUSH_INTERVAL_S, ARDUINO_BAUDRATE, SERIAL_TIMEOUT,
+                            CMD_LIGHT_ON, CMD_LIGHT_OFF, CMD_GET_TEMP, CMD_GET_HUMI, CMD_RADAR_ON, CMD_RADAR_OFF,
+                            CMD_ALARM_PREFIX, SERVER_IP, SERVER_PORT, SOCKET_TIMEOUT, SOCKET_RECONNECT_INTERVAL, DEVICE_ID,
+                            OUTBOX_DB_NAME, OUTBOX_MAX_ROWS, OUTBOX_REPLAY_BATCH, OUTBOX_REPLAY_RATE,
+                            UPLINK_FLUSH_INTERVAL_S, UPLINK_BATCH_SIZE, UPLINK_MAX_QUEUE, UPLINK_OVERFLOW_POLICY,
+                            RADAR_R_MAX, RADAR_INVALID_MARKER, ALARM_HYSTERESIS_CM, ALARM_DWELL_S, ALARM_WINDOW_S,
+                            ALARM_MAX_SWEEP_S, THREAD_JOIN_TIMEOUT)
+from 雷达.command_writer import CommandWriter
+from 雷达.port_discovery import discover_arduino
 
 # --- 常量定义 ---
-DB_NAME = "sensor_data.db"
-ARDUINO_BAUDRATE = 115200
-SERIAL_TIMEOUT = 1.0
-CMD_RADAR_OFF = "RADAR_OFF\n"
-CMD_ALARM_PREFIX = "ALARM "
-RESPONSE_POLL_INTERVAL = 100
-THREAD_JOIN_TIMEOUT = 1.0
+LOCAL_DB_STATS_INTERVAL_MS = 60000   # 写入延迟统计的输出间隔
+ARDUINO_PORT = os.environ.get("ARDUINO_PORT")  # 指定串口 (例如虚拟 Arduino 的 pty)，为空时按 VID/PID 自动查找
+RESPONSE_WAKE_POLL_MS = 10         # 没有 createfilehandler (Windows) 时检查唤醒标志的间隔
+RESPONSE_BATCH_BUDGET_MS = 8       # 每个 tick 处理响应的时间预算，超出部分留到下一个 tick
+RESPONSE_SAFETY_POLL_MS = 1000     # 兜底轮询间隔 (防止唤醒事件丢失)
+LOG_PANE_MAX_LINES = 1000          # 日志区最多保留的行数，超出后成批删除最旧的行
+LOG_PANE_TRIM_LINES = 200          # 每次删除的行数 (行数超过 上限 + 此值 时才删除，避免每条消息都删)
+LOG_PANE_FLUSH_INTERVAL_MS = 250   # 日志区刷新间隔：期间的新消息合并为一次插入
+LOG_FILE_NAME = "monitor_status.log"  # 完整日志镜像 (滚动文件)
+LOG_FILE_MAX_BYTES = 1000000
+LOG_FILE_BACKUP_COUNT = 3
 DATA_VIEW_INTERVAL_MS = 1000
 DATA_VIEW_REQUEST_DELAY_MS = 500
-CMD_LIGHT_ON = "command=arduino1\n"
-CMD_LIGHT_OFF = "command=arduino2\n"
-CMD_GET_TEMP = "command=arduino3\n"
-CMD_GET_HUMI = "command=arduino4\n"
-CMD_RADAR_ON = "RADAR_ON\n"
-CMD_RADAR_OFF = "RADAR_OFF\n"
 CMD_RADAR_PREFIX_MAX_ANGLE = 'A'
 CMD_RADAR_PREFIX_MIN_ANGLE = 'a'
 CMD_RADAR_PREFIX_STEP = 'S'
@@ -49,32 +56,52 @@ BTN_ON_IMG_FILENAME = "btn_on.png"
 BTN_OFF_IMG_FILENAME = "btn_off.png"
 BTN_TEMP_IMG_FILENAME = "btn_temp.png"
 BTN_HUM_IMG_FILENAME = "btn_hum.png"
+IMAGE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".image_cache")  # 预缩放图片缓存
 IMAGE_STATUS_SIZE = (150, 150)
 BUTTON_IMAGE_SIZE = (100, 40)
 PLOT_WINDOW_WIDTH = 750
-PLOT_WINDOW_HEIGHT = 650
+PLOT_WINDOW_HEIGHT = 685
 PLOT_CANVAS_WIDTH = 700
 PLOT_CANVAS_HEIGHT = 400
 PLOT_MARGIN = 50
 PLOT_POINTS = 50
+PLOT_POINTS_CHOICES = (50, 200, 500, 1000, 5000)  # 数据视图可选的历史窗口大小
 PLOT_TEMP_COLOR = "red"
 PLOT_HUMI_COLOR = "blue"
 PLOT_AXIS_COLOR = "black"
 PLOT_GRID_COLOR = "#E0E0E0"
-ARDUINO_KEYWORDS = ['CH340', 'Arduino', 'Serial', 'ttyACM', 'ttyUSB']
 USE_SOCKET = False
-SERVER_IP = ""#你本地设备的公网IP
-SERVER_PORT = 8888
-SOCKET_TIMEOUT = 5
-SOCKET_RECONNECT_INTERVAL = 5
-DEVICE_ID = "MyDHT_Client_01"
-RADAR_R_MAX = 100.0
 RADAR_UPDATE_INTERVAL_S = 0.05
-RADAR_INVALID_MARKER = RADAR_R_MAX + 1.0
+RADAR_TARGET_FPS = 30.0            # 雷达视图最大重绘帧率，多个样本合并到同一帧
+RADAR_STATS_INTERVAL_MS = 1000     # 帧率统计显示的刷新间隔
 GAUGE_MAX_TEMP = 50.0
 GAUGE_MAX_HUMI = 100.0
 USE_SOCKET = True # <<< 设为 True 来测试
-DEVICE_ID = "MyDHT_Client_01" # <<< 确保与服务器端协调一致
+
+np = None  # 由 _ensure_numpy() 首次调用时赋值
+Figure = FigureCanvasTkAgg = None  # 由 _ensure_matplotlib() 首次调用时赋值
+
+
+def _ensure_numpy():
+    """首次需要时才导入 numpy (冷启动不需要)。"""
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def _ensure_matplotlib():
+    """首次打开雷达窗口时才导入 matplotlib 并选择 TkAgg 后端。"""
+    global Figure, FigureCanvasTkAgg
+    if Figure is None:
+        import matplotlib
+        matplotlib.use('TkAgg')
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg as canvas_class
+        from matplotlib.figure import Figure as figure_class
+        Figure, FigureCanvasTkAgg = figure_class, canvas_class
+    return Figure, FigureCanvasTkAgg
+
 
 # --- 仪表盘类 ---
 class RectGauge:
@@ -236,12 +263,201 @@ class RadialGauge:
             except tk.TclError:
                 self.pointer_id = None
 
+# --- 日志区 ---
+class LogPane:
+    """
+    ScrolledText 日志区：消息先进入 StatusLogBuffer (任意线程)，每 LOG_PANE_FLUSH_INTERVAL_MS 在 GUI 线程
+    一次性插入所有新行 (每种颜色一个 tag)，行数超过上限时成批删除最旧的行。
+    用户向上滚动查看时不强制滚到底部。
+    """
+    def __init__(self, text_widget, buffer, max_lines=LOG_PANE_MAX_LINES, trim_lines=LOG_PANE_TRIM_LINES,
+                 flush_interval_ms=LOG_PANE_FLUSH_INTERVAL_MS):
+        self.text = text_widget
+        self.buffer = buffer
+        self.max_lines = max_lines
+        self.trim_lines = trim_lines
+        self.flush_interval_ms = flush_interval_ms
+        self.line_count = 0
+        self._tags = set()
+        self.text.after(self.flush_interval_ms, self._flush)
+
+    def _tag_for(self, color):
+        if color not in self._tags:
+            self.text.tag_configure(color, foreground=color)
+            self._tags.add(color)
+        return color
+
+    def _flush(self):
+        try:
+            if not self.text.winfo_exists():
+                return
+            lines, skipped = self.buffer.drain()
+            if lines:
+                self._insert(lines, skipped)
+            self.text.after(self.flush_interval_ms, self._flush)
+        except tk.TclError:
+            pass  # 窗口已销毁
+
+    def _insert(self, lines, skipped):
+        at_bottom = self.text.yview()[1] >= 0.999
+        if skipped:
+            lines.insert(0, (f"... 省略 {skipped} 条消息 (完整内容见 {LOG_FILE_NAME})\n", "gray"))
+        # 相邻同色的行合并，整批用一次 insert(index, 文本1, tag1, 文本2, tag2, ...)
+        args = []
+        for line, color in lines:
+            tag = self._tag_for(color or "black")
+            if args and args[-1] == tag:
+                args[-2] += line
+            else:
+                args += [line, tag]
+        self.text.config(state=tk.NORMAL)
+        self.text.insert(tk.END, *args)
+        self.line_count += sum(line.count('\n') for line, _ in lines)
+        if self.line_count > self.max_lines + self.trim_lines:
+            excess = self.line_count - self.max_lines
+            self.text.delete("1.0", f"{excess + 1}.0")
+            self.line_count -= excess
+        self.text.config(state=tk.DISABLED)
+        if at_bottom:
+            self.text.see(tk.END)
+
+
+# --- 历史曲线图 ---
+class HistoryChart:
+    """
+    在Canvas上增量绘制温湿度历史曲线：
+    坐标轴、图例等静态元素只创建一次 (tag 'static')，温度/湿度各是一条折线，用 coords() 更新；
+    Y 轴刻度只在比例变化时重写，X 轴刻度只在点数变化时重建。
+    """
+    Y_TICKS = 5   # 6 个 Y 轴标签
+    X_TICKS = 10  # 大约 10 个 X 轴标签
+
+    def __init__(self, canvas, width=PLOT_CANVAS_WIDTH, height=PLOT_CANVAS_HEIGHT, margin=PLOT_MARGIN):
+        _ensure_numpy()
+        self.canvas = canvas
+        self.plot_width = width - 2 * margin
+        self.plot_height = height - 2 * margin
+        self.x0 = margin
+        self.y0 = margin                      # 绘图区顶部
+        self.x1 = margin + self.plot_width
+        self.y1 = margin + self.plot_height   # 绘图区底部
+        self.center = (width / 2, height / 2)
+        self.y_range = None     # 当前 (Y轴最小值, Y轴最大值)
+        self.num_points = None  # 当前 X 轴点数
+        self.y_tick_ids = []    # [(刻度线, 标签, 网格线), ...]
+        self.trace_ids = {}
+        self.message_id = None
+        self._draw_base()
+
+    def _draw_base(self):
+        c = self.canvas
+        c.create_line(self.x0, self.y1, self.x1, self.y1, fill=PLOT_AXIS_COLOR, width=1, tags='static')  # X 轴
+        c.create_line(self.x0, self.y0, self.x0, self.y1, fill=PLOT_AXIS_COLOR, width=1, tags='static')  # Y 轴
+        for i in range(self.Y_TICKS + 1):
+            grid_id = c.create_line(0, 0, 0, 0, fill=PLOT_GRID_COLOR, dash=(2, 2), tags='yaxis') if i > 0 else None
+            tick_id = c.create_line(0, 0, 0, 0, fill=PLOT_AXIS_COLOR, tags='yaxis')
+            label_id = c.create_text(0, 0, text="", anchor=tk.E, font=("Segoe UI", 7), tags='yaxis')
+            self.y_tick_ids.append((tick_id, label_id, grid_id))
+        # 图例
+        legend_y = self.y0 - 15
+        legend_x = self.x0 + 10
+        for key, color, text in (('temp', PLOT_TEMP_COLOR, "温度 (°C)"), ('humi', PLOT_HUMI_COLOR, "湿度 (%)")):
+            c.create_line(legend_x, legend_y, legend_x + 20, legend_y, fill=color, width=2, tags='static')
+            c.create_text(legend_x + 25, legend_y, text=text, fill=color, anchor=tk.W, font=("Segoe UI", 8), tags='static')
+            legend_x += 100
+            # 每条曲线一个折线对象，初始隐藏
+            self.trace_ids[key] = c.create_line(0, 0, 0, 0, fill=color, width=2, smooth=False, state=tk.HIDDEN, tags='trace')
+
+    @staticmethod
+    def _valid_values(series):
+        values = np.asarray(series, dtype=float)
+        return values[np.isfinite(values)] if values.size else values
+
+    def _update_y_axis(self, y_min, y_max):
+        """比例变化时移动/重写 Y 轴刻度和网格线"""
+        y_span = y_max - y_min
+        y_scale = self.plot_height / y_span
+        for i, (tick_id, label_id, grid_id) in enumerate(self.y_tick_ids):
+            value = y_min + y_span * i / self.Y_TICKS
+            y = self.y1 - (value - y_min) * y_scale
+            state = tk.NORMAL if self.y0 - 5 < y < self.y1 + 5 else tk.HIDDEN
+            self.canvas.coords(tick_id, self.x0 - 5, y, self.x0, y)
+            self.canvas.coords(label_id, self.x0 - 10, y)
+            self.canvas.itemconfig(label_id, text=f"{value:.1f}", state=state)
+            self.canvas.itemconfig(tick_id, state=state)
+            if grid_id is not None:
+                self.canvas.coords(grid_id, self.x0, y, self.x1, y)
+                self.canvas.itemconfig(grid_id, state=state)
+
+    def _update_x_axis(self, num_points):
+        """点数变化时重建 X 轴刻度 (标签为数据点序号 1..N)"""
+        self.canvas.delete('xaxis')
+        x_step = self.plot_width / (num_points - 1) if num_points > 1 else self.plot_width
+        tick_interval = max(1, (num_points - 1) // self.X_TICKS if num_points > 1 else 1)
+        for i in list(range(0, num_points, tick_interval)) + ([num_points - 1] if (num_points - 1) % tick_interval else []):
+            x = self.x0 + i * x_step
+            self.canvas.create_line(x, self.y1, x, self.y1 + 5, fill=PLOT_AXIS_COLOR, tags='xaxis')
+            self.canvas.create_text(x, self.y1 + 10, text=str(i + 1), anchor=tk.N, font=("Segoe UI", 7), tags='xaxis')
+
+    def update(self, 温度序列, 湿度序列, num_points=None):
+        """
+        用新数据更新曲线。序列右对齐到 num_points 个位置 (最新的点在最右侧)，
+        不足的部分留空；非有限值 (NaN/inf) 跳过。
+        """
+        num_points = num_points or max(len(温度序列), len(湿度序列), 2)
+        self.show_message(None)
+        if num_points != self.num_points:
+            self.num_points = num_points
+            self._update_x_axis(num_points)
+
+        # Y 轴范围：有效数据的最小/最大值，上下各留 10%
+        valid = np.concatenate((self._valid_values(温度序列), self._valid_values(湿度序列)))
+        data_min, data_max = (float(valid.min()), float(valid.max())) if valid.size else (0.0, 10.0)
+        if data_max <= data_min:
+            data_max = data_min + 1.0
+        span = data_max - data_min
+        y_min, y_max = data_min - span * 0.1, data_max + span * 0.1
+        if y_max - y_min < 1.0:
+            y_max = y_min + 1.0
+        if (y_min, y_max) != self.y_range:
+            self.y_range = (y_min, y_max)
+            self._update_y_axis(y_min, y_max)
+
+        y_scale = self.plot_height / (y_max - y_min)
+        x_step = self.plot_width / (num_points - 1) if num_points > 1 else self.plot_width
+        for key, series in (('temp', 温度序列), ('humi', 湿度序列)):
+            values = np.asarray(series, dtype=float)[-num_points:]
+            offset = num_points - values.size
+            mask = np.isfinite(values)
+            item = self.trace_ids[key]
+            if np.count_nonzero(mask) < 2:
+                self.canvas.itemconfig(item, state=tk.HIDDEN)
+                continue
+            xs = self.x0 + (np.nonzero(mask)[0] + offset) * x_step
+            ys = self.y1 - np.clip((values[mask] - y_min) * y_scale, 0, self.plot_height)
+            self.canvas.coords(item, np.column_stack((xs, ys)).ravel().tolist())
+            self.canvas.itemconfig(item, state=tk.NORMAL)
+
+    def show_message(self, text, color="red"):
+        """在图中央显示提示 (例如加载失败)；text 为 None 时移除"""
+        if text is None:
+            if self.message_id is not None:
+                self.canvas.delete(self.message_id)
+                self.message_id = None
+            return
+        for item in self.trace_ids.values():
+            self.canvas.itemconfig(item, state=tk.HIDDEN)
+        if self.message_id is None:
+            self.message_id = self.canvas.create_text(*self.center, text=text, fill=color, font=("Segoe UI", 12))
+        else:
+            self.canvas.itemconfig(self.message_id, text=text, fill=color)
+
 # --- 雷达扫描窗口类 ---
 class RadarWindow:
     # ... (与上次提供的代码一致, 内部已拆分好语句) ...
-    def __init__(self, parent_window, send_cmd_callback, radar_off_callback):
+    def __init__(self, parent_window, send_param_callback, radar_off_callback):
         self.parent = parent_window
-        self.send_command = send_cmd_callback # Function to send commands like A180
+        self.send_param = send_param_callback # 提交参数 (前缀, 整数值)，由写入线程合并后发送
         self.on_close_callback = radar_off_callback # Function to call when window closes
 
         self.top_level = tk.Toplevel(parent_window)
@@ -250,6 +466,8 @@ class RadarWindow:
         self.top_level.transient(parent_window)
         self.top_level.protocol("WM_DELETE_WINDOW", self._handle_close)
 
+        _ensure_numpy()
+        _ensure_matplotlib()
         self.fig = Figure(figsize=(5.5, 5.5), dpi=100, facecolor='#1a1a1a')
         self.ax = self.fig.add_subplot(111, polar=True, facecolor='#262626')
         self._setup_radar_plot()
@@ -257,17 +475,27 @@ class RadarWindow:
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.top_level)
         self.canvas_widget = self.canvas.get_tk_widget()
         self.canvas_widget.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10, pady=10)
+        # Blitting: 完整重绘 (首次显示、窗口缩放) 后缓存静态背景，之后每帧只重画散点和扫描线
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self._on_full_draw)
+        self.canvas.mpl_connect('resize_event', self._invalidate_background)
         self.canvas.draw()
 
         control_frame = tk.Frame(self.top_level, pady=10)
         control_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
         self._create_radar_controls(control_frame)
+        self.render_stats_label = tk.Label(control_frame, text="", anchor='e', fg='gray')
+        self.render_stats_label.pack(side=tk.RIGHT)
 
         self.angles_deg_range = np.arange(0, 181, 1)
         self.theta_rad_range = self.angles_deg_range * (np.pi / 180.0)
         self.latest_dists = np.full((len(self.angles_deg_range),), np.nan)
         self.last_scan_angle_deg = 0
         self.is_plotting_active = True
+        # 样本到达只标记脏，按目标帧率合并重绘
+        self.render_scheduler = RenderScheduler(self._redraw_radar_plot, self.canvas_widget.after,
+                                                target_fps=RADAR_TARGET_FPS)
+        self.top_level.after(RADAR_STATS_INTERVAL_MS, self._update_render_stats)
 
     def _setup_radar_plot(self):
         self.ax.set_ylim([0.0, RADAR_R_MAX])
@@ -279,8 +507,9 @@ class RadarWindow:
         angles_deg_labels = np.linspace(0.0, 180.0, 7)
         angle_labels_text = [f'{int(deg)}°' for deg in angles_deg_labels]
         self.ax.set_thetagrids(angles_deg_labels, labels=angle_labels_text)
-        self.pols = self.ax.scatter([], [], s=15, c='cyan', alpha=0.75)
-        self.line1, = self.ax.plot([], color='lime', linewidth=2.0)
+        # animated=True: 完整重绘时不画动态元素，背景缓存中只有坐标轴、网格和刻度
+        self.pols = self.ax.scatter([], [], s=15, c='cyan', alpha=0.75, animated=True)
+        self.line1, = self.ax.plot([], color='lime', linewidth=2.0, animated=True)
 
     def _create_radar_controls(self, parent_frame):
         slider_frame = tk.Frame(parent_frame)
@@ -300,12 +529,23 @@ class RadarWindow:
 
     def _send_radar_param(self, prefix, value):
          try:
-             int_value = int(float(value))
-             command_str = f"{prefix}{int_value}\n"
-             self.send_command(command_str)
+             self.send_param(prefix, int(float(value)))
          except ValueError:
              print(f"无效的滑块值: {value}")
 
+    def _on_full_draw(self, event):
+        """完整重绘完成后重新缓存背景，并把动态元素画回去"""
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_animated_artists()
+
+    def _invalidate_background(self, event=None):
+        """窗口缩放后旧背景尺寸不再匹配，下一帧先做一次完整重绘"""
+        self.background = None
+
+    def _draw_animated_artists(self):
+        self.ax.draw_artist(self.pols)
+        self.ax.draw_artist(self.line1)
+
     def update_radar_data(self, angle_deg, distance):
         if not self.is_plotting_active: return
         try:
@@ -316,8 +556,8 @@ class RadarWindow:
                     self.latest_dists[angle_deg] = np.nan
                 else:
                     self.latest_dists[angle_deg] = min(distance, RADAR_R_MAX)
-            # Schedule redraw instead of direct call to avoid GUI freezing
-            self.canvas.get_tk_widget().after(10, self._redraw_radar_plot) # Schedule redraw
+            # 标记需要重绘；同一帧内的多个样本只触发一次重绘
+            self.render_scheduler.mark_dirty()
         except Exception as e:
             print(f"Error updating radar data: {e}")
 
@@ -332,13 +572,31 @@ class RadarWindow:
             self.pols.set_offsets(offsets)
             scan_angle_rad = self.last_scan_angle_deg * (np.pi / 180.0)
             self.line1.set_data([scan_angle_rad, scan_angle_rad], [0, RADAR_R_MAX])
-            self.canvas.draw_idle()
+            if self.background is None:
+                self.canvas.draw()  # 触发 _on_full_draw，重新缓存背景并画出动态元素
+            else:
+                self.canvas.restore_region(self.background)
+                self._draw_animated_artists()
+            self.canvas.blit(self.ax.bbox)
         except Exception as e:
             print(f"Error redrawing radar canvas: {e}")
+            # Blitting 失败时回退到完整重绘
+            self._invalidate_background()
+            self.canvas.draw_idle()
+
+    def _update_render_stats(self):
+        if not self.is_plotting_active or not self.top_level or not self.top_level.winfo_exists():
+            return
+        stats = self.render_scheduler.stats()
+        self.render_stats_label.config(
+            text=f"{stats['achieved_fps']:.1f}/{stats['target_fps']:.0f} FPS  丢帧 {stats['dropped_frames']}  "
+                 f"合并 {stats['coalesced_updates']}  绘制 {stats['last_render_ms']:.1f} ms")
+        self.top_level.after(RADAR_STATS_INTERVAL_MS, self._update_render_stats)
 
     def _handle_close(self):
         print("Radar window closing...");
         self.is_plotting_active = False
+        self.render_scheduler.stop()
         self.on_close_callback() # Notify main app
         # Check if top_level exists before destroying
         if hasattr(self, 'top_level') and self.top_level:
@@ -389,6 +647,13 @@ class DataViewer:
              self.绘图背景图片 = None # 或者尝试加载默认背景
 
 
+        # 历史曲线的内存窗口：打开时 (或改变窗口大小时) 从数据库加载一次，之后由 push_reading 追加新读数
+        self.历史点数 = PLOT_POINTS
+        self.温度缓冲 = deque(maxlen=self.历史点数)
+        self.湿度缓冲 = deque(maxlen=self.历史点数)
+        self.历史已加载 = False
+        self._重绘已安排 = False
+
         self._create_window()
 
     def _create_window(self):
@@ -419,6 +684,13 @@ class DataViewer:
         仪表框架.pack(side=tk.TOP, pady=(15, 5), padx=10, fill=tk.X)
         绘图框架 = tk.Frame(self.top_level)
         绘图框架.pack(side=tk.BOTTOM, pady=(5, 15), padx=10, fill=tk.BOTH, expand=True)
+        点数框架 = tk.Frame(绘图框架)
+        点数框架.pack(side=tk.TOP, anchor=tk.E)
+        tk.Label(点数框架, text="显示点数:").pack(side=tk.LEFT)
+        self.点数选择 = ttk.Combobox(点数框架, values=PLOT_POINTS_CHOICES, width=6, state="readonly")
+        self.点数选择.set(self.历史点数)
+        self.点数选择.bind("<<ComboboxSelected>>", lambda e: self.set_history_size(int(self.点数选择.get())))
+        self.点数选择.pack(side=tk.LEFT)
 
         # --- Gauge Canvas & Widgets ---
         仪表画布高度 = 180
@@ -431,9 +703,10 @@ class DataViewer:
         self.历史曲线画布 = Canvas(绘图框架, width=PLOT_CANVAS_WIDTH, height=PLOT_CANVAS_HEIGHT,
                                      bg="white", highlightthickness=1, highlightbackground="grey")
         self.历史曲线画布.pack()
-        # Note: We need the _绘制历史曲线图 method here or a HistoryPlotter class
+        self.历史曲线图 = HistoryChart(self.历史曲线画布)
 
         # --- Initial Plot ---
+        self._load_history()
         self.redraw_history_plot() # Draw history data on creation
 
     def _create_gauges(self):
@@ -471,7 +744,7 @@ class DataViewer:
         if self.湿度圆形仪表: self.湿度圆形仪表.update_value(humi)
 
     def _fetch_history_data(self):
-        """Fetches recent data from the database."""
+        """Fetches the most recent self.历史点数 readings from the database (oldest first, unpadded)."""
         # (与主应用中的 _获取历史数据 类似，但使用 self.db_connection)
         温度列表, 湿度列表 = [], []
         if not self.db_connection:
@@ -480,13 +753,10 @@ class DataViewer:
             return None, None
         try:
             cursor = self.db_connection.cursor()
-            cursor.execute("SELECT temp FROM temperature ORDER BY id DESC LIMIT ?", (PLOT_POINTS,))
+            cursor.execute("SELECT temp FROM temperature ORDER BY id DESC LIMIT ?", (self.历史点数,))
             温度列表 = [r[0] for r in cursor.fetchall() if r[0] is not None]; 温度列表.reverse()
-            cursor.execute("SELECT humi FROM humidity ORDER BY id DESC LIMIT ?", (PLOT_POINTS,))
+            cursor.execute("SELECT humi FROM humidity ORDER BY id DESC LIMIT ?", (self.历史点数,))
             湿度列表 = [r[0] for r in cursor.fetchall() if r[0] is not None]; 湿度列表.reverse()
-            # Pad with 0.0 as per original main app logic
-            温度列表 = ([0.0] * (PLOT_POINTS - len(温度列表)) + 温度列表)
-            湿度列表 = ([0.0] * (PLOT_POINTS - len(湿度列表)) + 湿度列表)
             return 温度列表, 湿度列表
         except sqlite3.Error as e:
             print(f"ERROR: Failed to read history data in DataViewer: {e}")
@@ -497,149 +767,41 @@ class DataViewer:
             messagebox.showerror("Error", f"An unexpected error occurred fetching history: {e}", parent=self.top_level)
             return None, None
 
+    def _load_history(self):
+        """(重新) 从数据库加载历史窗口到环形缓冲区；只在打开窗口和改变窗口大小时调用"""
+        温度列表, 湿度列表 = self._fetch_history_data()
+        self.历史已加载 = 温度列表 is not None and 湿度列表 is not None
+        self.温度缓冲 = deque(温度列表 or (), maxlen=self.历史点数)
+        self.湿度缓冲 = deque(湿度列表 or (), maxlen=self.历史点数)
+        return self.历史已加载
+
+    def set_history_size(self, 点数):
+        """改变历史窗口大小 (点数)，需要重新从数据库加载"""
+        if 点数 == self.历史点数: return
+        self.历史点数 = 点数
+        self._load_history()
+        self.redraw_history_plot()
+
+    def push_reading(self, 传感器键, 数值):
+        """追加一条新读数 ('temp' 或 'humi') 并安排重绘；不访问数据库"""
+        缓冲 = self.温度缓冲 if 传感器键 == 'temp' else self.湿度缓冲
+        缓冲.append(数值)
+        # 温度和湿度通常相隔很短先后到达，合并为一次重绘
+        if not self._重绘已安排 and self.is_active():
+            self._重绘已安排 = True
+            self.top_level.after_idle(self.redraw_history_plot)
+
     def redraw_history_plot(self):
-        """Fetches data and redraws the history plot."""
+        """Redraws the history plot from the in-memory ring buffers."""
+        self._重绘已安排 = False
         if not (self.is_active() and self.历史曲线画布): return
 
-        温度列表, 湿度列表 = self._fetch_history_data()
-        if 温度列表 is not None and 湿度列表 is not None:
-            # Call the plotting logic (assuming _绘制历史曲线图 is defined here or accessible)
-            self._绘制历史曲线图(self.历史曲线画布, 温度列表, 湿度列表) # Use local method
+        if self.历史已加载:
+            # 缓冲区右对齐到窗口大小，不足部分留空
+            self.历史曲线图.update(self.温度缓冲, self.湿度缓冲, self.历史点数)
         else:
             # If fetching failed, display error on the plot canvas
-            self.历史曲线画布.delete("all")
-            self.历史曲线画布.create_text(PLOT_CANVAS_WIDTH / 2, PLOT_CANVAS_HEIGHT / 2,
-                                        text="无法加载历史数据", fill="red", font=("Segoe UI", 12))
-
-    # --- Need the plotting logic here ---
-    def _绘制历史曲线图(self, 画布, 温度列表, 湿度列表):
-        """在给定的 Canvas 上绘制历史温湿度曲线图 (已修正格式)"""
-        # 1. 清空画布
-        画布.delete("all")
-
-        # 2. 计算绘图区域尺寸和坐标
-        绘图宽度 = PLOT_CANVAS_WIDTH - 2 * PLOT_MARGIN
-        绘图高度 = PLOT_CANVAS_HEIGHT - 2 * PLOT_MARGIN
-        X起始 = PLOT_MARGIN
-        Y起始 = PLOT_MARGIN  # 画布顶部 Y 坐标
-        X结束 = PLOT_MARGIN + 绘图宽度
-        Y结束 = PLOT_MARGIN + 绘图高度  # 画布底部 Y 坐标
-
-        # 3. 绘制坐标轴线
-        画布.create_line(X起始, Y结束, X结束, Y结束, fill=PLOT_AXIS_COLOR, width=1)  # X 轴
-        画布.create_line(X起始, Y起始, X起始, Y结束, fill=PLOT_AXIS_COLOR, width=1)  # Y 轴
-
-        # 4. 计算 Y 轴范围
-        # 过滤掉填充值 (0.0) 来确定实际数据范围
-        绘图数据 = [v for v in 温度列表 + 湿度列表 if isinstance(v, (int, float)) and v != 0.0]
-        if not 绘图数据:
-            # 如果没有有效数据，设置默认范围
-            最小值 = 0.0
-            最大值 = 10.0
-        else:
-            最小值 = min(绘图数据)
-            最大值 = max(绘图数据)
-
-        # 确保有最小范围并增加边界
-        if 最大值 <= 最小值:
-            最大值 = 最小值 + 1.0
-        值范围 = 最大值 - 最小值
-        Y轴最小值 = 最小值 - 值范围 * 0.1
-        Y轴最大值 = 最大值 + 值范围 * 0.1
-        Y轴范围 = Y轴最大值 - Y轴最小值
-        Y轴范围 = max(Y轴范围, 1.0)  # 最小范围为 1
-
-        # 5. 计算缩放比例和 X 轴步长
-        Y缩放 = 绘图高度 / Y轴范围 if Y轴范围 != 0 else 1
-        X增量 = 绘图宽度 / (PLOT_POINTS - 1) if PLOT_POINTS > 1 else 绘图宽度
-
-        # 6. 绘制 Y 轴刻度和网格线
-        Y刻度数 = 5  # 绘制 6 个标签
-        for i in range(Y刻度数 + 1):
-            值 = Y轴最小值 + (Y轴范围 * i / Y刻度数)
-            y = Y结束 - (值 - Y轴最小值) * Y缩放  # 计算 Y 坐标
-            if Y起始 - 5 < y < Y结束 + 5:  # 检查是否在可见范围内
-                # 绘制刻度短线
-                画布.create_line(X起始 - 5, y, X起始, y, fill=PLOT_AXIS_COLOR)
-                # 绘制刻度标签
-                画布.create_text(X起始 - 10, y, text=f"{值:.1f}", anchor=tk.E, font=("Segoe UI", 7))
-                # 绘制水平网格线 (虚线)
-                if i > 0:  # 不绘制在 X 轴上的网格线
-                    画布.create_line(X起始, y, X结束, y, fill=PLOT_GRID_COLOR, dash=(2, 2))
-
-        # 7. 绘制 X 轴刻度和标签
-        X刻度数 = 10  # 大约显示 10 个标签
-        X刻度间隔 = max(1, (PLOT_POINTS - 1) // X刻度数 if PLOT_POINTS > 1 else 1)
-        for i in range(PLOT_POINTS):
-            x = X起始 + i * X增量
-            # 每隔一定间隔或最后一个点绘制标签
-            if i % X刻度间隔 == 0 or i == PLOT_POINTS - 1:
-                # 绘制刻度短线
-                画布.create_line(x, Y结束, x, Y结束 + 5, fill=PLOT_AXIS_COLOR)
-                # 绘制刻度标签 (数据点索引 1 到 N)
-                画布.create_text(x, Y结束 + 10, text=str(i + 1), anchor=tk.N, font=("Segoe UI", 7))
-
-        # 8. 定义内部函数用于绘制单条曲线
-        def 绘制曲线(数据, 颜色):
-            点列表 = []
-            找到有效点 = False  # Track if we've started plotting non-padding data
-            for i, 值 in enumerate(数据):
-                # Check if the value is valid for plotting
-                is_valid_point = isinstance(值, (int, float)) and 值 != 0.0  # Original logic used 0.0 as padding
-
-                # Start accumulating points only after the first valid point is found
-                if not 找到有效点 and is_valid_point:
-                    找到有效点 = True
-
-                if 找到有效点:
-                    if is_valid_point:
-                        # Calculate canvas coordinates
-                        x = X起始 + i * X增量
-                        y_scaled = (值 - Y轴最小值) * Y缩放
-                        y = Y结束 - max(0, min(绘图高度, y_scaled))  # Clamp Y within plot area
-
-                        # Add point to the current line segment
-                        点列表.extend([x, y])
-                    else:
-                        # If an invalid point (padding 0.0 or None) is encountered after starting,
-                        # draw the segment accumulated so far and reset.
-                        if len(点列表) >= 4:  # Need at least 2 points (4 coords)
-                            try:
-                                画布.create_line(点列表, fill=颜色, width=2, smooth=False)
-                            except tk.TclError:
-                                pass  # Ignore error if canvas destroyed
-                        点列表 = []  # Start new segment
-
-            # Draw the last segment if it contains points
-            if len(点列表) >= 4:
-                try:
-                    画布.create_line(点列表, fill=颜色, width=2, smooth=False)
-                except tk.TclError:
-                    pass
-
-        # 9. 调用内部函数绘制温度和湿度曲线
-        绘制曲线(温度列表, PLOT_TEMP_COLOR)
-        绘制曲线(湿度列表, PLOT_HUMI_COLOR)
-
-        # --- 这段绘制最后一个点列表的代码似乎有问题，注释掉 ---
-        # if '点列表' in locals() and len(点列表) >= 4:
-        #     # fill 使用了湿度列表最后一个值，这很奇怪，应该是颜色
-        #     # 而且绘制曲线函数内部已经处理了最后一个段
-        #     # 画布.create_line(点列表, fill=湿度列表[-1], width=2, smooth=False) # Draw last segment
-        #     pass
-
-        # 10. 绘制图例
-        图例Y = Y起始 - 15
-        图例X起始 = X起始 + 10
-        # 温度图例
-        画布.create_line(图例X起始, 图例Y, 图例X起始 + 20, 图例Y, fill=PLOT_TEMP_COLOR, width=2)
-        画布.create_text(图例X起始 + 25, 图例Y, text="温度 (°C)", fill=PLOT_TEMP_COLOR, anchor=tk.W,
-                         font=("Segoe UI", 8))
-        # 湿度图例
-        图例X起始 += 100  # 调整水平间距
-        画布.create_line(图例X起始, 图例Y, 图例X起始 + 20, 图例Y, fill=PLOT_HUMI_COLOR, width=2)
-        画布.create_text(图例X起始 + 25, 图例Y, text="湿度 (%)", fill=PLOT_HUMI_COLOR, anchor=tk.W,
-                         font=("Segoe UI", 8))
+            self.历史曲线图.show_message("无法加载历史数据")
 
     def destroy(self):
         """Destroys the Toplevel window."""
@@ -678,15 +840,20 @@ class ArduinoMonitorApp:
         self.arduino串口 = None
         self.串口号 = None
 
-        # 队列
-        self.响应队列 = queue.Queue()
+        # 队列 (后台线程只在队列由空变为非空时唤醒 Tk 事件循环)
+        self.响应队列 = ResponseDispatcher(wake_callback=self._唤醒响应处理)
+        # 状态日志 (任意线程写入，日志区定时批量显示，完整历史写入滚动文件)
+        self.日志缓冲 = StatusLogBuffer(max_pending=LOG_PANE_MAX_LINES, log_file=LOG_FILE_NAME,
+                                    max_bytes=LOG_FILE_MAX_BYTES, backup_count=LOG_FILE_BACKUP_COUNT)
+        self.日志区 = None
 
         # 数据视图状态 (分开写)
         self.数据视图激活 = False
         self.数据视图任务ID = None
 
         # 数据库相关 (分开写)
-        self.数据库连接 = None
+        self.本地写入器 = None  # 写入线程独占写连接
+        self.数据库连接 = None  # 仅供主线程读取历史数据
         self.数据库游标 = None
 
         # 数据视图窗口引用
@@ -697,13 +864,24 @@ class ArduinoMonitorApp:
         self.socket连接中 = False
         self.socket运行中 = False
         self.socket接收线程 = None
+        self.上行发件箱 = None
+        self.上行发送器 = None  # 发送线程，唯一向 socket 写数据的地方
 
         # 雷达状态 (分开写)
         self.radar_window = None
         self.is_radar_mode_active = False
-        self.last_alarm_level = 0
+        # 报警在串口读取线程上评估并直接写串口，不等待 Tk 事件循环
+        self.串口写锁 = threading.Lock()  # 发送命令 (GUI 线程)、报警命令 (读取线程) 与参数命令 (写入线程) 互斥
+        self.报警控制 = AlarmController(
+            AlarmEngine(hysteresis=ALARM_HYSTERESIS_CM, dwell_s=ALARM_DWELL_S, window_s=ALARM_WINDOW_S,
+                        max_sweep_s=ALARM_MAX_SWEEP_S),
+            self._写串口命令, command_prefix=CMD_ALARM_PREFIX, on_transition=self._报警级别已切换)
+        # 雷达滑块参数 (A/a/S/D) 由写入线程合并、限速发送，并根据 OK/ERR 应答记录实际生效的值
+        self.参数写入器 = CommandWriter(self._写串口命令, on_ack=self._参数应答)
+        self.参数写入器.start()
 
         # --- 初始化流程 ---
+        self._安装响应唤醒()  # 在任何后台线程启动之前
         self._加载所有图片()
         self._设置背景图片()
         self._设置数据库()
@@ -711,34 +889,64 @@ class ArduinoMonitorApp:
         self._创建界面控件()
         self._启动串口读取线程()
         if USE_SOCKET:
+            self._打开上行发件箱()
+            self._启动上行发送器()
             self._启动Socket客户端()
 
-        self.主窗口.after(RESPONSE_POLL_INTERVAL, self._处理响应队列)
+        self.主窗口.after(RESPONSE_SAFETY_POLL_MS, self._响应队列兜底轮询)
         self.主窗口.protocol("WM_DELETE_WINDOW", self._窗口关闭处理)
 
     # --- 图片处理 ---
     def _加载图片(self, 文件路径, 调整尺寸=None):
+        """
+        加载 (并按需缩放) 图片。缩放结果按 "源文件哈希 + 目标尺寸" 缓存在 IMAGE_CACHE_DIR，
+        缓存为 Tk 可直接读取的格式 (无透明通道用 PPM，有透明通道用 PNG)，
+        命中时不需要导入 PIL，也不需要重新解码 JPEG 或重采样。
+        """
         脚本目录 = os.path.dirname(__file__)
         完整路径 = os.path.join(脚本目录, 文件路径)
         if not os.path.exists(完整路径):
             print(f"错误: 图片文件未找到 '{完整路径}'")
             return None
         try:
-            图片 = Image.open(完整路径)
-            if 调整尺寸:
-                图片.thumbnail(调整尺寸, Image.Resampling.LANCZOS)
-            return ImageTk.PhotoImage(图片)
+            with open(完整路径, 'rb') as f:
+                源哈希 = hashlib.sha1(f.read()).hexdigest()[:16]
+            尺寸标记 = f"{调整尺寸[0]}x{调整尺寸[1]}" if 调整尺寸 else "orig"
+            缓存前缀 = os.path.join(IMAGE_CACHE_DIR, f"{os.path.splitext(文件路径)[0]}_{源哈希}_{尺寸标记}")
+            for 扩展名 in ('.ppm', '.png'):
+                if os.path.exists(缓存前缀 + 扩展名):
+                    try:
+                        return tk.PhotoImage(file=缓存前缀 + 扩展名)
+                    except tk.TclError:
+                        os.remove(缓存前缀 + 扩展名)  # 缓存损坏，重新生成
+            return tk.PhotoImage(file=self._生成缓存图片(完整路径, 调整尺寸, 缓存前缀))
         except Exception as e:
             print(f"加载图片时出错 '{完整路径}': {e}")
             return None
 
+    def _生成缓存图片(self, 完整路径, 调整尺寸, 缓存前缀):
+        """缓存未命中：用 PIL 解码和缩放，写入缓存文件并返回其路径。"""
+        from PIL import Image
+        图片 = Image.open(完整路径)
+        if 调整尺寸:
+            图片.thumbnail(调整尺寸, Image.Resampling.LANCZOS)
+        有透明通道 = 图片.mode in ('RGBA', 'LA', 'P')
+        图片 = 图片.convert('RGBA' if 有透明通道 else 'RGB')
+        缓存路径 = 缓存前缀 + ('.png' if 有透明通道 else '.ppm')
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        临时路径 = f"{缓存路径}.{os.getpid()}.tmp"
+        图片.save(临时路径, format='PNG' if 有透明通道 else 'PPM')
+        os.replace(临时路径, 缓存路径)  # 原子替换，并发启动时不会读到半个文件
+        print(f"已生成图片缓存: {os.path.basename(缓存路径)}")
+        return 缓存路径
+
     def _加载所有图片(self):
         """加载所有需要的图片资源"""
         print("正在加载图片资源...")
         self.背景图片 = self._加载图片(BG_IMG_FILENAME)
         self.灯灭图片 = self._加载图片(LIGHT_OFF_IMG_FILENAME, IMAGE_STATUS_SIZE)
         self.灯亮图片 = self._加载图片(LIGHT_ON_IMG_FILENAME, IMAGE_STATUS_SIZE)
-        self.绘图背景图片 = self._加载图片(BG_IMG_FILENAME) # For data view window
+        self.绘图背景图片 = self.背景图片 # 数据视图窗口复用同一个 PhotoImage，不再重复加载
         按钮文件信息 = {
             'on': BTN_ON_IMG_FILENAME, 'off': BTN_OFF_IMG_FILENAME,
             'temp': BTN_TEMP_IMG_FILENAME, 'humi': BTN_HUM_IMG_FILENAME,
@@ -754,46 +962,56 @@ class ArduinoMonitorApp:
         """
         将 Python 字典（payload）包装后转换为 JSON 字符串，编码后通过 Socket 发送。
         :param payload_data: 要作为 "payload" 发送的 Python 字典。
-        :return: True 如果发送尝试成功，False 如果失败。
+        只放入发送线程的队列，不在调用线程 (通常是 Tk 主线程) 上等待网络；
+        未连接时 (或发送失败时) 数据由发送线程转存到磁盘发件箱，重连后重放。
+        :return: True 如果已入队，False 如果失败或被丢弃。
         """
         if not USE_SOCKET:
             # print("DEBUG: Socket功能未启用，不发送数据。") # 可选
             return False
 
-        if not (self.客户端socket and self.socket连接中):
-            # print("DEBUG: _send_json_to_socket - Socket 未连接，无法发送。") # 可选
-            # self._更新状态栏("Socket 未连接，无法发送数据。", "orange") # 可选
-            return False
-
         try:
-            # 构建完整的发送数据结构
-            完整数据 = {
-                "deviceId": DEVICE_ID, # 使用类/全局常量 DEVICE_ID
-                "timestamp": datetime.datetime.now().isoformat(), # 标准 ISO 8601
-                "payload": payload_data # 原始数据作为 payload
-            }
-            # 转换为 JSON 字符串
-            json_payload_str = json.dumps(完整数据)
-            # 编码为 UTF-8 字节串，并添加换行符 (服务器端可能按行读取)
-            byte_payload = json_payload_str.encode('utf-8') + b'\n'
-
-            # 发送数据
-            self.客户端socket.sendall(byte_payload) # sendall 确保全部发送
-            # print(f"Socket: 已发送数据: {json_payload_str}") # 可选的成功日志，调试时取消注释
-            return True # <--- *** 正确的位置 ***
-
-        except json.JSONDecodeError as json_e: # 虽然是编码，但捕获以防万一
+            # 包装为 {"deviceId", "timestamp", "payload"} 的 JSON 行 (服务器按行读取)
+            byte_payload = build_uplink_envelope(DEVICE_ID, payload_data)
+        except (TypeError, ValueError) as json_e:
              self._更新状态栏(f"Socket: JSON 编码错误: {json_e}", "red")
              return False
+
+        if not self.上行发送器:
+            return False
+        # 雷达样本可以在拥塞时丢弃，温湿度读数从不丢弃
+        return self.上行发送器.send(byte_payload, droppable=payload_data.get("type") == "radar")
+
+    def _写入socket(self, 数据):
+        """(发送线程) 把一批数据写入当前连接。未连接或写入失败返回 False。"""
+        sock = self.客户端socket
+        if not (sock and self.socket连接中):
+            return False
+        try:
+            sock.sendall(数据) # sendall 确保全部发送
+            return True
         except (socket.error, BrokenPipeError, ConnectionResetError) as sock_e:
-            # 发送失败，通常意味着连接已中断
-            # self._更新状态栏(f"Socket: 发送数据失败: {sock_e}", "orange") # 减少日志，让主socket循环处理
+            # 发送失败，通常意味着连接已中断；接收线程会负责重连
             self.socket连接中 = False # 标记连接可能已断开
             return False
-        except Exception as e:
-            # 其他发送错误
-            self._更新状态栏(f"Socket: 发送数据时发生未知错误: {e}", "red")
-            return False
+
+    def _打开上行发件箱(self):
+        try:
+            self.上行发件箱 = UplinkOutbox(OUTBOX_DB_NAME, max_rows=OUTBOX_MAX_ROWS)
+            积压 = self.上行发件箱.pending()
+            if 积压: print(f"上行发件箱中有 {积压} 条待重放数据。")
+        except sqlite3.Error as e:
+            print(f"无法打开上行发件箱 '{OUTBOX_DB_NAME}': {e}，断线期间的数据将被丢弃。")
+            self.上行发件箱 = None
+
+    def _启动上行发送器(self):
+        self.上行发送器 = UplinkSender(
+            self._写入socket, outbox=self.上行发件箱,
+            flush_interval_s=UPLINK_FLUSH_INTERVAL_S, batch_size=UPLINK_BATCH_SIZE,
+            max_queue=UPLINK_MAX_QUEUE, overflow_policy=UPLINK_OVERFLOW_POLICY,
+            replay_batch=OUTBOX_REPLAY_BATCH, replay_rate=OUTBOX_REPLAY_RATE,
+            status_callback=lambda 信息: self._更新状态栏(f"Socket: {信息}", "green"))
+        self.上行发送器.start()
 
     # --- 新增：处理从 Socket 服务器收到的消息 (占位符) ---
     # --- 处理从 Socket 服务器收到的消息 ---
@@ -886,77 +1104,75 @@ class ArduinoMonitorApp:
 
     # --- 设置与核心逻辑 ---
     def _设置数据库(self):
-        """连接或创建 SQLite 数据库并创建表"""
-        try:
-            self.数据库连接 = sqlite3.connect(DB_NAME, timeout=10.0, check_same_thread=False)
-            self.数据库游标 = self.数据库连接.cursor()
-            表结构 = {
-                'temperature': 'temp REAL NOT NULL',
-                'humidity': 'humi REAL NOT NULL'
-            }
-        except sqlite3.Error as e:
-            messagebox.showerror("数据库错误", f"数据库连接失败: {e}")
+        """启动本地数据库写入线程 (负责建表和所有写入)，并打开主线程使用的只读连接"""
+        self.本地写入器 = LocalStorageWriter(
+            DB_NAME, SENSOR_SCHEMA_STATEMENTS, batch_size=LOCAL_DB_BATCH_SIZE, flush_interval_s=LOCAL_DB_FLUSH_INTERVAL_S,
+            error_callback=lambda 信息: self.响应队列.put(("ERROR", f"本地数据库 - {信息}")))
+        self.本地写入器.start()
+        # 只在启动时等待一次建表完成
+        if not self.本地写入器.ready.wait(timeout=10.0) or self.本地写入器.init_error:
+            messagebox.showerror("数据库错误", f"数据库初始化失败: {self.本地写入器.init_error or '超时'}")
             self.主窗口.quit()
             return
 
         try:
-            for 表名, 字段定义 in 表结构.items():
-                sql = f'''CREATE TABLE IF NOT EXISTS {表名} (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            {字段定义},
-                            t TEXT NOT NULL
-                        )'''
-                self.数据库游标.execute(sql)
-            self.数据库连接.commit()
-            print(f"数据库 '{DB_NAME}' 连接成功并检查/创建表完成。")
+            self.数据库连接 = sqlite3.connect(DB_NAME, timeout=10.0)
+            self.数据库游标 = self.数据库连接.cursor()
+            print(f"数据库 '{DB_NAME}' 连接成功并检查/创建表完成 (WAL 模式，后台批量写入)。")
         except sqlite3.Error as e:
-            messagebox.showerror("数据库错误", f"创建表失败: {e}")
-            if self.数据库连接:
-                 self.数据库连接.close()
-            self.主窗口.quit()
-        except Exception as e_create:
-            messagebox.showerror("未知错误", f"创建数据库表时发生错误: {e_create}")
-            if self.数据库连接:
-                 self.数据库连接.close()
+            messagebox.showerror("数据库错误", f"数据库连接失败: {e}")
             self.主窗口.quit()
+            return
+        self.主窗口.after(LOCAL_DB_STATS_INTERVAL_MS, self._报告本地存储统计)
+
+    def _报告本地存储统计(self):
+        """定期输出本地数据库写入线程的批次和延迟统计，以及上行发送线程的计数"""
+        if not self.本地写入器: return
+        if self.上行发送器:
+            上行 = self.上行发送器.stats()
+            print(f"上行发送: 入队 {上行['queued']}, 已发送 {上行['sent']}, 丢弃 {上行['dropped']}, "
+                  f"转存 {上行['spilled']}, 重放 {上行['replayed']}, 写入次数 {上行['writes']}, "
+                  f"排队 {上行['pending']}, 离线积压 {上行['backlog']}, 出错 {上行['errors']}")
+        参数 = self.参数写入器.stats()
+        if 参数['submitted']:
+            print(f"参数命令: 提交 {参数['submitted']}, 合并 {参数['coalesced']}, 省略 {参数['skipped']}, "
+                  f"已发送 {参数['sent']}, 接受 {参数['acked']}, 拒绝 {参数['rejected']}, "
+                  f"应答超时 {参数['timeouts']}, 已生效 {参数['applied']}")
+        报警 = self.报警控制.stats()
+        if 报警['latency_ms']:
+            print(f"报警命令: 已发送 {报警['sent']}, 失败 {报警['failed']}, 样本到命令延迟 "
+                  f"p50 {报警['latency_ms']['p50']:.2f} ms / p99 {报警['latency_ms']['p99']:.2f} ms / "
+                  f"max {报警['latency_ms']['max']:.2f} ms")
+        统计 = self.本地写入器.stats()
+        if 统计['write_latency_ms']:
+            print(f"本地存储: 已写入 {统计['written']} 条 / {统计['batches']} 批, 排队 {统计['queued']}, "
+                  f"丢弃 {统计['dropped']}, 失败 {统计['failed']}, "
+                  f"写入延迟 p50 {统计['write_latency_ms']['p50']:.1f} ms / p99 {统计['write_latency_ms']['p99']:.1f} ms, "
+                  f"提交耗时 p99 {统计['commit_ms']['p99']:.1f} ms")
+        if hasattr(self, '主窗口') and self.主窗口.winfo_exists():
+            self.主窗口.after(LOCAL_DB_STATS_INTERVAL_MS, self._报告本地存储统计)
 
 
     def _查找并连接Arduino(self):
-        """自动查找可能的 Arduino 端口并尝试连接"""
-        print("正在查找 Arduino 端口...")
-        可用端口 = serial.tools.list_ports.comports()
-        目标端口 = None
-        for p in 可用端口:
-            # 使用更安全的访问方式，并处理 None 的情况
-            desc = p.description or ""
-            dev = p.device or ""
-            print(f"  检测到端口: {dev} - {desc}")
-            if any(k.lower() in desc.lower() or k.lower() in dev.lower() for k in ARDUINO_KEYWORDS):
-                目标端口 = p.device
-                print(f"  找到可能的 Arduino 端口: {目标端口}")
-                break
-
-        if 目标端口:
-            try:
-                self.arduino串口 = serial.Serial(目标端口, ARDUINO_BAUDRATE, timeout=SERIAL_TIMEOUT)
-                time.sleep(2)
-            except serial.SerialException as e:
-                self._更新状态栏(f"错误: 连接到 {目标端口} 失败: {e}", "red")
-                self.arduino串口 = None
-                return
-            except Exception as e:
-                self._更新状态栏(f"错误: 连接时发生未知错误: {e}", "red")
-                self.arduino串口 = None
-                return
+        """查找 Arduino 端口并完成 PING?/PONG! 握手 (先试缓存的端口，再并行探测 VID/PID 匹配的端口)"""
+        if ARDUINO_PORT:
+            print(f"使用指定的串口: {ARDUINO_PORT}")
+        else:
+            print("正在查找 Arduino 端口...")
+        try:
+            结果 = discover_arduino(ARDUINO_PORT, baud_rate=ARDUINO_BAUDRATE, timeout=SERIAL_TIMEOUT)
+        except Exception as e:
+            self._更新状态栏(f"错误: 查找串口时发生未知错误: {e}", "red")
+            self.arduino串口 = None
+            return
 
-            if self.arduino串口 and self.arduino串口.is_open: # Double check after creation
-                self.串口号 = 目标端口
-                self._更新状态栏(f"成功连接到 Arduino ({self.串口号})")
-            else: # Should not happen if Serial() succeeded, but good practice
-                self.arduino串口 = None
-                self._更新状态栏("错误: 无法打开串口。", "red")
+        if 结果:
+            # 握手成功说明固件已在运行，不需要再等待复位
+            self.arduino串口 = 结果.serial
+            self.串口号 = 结果.device
+            self._更新状态栏(f"成功连接到 Arduino ({self.串口号}, 握手 {结果.elapsed_s * 1000:.0f} ms)")
         else:
-            self._更新状态栏("错误: 未找到 Arduino 端口。请检查连接和驱动。", "red")
+            self._更新状态栏("错误: 未找到应答的 Arduino 端口。请检查连接和驱动。", "red")
             self.arduino串口 = None
 
     def _创建界面控件(self):
@@ -1017,30 +1233,34 @@ class ArduinoMonitorApp:
         日志高度 = 150
         self.日志文本框 = scrolledtext.ScrolledText(self.主窗口, height=1, wrap=tk.WORD, state=tk.DISABLED, font=("Consolas", 9), borderwidth=1, relief=tk.SUNKEN)
         self.日志文本框.place(relx=0.5, rely=1.0, y=-日志Y偏移, anchor="center", relwidth=0.9, height=日志高度)
+        self.日志区 = LogPane(self.日志文本框, self.日志缓冲)
 
     # --- 线程与串口 ---
     def _启动串口读取线程(self): # ... (内容不变) ...
         if self.arduino串口 and self.arduino串口.is_open: self.串口运行中 = True; self.串口读取线程 = threading.Thread(target=self._读取串口数据, daemon=True); self.串口读取线程.start(); print("串口读取线程已启动。")
         else: print("串口未连接，无法启动读取线程。")
-    def _读取串口数据(self): # ... (内容不变, 包含雷达判断) ...
+    def _读取串口数据(self):
+        """批量读取串口字节并增量切分成行，按格式分发到响应队列"""
         print("串口读取线程任务已启动。")
+        分帧器 = SerialLineFramer()
         while self.串口运行中:
             if not (self.arduino串口 and self.arduino串口.is_open): time.sleep(1); continue
             try:
-                if (self.arduino串口.in_waiting > 0):
-                    响应 = self.arduino串口.readline().decode('utf-8', errors='ignore').strip()
-                    if 响应:
-                        # Simple check for potential radar data "angle,distance"
-                        is_radar_like = False
-                        if ',' in 响应:
-                            parts = 响应.split(',')
-                            if len(parts) == 2:
-                                try: float(parts[0]); float(parts[1]); is_radar_like = True
-                                except ValueError: pass # Not two numbers
-                        # Route data based on format and radar mode
-                        if is_radar_like:
-                            if self.is_radar_mode_active: self.响应队列.put(("RADAR_DATA", 响应))
-                        else: self.响应队列.put(("SERIAL", 响应))
+                # 有数据时一次读完缓冲区；没有数据时阻塞等待至少 1 字节 (受 SERIAL_TIMEOUT 限制)
+                数据 = self.arduino串口.read(self.arduino串口.in_waiting or 1)
+                if not 数据:
+                    continue
+                读入时间 = time.perf_counter()
+                for 响应 in 分帧器.feed(数据):
+                    # Route data based on format and radar mode
+                    if is_radar_line(响应):
+                        if self.is_radar_mode_active:
+                            # Arduino 的无效标记转换为 None；报警在这里评估，雷达视图和上传仍交给 GUI 线程
+                            angle, dist = parse_radar_line(响应, RADAR_INVALID_MARKER)
+                            self.报警控制.on_sample(dist, 读入时间, angle)
+                            self.响应队列.put(("RADAR_DATA", (angle, dist)))
+                    elif not self.参数写入器.handle_response(响应):  # 参数应答由写入器记录，不进入队列
+                        self.响应队列.put(("SERIAL", 响应))
             except serial.SerialException as e:
                 if self.串口运行中:
                     self.响应队列.put(("ERROR", f"SerialException - {e}"))
@@ -1053,7 +1273,6 @@ class ArduinoMonitorApp:
             except Exception as e:
                 if self.串口运行中: self.响应队列.put(("ERROR", f"Exception - {e}"))
                 break
-            time.sleep(0.01) # Slightly shorter sleep for responsiveness
         self.串口运行中 = False; print("串口读取线程任务已结束。")
 
     # --- Socket 客户端 ---
@@ -1091,9 +1310,11 @@ class ArduinoMonitorApp:
                 self.客户端socket = None
                 self.socket连接中 = False
             if not self.socket运行中: break
-            self._更新状态栏(f"Socket: {SOCKET_RECONNECT_INTERVAL} 秒后重连...", "orange")
+            积压 = self.上行发件箱.pending() if self.上行发件箱 else 0
+            self._更新状态栏(f"Socket: {SOCKET_RECONNECT_INTERVAL} 秒后重连... (离线缓存 {积压} 条)", "orange")
             for _ in range(SOCKET_RECONNECT_INTERVAL):
-                 if not self.socket运行中: break; time.sleep(1)
+                 if not self.socket运行中: break
+                 time.sleep(1)
             if not self.socket运行中: break
         print("Socket 客户端线程已停止。"); self.客户端socket = None; self.socket连接中 = False
     def _停止Socket客户端(self): # ... (内容不变) ...
@@ -1114,19 +1335,82 @@ class ArduinoMonitorApp:
         self.客户端socket = None; self.socket连接中 = False
 
     # --- 响应处理 ---
-    def _解析响应(self, 响应字符串): # ... (内容不变) ...
-        数据字典 = {}; 部分列表 = [部分 for 部分 in 响应字符串.split(';') if 部分];
-        for 部分 in 部分列表:
-            if '=' in 部分:
-                try: 键, 值 = 部分.split('=', 1); 数据字典[键.strip()] = 值.strip()
-                except ValueError: print(f"警告: 解析响应部分格式无效: '{部分}'")
-        return 数据字典
-
-    def _处理响应队列(self):
-        """定时从队列中获取并处理所有类型的消息"""
+    def _解析响应(self, 响应字符串):
+        return parse_sensor_response(响应字符串)
+
+    def _安装响应唤醒(self):
+        """
+        (GUI 线程) 准备后台线程唤醒 Tk 事件循环的方式，后台线程本身从不调用 Tk：
+        从非 Tk 线程调用 event_generate 等方法会阻塞到 Tk 线程处理完为止 (主循环启动前也一样)。
+        POSIX 上用自管道 + createfilehandler，后台线程只写一个字节；
+        没有 createfilehandler 时 (Windows)，后台线程只设置标志，由 GUI 线程每 RESPONSE_WAKE_POLL_MS 检查一次。
+        """
+        self.响应唤醒标志 = threading.Event()
+        self.响应唤醒管道 = None
+        if os.name == 'posix' and hasattr(self.主窗口.tk, 'createfilehandler'):
+            读端, 写端 = os.pipe()
+            os.set_blocking(读端, False)
+            os.set_blocking(写端, False)
+            self.主窗口.tk.createfilehandler(读端, tk.READABLE, self._响应唤醒管道可读)
+            self.响应唤醒管道 = (读端, 写端)
+        else:
+            self.主窗口.after(RESPONSE_WAKE_POLL_MS, self._检查响应唤醒标志)
+
+    def _唤醒响应处理(self):
+        """(后台线程调用) 响应队列由空变为非空时唤醒 GUI 线程，不阻塞、不调用 Tk"""
+        管道 = self.响应唤醒管道
+        if 管道 is None:
+            self.响应唤醒标志.set()
+            return
         try:
-            while True:
-                来源, 消息体 = self.响应队列.get_nowait()
+            os.write(管道[1], b'\0')
+        except OSError:
+            pass  # 管道已满 (已有未处理的唤醒) 或已关闭；兜底轮询会处理遗留消息
+
+    def _响应唤醒管道可读(self, 文件, 掩码):
+        """(GUI 线程) 清空唤醒管道并处理响应队列"""
+        try:
+            os.read(self.响应唤醒管道[0], 4096)
+        except (OSError, TypeError):
+            return
+        self._处理响应队列()
+
+    def _检查响应唤醒标志(self):
+        """(GUI 线程) 没有 createfilehandler 时的唤醒方式"""
+        if self.响应唤醒标志.is_set():
+            self.响应唤醒标志.clear()
+            self._处理响应队列()
+        if self.主窗口.winfo_exists():
+            self.主窗口.after(RESPONSE_WAKE_POLL_MS, self._检查响应唤醒标志)
+
+    def _关闭响应唤醒(self):
+        """(GUI 线程) 注销并关闭唤醒管道"""
+        管道, self.响应唤醒管道 = self.响应唤醒管道, None
+        if 管道 is None:
+            return
+        try:
+            self.主窗口.tk.deletefilehandler(管道[0])
+        except tk.TclError:
+            pass
+        for fd in 管道:
+            os.close(fd)
+
+    def _响应队列兜底轮询(self):
+        """低频兜底：万一唤醒事件丢失，也能处理积压的消息"""
+        if self.响应队列.has_pending():
+            self._处理响应队列()
+        if hasattr(self, '主窗口') and self.主窗口.winfo_exists():
+            self.主窗口.after(RESPONSE_SAFETY_POLL_MS, self._响应队列兜底轮询)
+
+    def _处理响应队列(self, event=None):
+        """按优先级处理一批消息 (传感器 > 雷达 > 其他)，受时间预算限制，剩余部分在下一个 tick 继续"""
+        截止时间 = time.perf_counter() + RESPONSE_BATCH_BUDGET_MS / 1000.0
+        try:
+            while time.perf_counter() < 截止时间:
+                条目 = self.响应队列.pop()
+                if 条目 is None:
+                    break
+                来源, 消息体 = 条目
 
                 if 来源 == "ERROR":
                     # ... (错误处理保持不变) ...
@@ -1146,53 +1430,17 @@ class ArduinoMonitorApp:
                             self._处理传感器数据(数据, 数据.get('command')) # 处理键值对数据
 
                 elif 来源 == "RADAR_DATA":
-                    # 当收到雷达数据时
-                    angle, dist = None, None # 初始化
-                    try:
-                        angle_str, dist_str = 消息体.split(',')
-                        angle = float(angle_str)
-                        dist_float = float(dist_str)
-                        # 转换 Arduino 的无效标记为 None
-                        if dist_float >= RADAR_INVALID_MARKER:
-                             dist = None
-                        else:
-                             dist = dist_float
-                    except ValueError:
-                        print(f"警告: 无法解析雷达数据: {消息体}")
-                        dist = None # 解析失败也视为无效
-                    except Exception as e:
-                        print(f"处理雷达数据时出错: {e}")
-                        dist = None
+                    # 当收到雷达数据时 (读取线程已解析并评估报警)
+                    angle, dist = 消息体
 
                     # --- 更新雷达窗口 (如果存在) ---
                     if self.is_radar_mode_active and self.radar_window and self.radar_window.top_level.winfo_exists():
                         if angle is not None: # 确保角度有效
                             self.radar_window.update_radar_data(angle, dist) # 传递原始解析或 None
 
-                    # <<< 新增：计算并发送报警级别 >>>
-                    current_alarm_level = 0 # 默认级别 0 (关)
-                    if dist is not None and 0 < dist <= 100: # 检查距离有效且在报警范围内
-                        if dist <= 30:       # 0 < dist <= 30
-                            current_alarm_level = 3 # 快
-                        elif dist <= 60:     # 30 < dist <= 60
-                            current_alarm_level = 2 # 中
-                        else:                # 60 < dist <= 100
-                            current_alarm_level = 1 # 慢
-
-                    # 仅当报警级别发生变化时发送命令
-                    if current_alarm_level != self.last_alarm_level:
-                        alarm_command = f"{CMD_ALARM_PREFIX}{current_alarm_level}\n" # 构建命令 "ALARM X\n"
-                        if self.发送命令(alarm_command): # 发送命令
-                            self.last_alarm_level = current_alarm_level # 更新 Python 端记录的级别
-                            self._更新状态栏(f"设置报警级别: {current_alarm_level}", "orange")
-                        else:
-                             # 发送失败的处理 (可选)
-                             print(f"发送 ALARM 命令失败: {alarm_command.strip()}")
-                    # <<< 结束新增报警逻辑 >>>
-
                     # --- 发送雷达数据到 Socket (如果启用) ---
-                    if USE_SOCKET and self.客户端socket and self.socket连接中:
-                        # 只有在距离有效时才发送
+                    if USE_SOCKET:
+                        # 只有在距离有效时才发送 (未连接时进入发件箱)
                         if dist is not None and angle is not None:
                              radar_payload = {"type": "radar", "angle": angle, "distance": round(dist, 1)}
                              self._send_json_to_socket(radar_payload)
@@ -1207,15 +1455,14 @@ class ArduinoMonitorApp:
                      level = 消息体.split('] ', 1)[0][1:]; text = 消息体.split('] ', 1)[1]; color = "blue" if level=="INFO" else ("orange" if level=="WARN" else ("red" if level=="ERROR" else "green"))
                      self._更新状态栏(f"Socket: {text}", color)
 
-        except queue.Empty:
-            pass
         except Exception as e:
             print(f"处理响应队列时发生错误: {e}")
             traceback.print_exc()
             self._更新状态栏(f"严重错误: 处理响应队列失败: {e}", "red")
         finally:
-            if hasattr(self, '主窗口') and self.主窗口.winfo_exists():
-                 self.主窗口.after(RESPONSE_POLL_INTERVAL, self._处理响应队列)
+            # 队列未清空则让出事件循环后继续；清空后等待下一次唤醒
+            if self.响应队列.finish_batch() and hasattr(self, '主窗口') and self.主窗口.winfo_exists():
+                 self.主窗口.after(1, self._处理响应队列)
 
 
     def _处理传感器数据(self, 数据, 命令):
@@ -1261,12 +1508,15 @@ class ArduinoMonitorApp:
                 if self.数据视图激活 and self.绘图窗口 and self.绘图窗口.is_active():
                     if 是否温度: self.绘图窗口.update_gauges(temp=数值)
                     else: self.绘图窗口.update_gauges(humi=数值)
-                if USE_SOCKET and self.数据视图激活 and self.客户端socket and self.socket连接中:
+                if USE_SOCKET and self.数据视图激活:
                     if not math.isnan(数值):
                          env_json = {"type": 传感器键, "value": 数值, "unit": 单位}
                          self._send_json_to_socket(env_json) # Assuming this helper exists
                 if not math.isnan(数值):
                      self._插入传感器数据(数据库表名, 传感器键, 数值)
+                     # 历史曲线由 DataViewer 的内存窗口直接追加，无需重新查询数据库
+                     if self.数据视图激活 and self.绘图窗口 and self.绘图窗口.is_active():
+                         self.绘图窗口.push_reading(传感器键, 数值)
 
             except ValueError:
                 # 处理数值转换错误
@@ -1409,6 +1659,7 @@ class ArduinoMonitorApp:
              if 'temp' in self.数值标签: self.数值标签['temp'].config(text="-- °C")
              if 'humi' in self.数值标签: self.数值标签['humi'].config(text="-- %")
         self._更新状态栏("Arduino 连接已断开。", "red")
+        self.参数写入器.reset()  # 重新连接后所有参数需要重新发送
         # 清理串口对象
         if self.arduino串口:
              try: self.arduino串口.close()
@@ -1445,64 +1696,57 @@ class ArduinoMonitorApp:
         print("正在清理绘图窗口引用..."); # Main app only needs to clear the reference
         self.绘图窗口 = None; # Viewer handles its own destroy
         print("绘图窗口引用清理完成。")
-    def _更新绘图(self):
-        """获取最新历史数据并触发 DataViewer 重绘历史曲线图"""
-        # *** 修改检查条件: 使用 is_active() ***
-        # if not (self.绘图窗口 and self.历史曲线画布 and self.绘图窗口.winfo_exists()):
-        if not (self.数据视图激活 and self.绘图窗口 and self.绘图窗口.is_active()):
-            # print("DEBUG: _更新绘图 skipped, DataViewer not active.") # Debug log
-            return
-
-        # 调用 DataViewer 实例的方法来重绘其内部的历史图
-        # DataViewer 的 redraw_history_plot 内部会获取数据并绘图
-        try:
-            self.绘图窗口.redraw_history_plot()
-        except Exception as e:
-            print(f"调用 DataViewer 重绘历史图时出错: {e}")
-            # 可以考虑在此处关闭数据视图或记录更严重的错误
-            # self._关闭数据视图()
-
     def _插入传感器数据(self, 表名, 列名, 值):
-        """将传感器数据插入数据库，并在成功后触发绘图更新 (已修正窗口检查)"""
-        if not (self.数据库连接 and self.数据库游标):
+        """把传感器数据交给本地写入线程 (不等待磁盘)"""
+        if not self.本地写入器:
             print(f"数据库未连接，无法插入 {表名} 数据。")
             return False # Indicate failure
 
+        当前时间 = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        sql = f"INSERT INTO {表名} ({列名}, t) VALUES (?, ?)"
+        if not self.本地写入器.submit(sql, (值, 当前时间)):
+            self._更新状态栏(f"本地数据库写入队列已满，丢弃 {表名} 数据", "red")
+            return False
+        print(f"数据库插入: {表名} - {值:.1f} @ {当前时间}") # 移除单位
+        return True
+
+    # --- Status/Log Update (保持不变) ---
+    def _更新状态栏(self, 消息, 颜色="black"):
+        """(任意线程) 追加一条状态消息。只写入缓冲，由日志区定时批量显示，不直接操作 Tk 控件"""
+        self.日志缓冲.append(消息, 颜色)
+        if self.日志区 is None:
+            print(f"(日志控件不可用) {消息}")
+
+    def _写串口命令(self, 数据):
+        """(读取线程/参数写入线程) 直接写入 ALARM 或参数命令。失败只返回 False，串口错误由读取循环处理"""
+        串口 = self.arduino串口
+        if not (串口 and 串口.is_open):
+            return False
         try:
-            当前时间 = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            sql = f"INSERT INTO {表名} ({列名}, t) VALUES (?, ?)"
-            self.数据库游标.execute(sql, (值, 当前时间))
-            self.数据库连接.commit()
-            print(f"数据库插入: {表名} - {值:.1f} @ {当前时间}") # 移除单位
-
-            # --- 数据插入成功后，触发历史曲线图更新 ---
-            # *** 修改检查条件: 使用 is_active() ***
-            # if self.数据视图激活 and self.绘图窗口 and self.绘图窗口.winfo_exists():
-            if self.数据视图激活 and self.绘图窗口 and self.绘图窗口.is_active():
-                # 使用 after 确保更新在主线程执行
-                self.主窗口.after(0, self._更新绘图) # Trigger plot update in main loop
+            with self.串口写锁:
+                串口.write(数据)
             return True
+        except (serial.SerialException, OSError) as e:
+            print(f"发送命令 {数据.decode('ascii').strip()} 失败: {e}")
+            return False
 
-        except sqlite3.Error as e:
-            错误信息 = f"数据库错误 ({表名} 插入失败): {e}"
-            print(错误信息)
-            self._更新状态栏(错误信息, "red")
-            return False # Indicate failure
-        except Exception as e:
-             错误信息 = f"插入数据到 {表名} 时发生未知错误: {e}"
-             print(错误信息)
-             self._更新状态栏(错误信息, "red")
-             return False # Indicate failure
+    def _报警级别已切换(self, 旧级别, 新级别, 延迟ms):
+        """(串口读取线程) 报警控制器发出新级别后调用，只写日志缓冲"""
+        self._更新状态栏(f"设置报警级别: {旧级别} -> {新级别} (样本到命令 {延迟ms:.2f} ms)", "orange")
 
-    # --- Status/Log Update (保持不变) ---
-    def _更新状态栏(self, 消息, 颜色="black"): # *** Kept direct update ***
-        # ... (内容不变) ...
-        当前时间 = datetime.datetime.now().strftime("%H:%M:%S"); 完整消息 = f"[{当前时间}] {消息}\n";
-        if hasattr(self, '日志文本框') and self.日志文本框 and self.日志文本框.winfo_exists():
-            try: self.日志文本框.config(state=tk.NORMAL); self.日志文本框.insert(tk.END, 完整消息); self.日志文本框.see(tk.END); self.日志文本框.config(state=tk.DISABLED)
-            except tk.TclError: pass
-            except Exception as e: print(f"(日志更新未知错误) {完整消息.strip()} Error: {e}")
-        else: print(f"(日志控件不可用) {完整消息.strip()}")
+    def _参数应答(self, 前缀, 值, 已接受, 延迟ms):
+        """(串口读取线程) 参数命令收到 OK/ERR 应答后调用，只写日志缓冲"""
+        if 已接受:
+            self._更新状态栏(f"Arduino 已应用参数 {前缀}{值} (应答 {延迟ms:.0f} ms)")
+        else:
+            self._更新状态栏(f"Arduino 拒绝参数 {前缀}{值}", "orange")
+
+    def _提交雷达参数(self, 前缀, 值):
+        """(GUI 线程) 雷达窗口滑块回调：只提交给参数写入线程，不阻塞界面"""
+        if not (self.arduino串口 and self.arduino串口.is_open):
+            return False
+        self.参数写入器.submit(前缀, 值)
+        return True
 
     # --- Command Sending (保持不变) ---
     def 发送命令(self, 命令):
@@ -1520,8 +1764,9 @@ class ArduinoMonitorApp:
             # 确保命令以换行符结束
             if not 命令.endswith('\n'):
                  命令 += '\n'
-            # 将命令字符串编码为字节串并发送
-            self.arduino串口.write(命令.encode('utf-8'))
+            # 将命令字符串编码为字节串并发送 (与读取线程的报警命令互斥)
+            with self.串口写锁:
+                self.arduino串口.write(命令.encode('utf-8'))
             # self._更新状态栏(f"发送命令: {命令.strip()}") # Optional log
             return True # 返回发送成功
 
@@ -1583,10 +1828,10 @@ class ArduinoMonitorApp:
         if self.发送命令(CMD_RADAR_ON):  # 发送命令启动 Arduino 雷达
             # 4. 如果命令发送成功
             self.is_radar_mode_active = True  # 设置雷达模式激活标志
-            self.last_alarm_level = 0  # 重置报警级别状态
+            self.报警控制.reset(send=False)  # 重置报警级别状态 (关闭雷达时已发送 ALARM 0)
             # 5. 创建 RadarWindow 实例
-            #    传入主窗口、发送命令的回调、关闭雷达模式的回调
-            self.radar_window = RadarWindow(self.主窗口, self.发送命令, self._关闭雷达模式)
+            #    传入主窗口、提交雷达参数的回调、关闭雷达模式的回调
+            self.radar_window = RadarWindow(self.主窗口, self._提交雷达参数, self._关闭雷达模式)
             self._更新状态栏("雷达扫描已启动。", "blue")
         else:
             # 6. 如果命令发送失败
@@ -1607,9 +1852,8 @@ class ArduinoMonitorApp:
             else:
                 self._更新状态栏("发送 RADAR_OFF 指令失败。", "orange")
             # 无论 RADAR_OFF 是否成功，都尝试关闭报警
-            if self.发送命令(f"{CMD_ALARM_PREFIX}0\n"):  # 发送 ALARM 0
+            if self.报警控制.reset():  # 发送 ALARM 0 并重置报警状态
                 self._更新状态栏("报警已停止。", "orange")
-                self.last_alarm_level = 0  # 重置 Python 状态
             else:
                 self._更新状态栏("发送 ALARM 0 指令失败。", "orange")
 
@@ -1641,15 +1885,21 @@ class ArduinoMonitorApp:
         else:
             # 即使雷达模式未激活，也最好发一次 ALARM 0，确保蜂鸣器关闭
             print("步骤 1c: 发送最终的 ALARM 0 命令...")
-            self.发送命令(f"{CMD_ALARM_PREFIX}0\n")
-            self.last_alarm_level = 0
+            self.报警控制.reset()
 
         # 2. 确保数据视图相关任务已停止 (会关闭 Socket, 绘图窗口等)
         print("步骤 2: 关闭数据视图...")
+        if self.上行发送器:
+            # 在断开 Socket 之前停止发送线程，队列中剩余的数据仍可发出 (失败则转存到发件箱)
+            self.上行发送器.stop()
+            print(f"  上行发送线程已停止: {self.上行发送器.stats()}")
+            self.上行发送器 = None
         self._关闭数据视图()  # 调用这个应该会处理 Socket 和 DataViewer 窗口
 
-        # 3. 停止串口读取线程
-        print("步骤 3: 停止串口读取线程...")
+        # 3. 停止参数写入线程 (发完等待中的参数) 和串口读取线程
+        print("步骤 3: 停止参数写入线程和串口读取线程...")
+        self.参数写入器.stop()
+        print(f"  参数写入线程已停止: {self.参数写入器.stats()}")
         self.串口运行中 = False  # 设置标志让线程退出循环
         if hasattr(self, '串口读取线程') and self.串口读取线程 and self.串口读取线程.is_alive():
             print("  等待串口读取线程结束...")
@@ -1670,8 +1920,19 @@ class ArduinoMonitorApp:
                 print(f"  关闭串口时出错: {e}")
         self.arduino串口 = None  # 清理引用
 
-        # 5. 关闭数据库连接
+        # 5. 提交剩余的本地写入并关闭数据库连接
         print("步骤 5: 关闭数据库连接...")
+        if self.本地写入器:
+            self.本地写入器.stop()
+            print(f"  本地写入线程已停止: {self.本地写入器.stats()}")
+            self.本地写入器 = None
+        if self.上行发件箱:
+            try:
+                print(f"  上行发件箱剩余 {self.上行发件箱.pending()} 条待重放。")
+                self.上行发件箱.close()
+            except sqlite3.Error as e:
+                print(f"  关闭上行发件箱时出错: {e}")
+            self.上行发件箱 = None
         if self.数据库连接:
             try:
                 self.数据库连接.close()
@@ -1679,6 +1940,8 @@ class ArduinoMonitorApp:
             except Exception as e:
                 print(f"  关闭数据库时出错: {e}")
         self.数据库连接 = None  # 清理引用
+        self.日志缓冲.close()  # 关闭日志镜像文件
+        self._关闭响应唤醒()
 
         # 6. 销毁主窗口，退出程序
         print("步骤 6: 销毁主窗口...")
@@ -0,0 +1,394 @@
+# headless_gateway.py
+# dht_and_radar_monitor 的无界面网关模式：只运行串口读取、温湿度轮询、雷达报警、本地数据库写入和 Socket 上传。
+# 不导入 tkinter/PIL/matplotlib，适合树莓派等无显示器的设备长期运行。
+# 与 GUI 共用 monitor_core 中的组件，写入相同的本地数据库和上行发件箱。
+#
+# 用法: python headless_gateway.py [--port /dev/ttyUSB0] [--server-ip 1.2.3.4] [--no-radar] [--no-socket]
+
+import argparse
+import datetime
+import json
+import logging
+import math
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+
+import serial
+
+from monitor_core import (SerialLineFramer, is_radar_line, parse_radar_line, parse_sensor_response,
+                          AlarmEngine, AlarmController, build_uplink_envelope, SENSOR_SCHEMA_STATEMENTS,
+                          LocalStorageWriter, UplinkOutbox, UplinkSender)
+from monitor_config import (DB_NAME, LOCAL_DB_BATCH_SIZE, LOCAL_DB_FLUSH_INTERVAL_S, ARDUINO_BAUDRATE, SERIAL_TIMEOUT,
+                            CMD_LIGHT_ON, CMD_LIGHT_OFF, CMD_GET_TEMP, CMD_GET_HUMI, CMD_RADAR_ON, CMD_RADAR_OFF,
+                            CMD_ALARM_PREFIX, SERVER_IP, SERVER_PORT, SOCKET_TIMEOUT, SOCKET_RECONNECT_INTERVAL, DEVICE_ID,
+                            OUTBOX_DB_NAME, OUTBOX_MAX_ROWS, OUTBOX_REPLAY_BATCH, OUTBOX_REPLAY_RATE,
+                            UPLINK_FLUSH_INTERVAL_S, UPLINK_BATCH_SIZE, UPLINK_MAX_QUEUE, UPLINK_OVERFLOW_POLICY,
+                            RADAR_INVALID_MARKER, ALARM_HYSTERESIS_CM, ALARM_DWELL_S, ALARM_WINDOW_S, ALARM_MAX_SWEEP_S,
+                            THREAD_JOIN_TIMEOUT)
+from 雷达.port_discovery import discover_arduino
+
+# --- 配置 (与 GUI 共用的配置见 monitor_config.py) ---
+SENSOR_POLL_INTERVAL_S = 1.0       # 温湿度轮询周期 (与 GUI 数据视图的 DATA_VIEW_INTERVAL_MS 相同)
+SENSOR_REQUEST_DELAY_S = 0.5       # 请求温度后隔多久请求湿度
+STATS_INTERVAL_S = 60.0            # 运行统计的输出间隔
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(threadName)s - %(message)s'
+# -------------
+
+SENSOR_UNITS = {'temp': "°C", 'humi': "%"}
+SENSOR_TABLE_BY_COMMAND = {'arduino3': ('temperature', 'temp'), 'arduino4': ('humidity', 'humi')}
+
+
+class HeadlessGateway:
+    """
+    无界面网关。所有工作都在普通线程上完成:
+      串口读取线程 — 分帧、解析，雷达样本直接计算报警级别并回写 ALARM 命令
+      轮询线程     — 周期性请求温度和湿度
+      Socket 线程  — 连接/重连服务器并接收服务器指令
+    本地数据库写入和上行发送分别由 LocalStorageWriter 和 UplinkSender 的线程完成。
+    """
+
+    def __init__(self, port, server_address=None, device_id=DEVICE_ID, radar=True,
+                 poll_interval_s=SENSOR_POLL_INTERVAL_S, stats_interval_s=STATS_INTERVAL_S):
+        self.port = port
+        self.server_address = server_address  # None 表示不上传
+        self.device_id = device_id
+        self.radar = radar
+        self.poll_interval_s = poll_interval_s
+        self.stats_interval_s = stats_interval_s
+
+        self.stop_event = threading.Event()   # 通知所有线程退出 (信号处理或串口故障时设置)
+        self._stopped = False
+        self.ser = None
+        self._write_lock = threading.Lock()   # 串口写入 (轮询线程、读取线程和 Socket 线程都会发命令)
+        self._threads = []
+        self.writer = None
+        self.outbox = None
+        self.sender = None
+        self.sock = None
+        self.connected = False
+        self.alarm = AlarmController(
+            AlarmEngine(hysteresis=ALARM_HYSTERESIS_CM, dwell_s=ALARM_DWELL_S, window_s=ALARM_WINDOW_S,
+                        max_sweep_s=ALARM_MAX_SWEEP_S),
+            self._write_serial, command_prefix=CMD_ALARM_PREFIX,
+            on_transition=lambda old, new, latency_ms: logging.info(
+                f"报警级别: {old} -> {new} (样本到命令 {latency_ms:.2f} ms)"))
+        self.counters = {'lines': 0, 'radar': 0, 'radar_invalid': 0, 'env': 0, 'sensor_errors': 0,
+                         'commands_failed': 0}
+
+    # --- 启动与停止 ---
+    def start(self):
+        self.writer = LocalStorageWriter(
+            DB_NAME, SENSOR_SCHEMA_STATEMENTS, batch_size=LOCAL_DB_BATCH_SIZE,
+            flush_interval_s=LOCAL_DB_FLUSH_INTERVAL_S,
+            error_callback=lambda info: logging.error(f"本地数据库 - {info}"))
+        self.writer.start()
+        if not self.writer.ready.wait(timeout=10.0) or self.writer.init_error:
+            raise RuntimeError(f"数据库初始化失败: {self.writer.init_error or '超时'}")
+        logging.info(f"数据库 '{DB_NAME}' 已就绪 (WAL 模式，后台批量写入)。")
+
+        # 指定端口时只探测该端口，否则先试缓存的端口，再并行探测 VID/PID 匹配的端口。
+        # 握手成功 (PONG!) 说明固件已在处理命令，不需要再等待复位后的启动信息
+        found = discover_arduino(self.port, baud_rate=ARDUINO_BAUDRATE, timeout=SERIAL_TIMEOUT)
+        if not found:
+            raise RuntimeError(f"Arduino 串口 {self.port} 没有应答 PING?" if self.port
+                               else "未找到 Arduino 端口。请检查连接和驱动，或用 --port 指定。")
+        self.ser, self.port = found.serial, found.device
+        logging.info(f"已打开串口 {self.port} (握手 {found.elapsed_s * 1000:.0f} ms)")
+
+        if self.server_address:
+            try:
+                self.outbox = UplinkOutbox(OUTBOX_DB_NAME, max_rows=OUTBOX_MAX_ROWS)
+                if self.outbox.pending():
+                    logging.info(f"上行发件箱中有 {self.outbox.pending()} 条待重放数据。")
+            except sqlite3.Error as e:
+                logging.error(f"无法打开上行发件箱 '{OUTBOX_DB_NAME}': {e}，断线期间的数据将被丢弃。")
+                self.outbox = None
+            self.sender = UplinkSender(
+                self._write_socket, outbox=self.outbox,
+                flush_interval_s=UPLINK_FLUSH_INTERVAL_S, batch_size=UPLINK_BATCH_SIZE,
+                max_queue=UPLINK_MAX_QUEUE, overflow_policy=UPLINK_OVERFLOW_POLICY,
+                replay_batch=OUTBOX_REPLAY_BATCH, replay_rate=OUTBOX_REPLAY_RATE,
+                status_callback=lambda info: logging.info(f"Socket: {info}"))
+            self.sender.start()
+            self._spawn(self._socket_loop, "SocketClient")
+
+        self._spawn(self._read_loop, "SerialReader")
+        if self.radar:
+            self.send_command(CMD_RADAR_ON)
+        self._spawn(self._poll_loop, "SensorPoller")
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def run_forever(self):
+        """阻塞直到 stop() 被调用 (例如收到 SIGINT/SIGTERM)，期间定期输出统计。"""
+        while not self.stop_event.wait(self.stats_interval_s):
+            self.log_stats()
+
+    def stop(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        logging.info("正在停止网关...")
+        self.stop_event.set()
+        if self.ser and self.ser.is_open:
+            if self.radar:
+                self.send_command(CMD_RADAR_OFF)
+            if self.alarm.sent_level != 0:
+                self.alarm.reset()
+        # 先停发送线程 (尽量把队列发完或转存发件箱)，再断开连接
+        if self.sender:
+            self.sender.stop()
+        self._close_socket()
+        for thread in self._threads:
+            thread.join(timeout=THREAD_JOIN_TIMEOUT)
+        if self.ser:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+        if self.writer:
+            self.writer.stop()
+        if self.outbox:
+            self.outbox.close()
+        self.log_stats()
+        logging.info("网关已停止。")
+
+    # --- 串口 ---
+    def send_command(self, command):
+        """(任意线程) 向 Arduino 写一条命令，失败返回 False。"""
+        return self._write_serial(command.encode('utf-8'))
+
+    def _write_serial(self, data):
+        ser = self.ser
+        if not (ser and ser.is_open):
+            return False
+        try:
+            with self._write_lock:
+                ser.write(data)
+            return True
+        except (serial.SerialException, OSError) as e:
+            self.counters['commands_failed'] += 1
+            logging.error(f"发送命令 {data.strip()!r} 失败: {e}")
+            return False
+
+    def _read_loop(self):
+        framer = SerialLineFramer()
+        while not self.stop_event.is_set():
+            try:
+                data = self.ser.read(self.ser.in_waiting or 1)
+            except (serial.SerialException, OSError, TypeError) as e:
+                if not self.stop_event.is_set():
+                    logging.error(f"串口读取失败: {e}")
+                    self.stop_event.set()
+                break
+            if not data:
+                continue
+            received_at = time.perf_counter()
+            for line in framer.feed(data):
+                self.counters['lines'] += 1
+                if is_radar_line(line):
+                    if self.radar:
+                        self._handle_radar(line, received_at)
+                else:
+                    self._handle_serial_line(line)
+
+    def _handle_radar(self, line, received_at):
+        angle, dist = parse_radar_line(line, RADAR_INVALID_MARKER)
+        if angle is None:
+            logging.warning(f"无法解析雷达数据: {line}")
+            return
+        self.counters['radar'] += 1
+        self.alarm.on_sample(dist, received_at, angle)
+        if dist is None:
+            self.counters['radar_invalid'] += 1
+        elif self.sender:
+            self._send_uplink({"type": "radar", "angle": angle, "distance": round(dist, 1)})
+
+    def _handle_serial_line(self, line):
+        if line.startswith(("OK ", "ERR ", "INFO", "ERROR")):
+            logging.debug(f"Arduino 响应: {line}")
+            return
+        data = parse_sensor_response(line)
+        table_key = SENSOR_TABLE_BY_COMMAND.get(data.get('command'))
+        if not table_key:
+            return
+        table, key = table_key
+        if key in data:
+            try:
+                value = float(data[key])
+            except ValueError:
+                logging.warning(f"无法解析 {key} 值: '{data[key]}'")
+                return
+            if math.isnan(value):
+                return
+            self.counters['env'] += 1
+            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if not self.writer.submit(f"INSERT INTO {table} ({key}, t) VALUES (?, ?)", (value, now)):
+                logging.error(f"本地数据库写入队列已满，丢弃 {table} 数据")
+            if self.sender:
+                self._send_uplink({"type": key, "value": value, "unit": SENSOR_UNITS[key]})
+        elif 'error' in data:
+            self.counters['sensor_errors'] += 1
+            logging.warning(f"读取 {key} 失败: {data['error']}")
+
+    def _poll_loop(self):
+        while not self.stop_event.is_set():
+            self.send_command(CMD_GET_TEMP)
+            if self.stop_event.wait(SENSOR_REQUEST_DELAY_S):
+                break
+            self.send_command(CMD_GET_HUMI)
+            if self.stop_event.wait(max(0.0, self.poll_interval_s - SENSOR_REQUEST_DELAY_S)):
+                break
+
+    # --- Socket ---
+    def _send_uplink(self, payload):
+        # 雷达样本可以在拥塞时丢弃，温湿度读数从不丢弃
+        self.sender.send(build_uplink_envelope(self.device_id, payload), droppable=payload["type"] == "radar")
+
+    def _write_socket(self, data):
+        """(发送线程) 把一批数据写入当前连接。未连接或写入失败返回 False。"""
+        sock = self.sock
+        if not (sock and self.connected):
+            return False
+        try:
+            sock.sendall(data)
+            return True
+        except OSError:
+            self.connected = False  # Socket 线程会负责重连
+            return False
+
+    def _socket_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                sock = socket.create_connection(self.server_address, timeout=SOCKET_TIMEOUT)
+            except OSError as e:
+                backlog = self.outbox.pending() if self.outbox else 0
+                logging.warning(f"Socket: 连接 {self.server_address} 失败: {e}，"
+                                f"{SOCKET_RECONNECT_INTERVAL} 秒后重连 (离线缓存 {backlog} 条)")
+                self.stop_event.wait(SOCKET_RECONNECT_INTERVAL)
+                continue
+            sock.settimeout(1.0)
+            self.sock, self.connected = sock, True
+            logging.info(f"Socket: 已连接 {self.server_address}")
+            buffer = b''
+            while not self.stop_event.is_set() and self.connected:
+                try:
+                    data = sock.recv(1024)
+                except socket.timeout:
+                    continue
+                except OSError as e:
+                    if not self.stop_event.is_set():
+                        logging.warning(f"Socket: 连接中断: {e}")
+                    break
+                if not data:
+                    logging.warning("Socket: 服务器关闭连接。")
+                    break
+                buffer += data
+                *lines, buffer = buffer.split(b'\n')
+                for raw in lines:
+                    message = raw.decode('utf-8', errors='ignore').strip()
+                    if message:
+                        self._handle_server_message(message)
+            self._close_socket()
+            if not self.stop_event.is_set():
+                self.stop_event.wait(SOCKET_RECONNECT_INTERVAL)
+
+    def _close_socket(self):
+        sock, self.sock, self.connected = self.sock, None, False
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def _handle_server_message(self, message):
+        """处理服务器指令 (与 GUI 的 _handle_socket_message 支持相同的 action)。"""
+        try:
+            command = json.loads(message)
+        except json.JSONDecodeError:
+            logging.debug(f"服务器消息: {message}")  # 普通文本回执，例如 OK:radar_recorded
+            return
+        if not isinstance(command, dict) or 'action' not in command:
+            return
+        target = command.get('target_device_id')
+        if target and target != self.device_id:
+            return
+        action, params = command['action'], command.get('params') or {}
+        logging.info(f"收到服务器指令: {action} {params}")
+        if action == "REQUEST_SENSOR_DATA":
+            self.send_command(CMD_GET_TEMP)
+            threading.Timer(SENSOR_REQUEST_DELAY_S, self.send_command, args=(CMD_GET_HUMI,)).start()
+        elif action == "SET_LED_STATUS" and params.get('status') in ("ON", "OFF"):
+            self.send_command(CMD_LIGHT_ON if params['status'] == "ON" else CMD_LIGHT_OFF)
+        elif action == "CONTROL_RADAR" and params.get('command') in ("ON", "OFF"):
+            self.radar = params['command'] == "ON"
+            self.send_command(CMD_RADAR_ON if self.radar else CMD_RADAR_OFF)
+            if not self.radar:
+                self.alarm.reset()
+        else:
+            logging.warning(f"未知或参数无效的服务器指令: {command}")
+
+    # --- 统计 ---
+    def log_stats(self):
+        c = self.counters
+        logging.info(f"串口: {c['lines']} 行, 雷达 {c['radar']} (无效 {c['radar_invalid']}), 温湿度 {c['env']} "
+                     f"(失败 {c['sensor_errors']}), 命令失败 {c['commands_failed']}")
+        s = self.alarm.stats()
+        latency = s['latency_ms']
+        logging.info(f"报警: 当前级别 {s['level']}, 已发送 {s['sent']}, 失败 {s['failed']}"
+                     + (f", 样本到命令 p50 {latency['p50']:.2f} ms / p99 {latency['p99']:.2f} ms / "
+                        f"max {latency['max']:.2f} ms" if latency else ""))
+        if self.writer:
+            s = self.writer.stats()
+            latency = s['write_latency_ms']
+            logging.info(f"本地存储: 已写入 {s['written']} 条 / {s['batches']} 批, 排队 {s['queued']}, "
+                         f"丢弃 {s['dropped']}, 失败 {s['failed']}"
+                         + (f", 写入延迟 p99 {latency['p99']:.1f} ms" if latency else ""))
+        if self.sender:
+            s = self.sender.stats()
+            logging.info(f"上行发送: 入队 {s['queued']}, 已发送 {s['sent']}, 丢弃 {s['dropped']}, "
+                         f"转存 {s['spilled']}, 重放 {s['replayed']}, 离线积压 {s['backlog']}, 出错 {s['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="温湿度/雷达无界面网关 (不需要图形环境)")
+    parser.add_argument('--port', default=os.environ.get("ARDUINO_PORT"),
+                        help="Arduino 串口 (默认读取环境变量 ARDUINO_PORT，否则按 USB VID/PID 自动查找)")
+    parser.add_argument('--server-ip', default=SERVER_IP, help="服务器地址")
+    parser.add_argument('--server-port', type=int, default=SERVER_PORT, help="服务器端口")
+    parser.add_argument('--device-id', default=DEVICE_ID, help="上报使用的设备 ID")
+    parser.add_argument('--no-socket', action='store_true', help="不上传到服务器，只写本地数据库")
+    parser.add_argument('--no-radar', action='store_true', help="不启动雷达扫描和距离报警")
+    parser.add_argument('--poll-interval', type=float, default=SENSOR_POLL_INTERVAL_S, help="温湿度轮询周期 (秒)")
+    parser.add_argument('--stats-interval', type=float, default=STATS_INTERVAL_S, help="统计输出间隔 (秒)")
+    parser.add_argument('--verbose', action='store_true', help="输出 Arduino 的每条确认信息")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format=LOG_FORMAT)
+    server_address = None if args.no_socket else (args.server_ip, args.server_port)
+    gateway = HeadlessGateway(args.port, server_address=server_address, device_id=args.device_id,
+                              radar=not args.no_radar, poll_interval_s=args.poll_interval,
+                              stats_interval_s=args.stats_interval)
+    signal.signal(signal.SIGINT, lambda signum, frame: gateway.stop_event.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: gateway.stop_event.set())
+    try:
+        gateway.start()
+        gateway.run_forever()
+    except (serial.SerialException, RuntimeError) as e:
+        logging.error(f"网关启动失败: {e}")
+        return 1
+    finally:
+        gateway.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -126,22 +126,19 @@ class RadarApplication:
                         print("发生串口读取错误。")
 
                     if data_lines:
-                        last_valid_data_line = None
-                        for line in reversed(data_lines):
-                            if ',' in line:
-                                last_valid_data_line = line
-                                break
-
-                        if last_valid_data_line:
+                        # 解析本次读到的所有数据行，整批交给处理器 (一次向量化滤波)
+                        angles, dists = [], []
+                        for line in data_lines:
                             try:
-                                vals = [float(ii) for ii in last_valid_data_line.split(',')]
+                                vals = [float(ii) for ii in line.split(',')]
                                 if len(vals) == 2:
-                                    angle_deg, dist_raw = vals
-                                    angle_deg = int(round(angle_deg))
-                                    self.last_valid_angle_deg = angle_deg
-                                    self.processor.process_new_data(angle_deg, dist_raw)
+                                    angles.append(int(round(vals[0])))
+                                    dists.append(vals[1])
                             except ValueError: pass
-                            except IndexError: pass
+
+                        if angles:
+                            self.last_valid_angle_deg = angles[-1]
+                            self.processor.process_batch(angles, dists)
 
                 except Exception as e:
                     print("串口读取/处理时发生错误:")
@@ -0,0 +1,45 @@
+# monitor_config.py
+# dht_and_radar_monitor (GUI) 与 headless_gateway (无界面网关) 共用的配置。
+# 两者写入同一个本地数据库和上行发件箱、与同一台服务器和 Arduino 通信，这些值必须一致。
+# 只有单个程序使用的配置 (界面尺寸、轮询周期等) 仍定义在各自的文件中。
+
+# --- 本地数据库 ---
+DB_NAME = "sensor_data.db"
+LOCAL_DB_BATCH_SIZE = 100            # 本地数据库写入线程每批最多提交的记录数
+LOCAL_DB_FLUSH_INTERVAL_S = 0.5      # 批次中第一条记录最多等待多久就提交
+
+# --- Arduino 串口与命令 ---
+ARDUINO_BAUDRATE = 115200
+SERIAL_TIMEOUT = 1.0
+CMD_LIGHT_ON = "command=arduino1\n"
+CMD_LIGHT_OFF = "command=arduino2\n"
+CMD_GET_TEMP = "command=arduino3\n"
+CMD_GET_HUMI = "command=arduino4\n"
+CMD_RADAR_ON = "RADAR_ON\n"
+CMD_RADAR_OFF = "RADAR_OFF\n"
+CMD_ALARM_PREFIX = "ALARM "
+
+# --- 服务器与上传 ---
+SERVER_IP = ""#你本地设备的公网IP
+SERVER_PORT = 8888
+SOCKET_TIMEOUT = 5
+SOCKET_RECONNECT_INTERVAL = 5
+DEVICE_ID = "MyDHT_Client_01" # <<< 确保与服务器端协调一致
+OUTBOX_DB_NAME = "uplink_outbox.db"  # 断线期间待上传数据的磁盘发件箱
+OUTBOX_MAX_ROWS = 2000000            # 发件箱最多保留的条数，超过后淘汰最旧的
+OUTBOX_REPLAY_BATCH = 250            # 重连后每次重放的条数 (合并为一次 sendall)
+OUTBOX_REPLAY_RATE = 500.0           # 重放速率上限 (条/秒)，给实时数据留出带宽
+UPLINK_FLUSH_INTERVAL_S = 0.005      # 发送线程把这段时间内的消息合并为一次写入
+UPLINK_BATCH_SIZE = 200              # 或者攒够这么多条立即写入
+UPLINK_MAX_QUEUE = 2000              # 雷达样本队列上限 (温湿度不受限制，从不丢弃)
+UPLINK_OVERFLOW_POLICY = 'drop_oldest'  # 雷达队列满时: 'drop_oldest' 丢最旧的, 'drop_newest' 丢新来的
+
+# --- 雷达与距离报警 ---
+RADAR_R_MAX = 100.0
+RADAR_INVALID_MARKER = RADAR_R_MAX + 1.0
+ALARM_HYSTERESIS_CM = 5.0          # 报警降级需要距离超出档位上限 (30/60/100 cm) 这么多
+ALARM_DWELL_S = 0.5                # 报警降级条件需持续的时间 (升级立即生效)
+ALARM_WINDOW_S = 2.0               # 样本没有角度时，取这段时间内 (默认参数下约一次完整扫描) 的最近有效距离
+ALARM_MAX_SWEEP_S = 5.0            # 报警按扫描方向反转划分扫描；长时间没有反转时上一次扫描的结果最多保留这么久
+
+THREAD_JOIN_TIMEOUT = 1.0
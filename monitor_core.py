@@ -0,0 +1,818 @@
+# monitor_core.py
+# dht_and_radar_monitor 的非 GUI 组件 (不依赖 tkinter/PIL/matplotlib)。
+
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Arduino 雷达数据行: "角度,距离"，例如 "90,35.27"
+RADAR_LINE_PATTERN = re.compile(r'-?\d+(?:\.\d+)?,-?\d+(?:\.\d+)?')
+SERIAL_MAX_LINE_BYTES = 4096  # 超过此长度仍没有换行符的数据视为垃圾并丢弃
+
+
+class SerialLineFramer:
+    """
+    把串口批量读取到的字节流增量地切分成完整的文本行。
+    不完整的行保留在缓冲区中，等待下一次读取补全。
+    """
+    def __init__(self, max_line_bytes=SERIAL_MAX_LINE_BYTES, encoding='utf-8'):
+        self._buffer = bytearray()
+        self.max_line_bytes = max_line_bytes
+        self.encoding = encoding
+        self.lines_total = 0      # 已切分出的行数
+        self.bytes_total = 0      # 已接收的字节数
+        self.discarded_bytes = 0  # 因超长被丢弃的字节数
+
+    def feed(self, data):
+        """加入新读取的字节，返回其中所有完整行 (已去除首尾空白，跳过空行)。"""
+        self.bytes_total += len(data)
+        self._buffer += data
+        end = self._buffer.rfind(b'\n')
+        if end < 0:
+            if len(self._buffer) > self.max_line_bytes:
+                self.discarded_bytes += len(self._buffer)
+                self._buffer.clear()
+            return []
+        complete = bytes(self._buffer[:end])
+        del self._buffer[:end + 1]
+        stripped = (line.strip() for line in complete.decode(self.encoding, errors='ignore').split('\n'))
+        lines = [line for line in stripped if line]
+        self.lines_total += len(lines)
+        return lines
+
+    def reset(self):
+        """丢弃缓冲区中的不完整行 (例如重新连接后)。"""
+        self._buffer.clear()
+
+
+def is_radar_line(line):
+    """判断一行是否为 "角度,距离" 格式的雷达数据。"""
+    return RADAR_LINE_PATTERN.fullmatch(line) is not None
+
+
+def parse_radar_line(line, invalid_marker):
+    """把 "角度,距离" 解析为 (角度, 距离)。距离 >= invalid_marker (Arduino 的无效标记) 时为 None，格式错误返回 (None, None)。"""
+    try:
+        angle_str, dist_str = line.split(',')
+        angle, dist = float(angle_str), float(dist_str)
+    except ValueError:
+        return None, None
+    return angle, (None if dist >= invalid_marker else dist)
+
+
+def parse_sensor_response(text):
+    """把 "command=arduino3;temp=25.0;" 形式的响应解析为字典。"""
+    return {key.strip(): value.strip()
+            for key, sep, value in (part.partition('=') for part in text.split(';') if part)
+            if sep}
+
+
+# 距离报警分级: 距离 <= 上限 时对应的级别 (从近到远)，超出最后一档为 0 (关)
+ALARM_LEVEL_BANDS = ((30.0, 3), (60.0, 2), (100.0, 1))
+
+
+def alarm_level_for_distance(dist, bands=ALARM_LEVEL_BANDS, margin=0.0):
+    """根据距离返回报警级别 (0-3)。距离无效 (None 或 <= 0) 时为 0。margin 把每档上限向外放宽 (用于滞回)。"""
+    if dist is None or dist <= 0:
+        return 0
+    for limit, level in bands:
+        if dist <= limit + margin:
+            return level
+    return 0
+
+
+class AlarmEngine:
+    """
+    带滞回和驻留时间的距离报警状态机，替代逐样本比较阈值。
+      - 输入是最近一次完整扫描内的最近有效距离，而不是最后一个样本：
+        样本带角度时，按扫描方向反转划分扫描，取 上一次扫描 + 当前扫描 的最小值，
+        固定方位的目标在舵机转开后仍留在窗口内，直到舵机扫回该方位后再扫过一整次仍没有读数；
+        样本不带角度时退回到最近 window_s 秒的滑动窗口；
+      - 级别升高 (目标更近) 立即生效；
+      - 级别降低要求距离超出当前档上限 + hysteresis，并且持续 dwell_s 秒。
+    这样目标停在 30/60 cm 附近抖动、或随扫描进出波束时都不会反复切换，串口上的 ALARM 命令大大减少。
+    max_sweep_s: 一次扫描的最长时间；长时间没有方向反转 (例如扫描范围被设为单一角度) 时按这个时长划分扫描。
+    """
+    def __init__(self, bands=ALARM_LEVEL_BANDS, hysteresis=5.0, dwell_s=0.5, window_s=2.0, max_sweep_s=5.0,
+                 clock=time.monotonic):
+        self.bands = bands
+        self.hysteresis = hysteresis
+        self.dwell_s = dwell_s
+        self.window_s = window_s
+        self.max_sweep_s = max_sweep_s
+        self._clock = clock
+        self._window = deque()        # (时间, 距离)，距离单调递增 (滑动窗口最小值)，仅用于不带角度的样本
+        self._last_angle = None
+        self._direction = 0           # 当前扫描方向: 1 角度增大, -1 角度减小, 0 未知
+        self._sweep_start = None      # 当前扫描开始的时间
+        self._sweep_nearest = None    # 当前扫描内的最近有效距离
+        self._previous_nearest = None # 上一次扫描内的最近有效距离
+        self._previous_end = None     # 上一次扫描结束 (方向反转) 的时间
+        self._lower_since = None      # 开始满足降级条件的时间
+        self.level = 0
+        self.transitions = 0
+        self.samples = 0
+        self.sweeps = 0
+
+    def nearest(self, now=None):
+        """当前窗口内的最近有效距离，没有则为 None。"""
+        now = self._clock() if now is None else now
+        window = self._window
+        while window and now - window[0][0] > self.window_s:
+            window.popleft()
+        if self._previous_end is not None and now - self._previous_end > self.max_sweep_s:
+            self._previous_nearest = self._previous_end = None
+        candidates = [d for d in (window[0][1] if window else None, self._sweep_nearest, self._previous_nearest)
+                      if d is not None]
+        return min(candidates) if candidates else None
+
+    def _add_to_sweep(self, angle, dist, now):
+        """按角度变化检测扫描方向反转，反转 (或当前扫描超过 max_sweep_s) 时把当前扫描滚动为上一次扫描。"""
+        reversed_ = False
+        if self._last_angle is not None and angle != self._last_angle:
+            direction = 1 if angle > self._last_angle else -1
+            reversed_ = bool(self._direction) and direction != self._direction
+            self._direction = direction
+        self._last_angle = angle
+        if self._sweep_start is None:
+            self._sweep_start = now
+        elif reversed_ or now - self._sweep_start > self.max_sweep_s:
+            self._previous_nearest, self._previous_end = self._sweep_nearest, now
+            self._sweep_nearest = None
+            self._sweep_start = now
+            self.sweeps += 1
+        if dist is not None and dist > 0 and (self._sweep_nearest is None or dist < self._sweep_nearest):
+            self._sweep_nearest = dist
+
+    def update(self, dist, now=None, angle=None):
+        """加入一个样本 (无效距离传 None；angle 为该样本的舵机角度，未知时传 None)，返回更新后的报警级别。"""
+        now = self._clock() if now is None else now
+        self.samples += 1
+        if angle is not None:
+            self._add_to_sweep(angle, dist, now)
+        elif dist is not None and dist > 0:
+            window = self._window
+            while window and window[-1][1] >= dist:
+                window.pop()
+            window.append((now, dist))
+        nearest = self.nearest(now)
+
+        raw = alarm_level_for_distance(nearest, self.bands)
+        if raw > self.level:
+            self._set_level(raw)
+            return self.level
+        relaxed = alarm_level_for_distance(nearest, self.bands, margin=self.hysteresis)
+        if relaxed >= self.level:
+            self._lower_since = None       # 仍在滞回带内，保持当前级别
+        elif self._lower_since is None:
+            self._lower_since = now
+        elif now - self._lower_since >= self.dwell_s:
+            self._set_level(relaxed)
+        return self.level
+
+    def _set_level(self, level):
+        self.level = level
+        self._lower_since = None
+        self.transitions += 1
+
+    def reset(self):
+        """雷达停止时调用：清空窗口和扫描状态并回到 0 级。"""
+        self._window.clear()
+        self._last_angle = None
+        self._direction = 0
+        self._sweep_start = self._sweep_nearest = self._previous_nearest = self._previous_end = None
+        self._lower_since = None
+        self.level = 0
+
+
+class AlarmController:
+    """
+    在串口读取线程上评估报警并直接写 ALARM 命令，不经过 GUI 事件循环。
+    write(bytes) -> bool 由调用方提供 (需自行与其他串口写入互斥)。
+    只有写入成功才更新 sent_level，失败时下一个样本会重试。
+    每次级别切换记录从样本读入到命令写出的延迟 (毫秒)。
+    """
+    def __init__(self, engine, write, command_prefix="ALARM ", history=256, on_transition=None,
+                 clock=time.perf_counter):
+        self.engine = engine
+        self._write = write
+        self.command_prefix = command_prefix
+        self.on_transition = on_transition  # on_transition(旧级别, 新级别, 延迟ms)，在读取线程上调用
+        self._clock = clock
+        self._lock = threading.Lock()       # 读取线程评估与 GUI 线程 reset() 互斥
+        self.sent_level = 0
+        self.transitions = deque(maxlen=history)  # 最近的切换: (时间戳, 旧级别, 新级别, 延迟ms)
+        self.sent = 0
+        self.failed = 0
+
+    def on_sample(self, dist, received_at=None, angle=None):
+        """处理一个雷达样本 (无效距离传 None，angle 为舵机角度)。received_at 为读入该样本时 clock() 的值。
+        级别已切换时返回新级别。"""
+        with self._lock:
+            level = self.engine.update(dist, angle=angle)
+            if level == self.sent_level:
+                return None
+            if not self._write(f"{self.command_prefix}{level}\n".encode('ascii')):
+                self.failed += 1
+                return None
+            latency_ms = (self._clock() - received_at) * 1000.0 if received_at is not None else None
+            previous, self.sent_level = self.sent_level, level
+            self.sent += 1
+            self.transitions.append((time.time(), previous, level, latency_ms))
+        if self.on_transition:
+            self.on_transition(previous, level, latency_ms)
+        return level
+
+    def reset(self, send=True):
+        """清空报警引擎并发送 ALARM 0 (send=False 时只重置状态，例如设备已处于 0 级)。返回是否发送成功。"""
+        with self._lock:
+            self.engine.reset()
+            if send and not self._write(f"{self.command_prefix}0\n".encode('ascii')):
+                self.failed += 1
+                return False
+            self.sent_level = 0
+            return True
+
+    def stats(self):
+        with self._lock:
+            latencies = [t[3] for t in self.transitions if t[3] is not None]
+            return {
+                'level': self.sent_level,
+                'sent': self.sent,
+                'failed': self.failed,
+                'latency_ms': _latency_summary(latencies),
+            }
+
+
+# 本地传感器数据库的表结构 (GUI 和无界面网关写同一个数据库)
+SENSOR_TABLES = {
+    'temperature': 'temp REAL NOT NULL',
+    'humidity': 'humi REAL NOT NULL',
+}
+SENSOR_SCHEMA_STATEMENTS = [f'''CREATE TABLE IF NOT EXISTS {table} (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        {column},
+                        t TEXT NOT NULL
+                    )''' for table, column in SENSOR_TABLES.items()]
+
+
+def build_uplink_envelope(device_id, payload):
+    """把 payload 包装成服务器期望的 JSON 行 (UTF-8 字节，以换行结尾)。时间戳在采集时确定，重放时保持不变。"""
+    envelope = {
+        "deviceId": device_id,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "payload": payload,
+    }
+    return json.dumps(envelope).encode('utf-8') + b'\n'
+
+
+class ResponseDispatcher:
+    """
+    带优先级通道的响应队列，替代定时轮询的 queue.Queue。
+    后台线程调用 put()；只有当队列从空变为非空时才调用 wake_callback 唤醒 GUI 线程。
+    GUI 线程循环调用 pop() 按优先级取出消息，处理完一批后调用 finish_batch()。
+    """
+    SENSOR_LANE, RADAR_LANE, OTHER_LANE = 0, 1, 2
+    LANE_BY_SOURCE = {'SERIAL': SENSOR_LANE, 'ERROR': SENSOR_LANE, 'RADAR_DATA': RADAR_LANE}
+    LOW_LANE_EVERY = 16  # 每取出这么多条高优先级消息，至少让低优先级通道处理一条，避免饿死
+
+    def __init__(self, wake_callback=None):
+        self.wake_callback = wake_callback
+        self._lanes = (deque(), deque(), deque())
+        self._lock = threading.Lock()
+        self._wake_pending = False  # 已唤醒 GUI 但尚未处理完
+        self._high_streak = 0
+        self.wakeups = 0            # 唤醒次数 (用于观察)
+
+    def put(self, item):
+        """(任意线程) 放入 (来源, 消息体)。"""
+        lane = self._lanes[self.LANE_BY_SOURCE.get(item[0], self.OTHER_LANE)]
+        with self._lock:
+            lane.append(item)
+            need_wake = not self._wake_pending
+            self._wake_pending = True
+        if need_wake:
+            self.wakeups += 1
+            if self.wake_callback:
+                self.wake_callback()
+
+    def pop(self):
+        """(GUI 线程) 按优先级取出一条消息，队列为空时返回 None。"""
+        with self._lock:
+            other = self._lanes[self.OTHER_LANE]
+            if other and self._high_streak >= self.LOW_LANE_EVERY:
+                self._high_streak = 0
+                return other.popleft()
+            for lane_index, lane in enumerate(self._lanes):
+                if lane:
+                    self._high_streak = 0 if lane_index == self.OTHER_LANE else self._high_streak + 1
+                    return lane.popleft()
+        return None
+
+    def finish_batch(self):
+        """(GUI 线程) 一批处理结束。返回 True 表示还有剩余消息，调用方应尽快再处理一批。"""
+        with self._lock:
+            if any(self._lanes):
+                return True
+            self._wake_pending = False  # 之后的 put() 会再次唤醒
+            return False
+
+    def has_pending(self):
+        with self._lock:
+            return any(self._lanes)
+
+    def qsize(self):
+        with self._lock:
+            return sum(len(lane) for lane in self._lanes)
+
+
+class RenderScheduler:
+    """
+    帧合并渲染调度器：新数据到达时只标记"脏"，最多每帧渲染一次。
+    渲染 (或事件循环) 落后时直接跳过错过的帧，不排队补画，并计入 dropped_frames。
+    schedule(delay_ms, callback) 由调用方提供，例如 Tk 控件的 after。
+    """
+    def __init__(self, render, schedule, target_fps=30.0, stats_window_s=2.0, clock=time.perf_counter):
+        self._render = render
+        self._schedule = schedule
+        self._clock = clock
+        self.frame_interval = 1.0 / target_fps
+        self.stats_window_s = stats_window_s
+        self.active = True
+        self._dirty = False
+        self._scheduled = False
+        self._due_time = 0.0       # 已安排帧的预定时间
+        self._next_frame = 0.0     # 下一帧的最早时间
+        self._render_times = deque()
+        self.frames_rendered = 0
+        self.dropped_frames = 0
+        self.updates = 0           # mark_dirty 调用次数 (被合并的更新 = updates - frames_rendered)
+        self.last_render_ms = 0.0
+
+    @property
+    def target_fps(self):
+        return 1.0 / self.frame_interval
+
+    def mark_dirty(self):
+        """有新数据需要显示。若本帧尚未安排渲染则安排到下一帧边界。"""
+        self.updates += 1
+        self._dirty = True
+        if self._scheduled or not self.active:
+            return
+        now = self._clock()
+        self._due_time = max(now, self._next_frame)
+        self._scheduled = True
+        self._schedule(int(round((self._due_time - now) * 1000.0)), self._on_frame)
+
+    def _on_frame(self):
+        self._scheduled = False
+        if not self.active or not self._dirty:
+            return
+        self._dirty = False
+        start = self._clock()
+        try:
+            self._render()
+        finally:
+            end = self._clock()
+            self.last_render_ms = (end - start) * 1000.0
+            self.frames_rendered += 1
+            self._render_times.append(end)
+            while self._render_times and end - self._render_times[0] > self.stats_window_s:
+                self._render_times.popleft()
+            # 事件循环延迟加上渲染耗时跨过的帧边界都算作丢帧，下一帧对齐到之后的边界
+            missed = int((end - self._due_time) / self.frame_interval)
+            self.dropped_frames += missed
+            self._next_frame = self._due_time + (missed + 1) * self.frame_interval
+
+    def achieved_fps(self):
+        """最近 stats_window_s 秒内的实际渲染帧率。"""
+        times = self._render_times
+        if len(times) < 2 or self._clock() - times[-1] > self.stats_window_s:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0]) if times[-1] > times[0] else 0.0
+
+    def stats(self):
+        return {
+            'target_fps': self.target_fps,
+            'achieved_fps': self.achieved_fps(),
+            'frames_rendered': self.frames_rendered,
+            'dropped_frames': self.dropped_frames,
+            'coalesced_updates': max(0, self.updates - self.frames_rendered),
+            'last_render_ms': self.last_render_ms,
+        }
+
+    def stop(self):
+        self.active = False
+        self._dirty = False
+
+
+class StatusLogBuffer:
+    """
+    线程安全的状态日志缓冲：任意线程调用 append()，GUI 线程定期调用 drain() 一次取走所有待显示的行。
+    待显示的行放在定长环形缓冲中 (GUI 跟不上时只保留最新的 max_pending 行，其余计入 skipped)；
+    完整历史同步写入滚动日志文件 (log_file 为 None 时不写文件)。
+    """
+    def __init__(self, max_pending=500, log_file=None, max_bytes=1000000, backup_count=3):
+        self._pending = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        self._skipped = 0
+        self.total = 0
+        self._file_handler = None
+        if log_file:
+            self._file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+            self._file_handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+
+    def append(self, message, tag=None):
+        """(任意线程) 追加一条消息；tag 由显示端解释 (例如颜色)。"""
+        now = time.time()
+        line = f"[{time.strftime('%H:%M:%S', time.localtime(now))}] {message}\n"
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self._skipped += 1
+            self._pending.append((line, tag))
+            self.total += 1
+        if self._file_handler:
+            record = logging.makeLogRecord({'msg': message, 'created': now, 'msecs': (now % 1) * 1000,
+                                            'levelno': logging.INFO, 'levelname': 'INFO'})
+            self._file_handler.handle(record)  # handler 自带锁
+
+    def drain(self):
+        """(GUI 线程) 取走所有待显示的行，返回 ([(行文本, tag)], 因缓冲满而跳过的行数)。"""
+        with self._lock:
+            lines = list(self._pending)
+            self._pending.clear()
+            skipped, self._skipped = self._skipped, 0
+        return lines, skipped
+
+    def close(self):
+        if self._file_handler:
+            self._file_handler.close()
+            self._file_handler = None
+
+
+def _latency_summary(values_ms):
+    """返回 {'p50': .., 'p99': .., 'max': ..} (毫秒)，没有样本时为 None。"""
+    if not values_ms:
+        return None
+    ordered = sorted(values_ms)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1)))]
+    return {'p50': pick(0.50), 'p99': pick(0.99), 'max': ordered[-1]}
+
+
+class LocalStorageWriter:
+    """
+    本地 SQLite 写入线程：独占写连接 (WAL 模式)，通过队列接收 (sql, params)，
+    攒够 batch_size 条或距批次第一条超过 flush_interval_s 时在一个事务里提交。
+    submit() 从不等待磁盘；队列满时丢弃并计数。
+    """
+    _STOP = object()
+
+    def __init__(self, db_path, schema_statements=(), batch_size=100, flush_interval_s=0.5,
+                 max_queue=100000, error_callback=None, latency_window=1000):
+        self.db_path = db_path
+        self.schema_statements = list(schema_statements)
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.error_callback = error_callback  # 在写入线程中调用，参数为错误描述
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self.ready = threading.Event()        # 连接和表结构就绪 (或初始化失败) 后置位
+        self.init_error = None
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+        self._commit_ms = deque(maxlen=latency_window)   # 每次提交 (含 fsync) 的耗时
+        self._write_ms = deque(maxlen=latency_window)    # 每条记录从 submit 到提交完成的延迟
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="LocalStorageWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, params=()):
+        """(任意线程) 提交一条写入。返回 False 表示队列已满被丢弃。"""
+        try:
+            self._queue.put_nowait((sql, params, time.perf_counter()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def stop(self, timeout=5.0):
+        """提交剩余记录并关闭连接。"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'commit_ms': _latency_summary(list(self._commit_ms)),
+            'write_latency_ms': _latency_summary(list(self._write_ms)),
+        }
+
+    def _run(self):
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=10.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')  # WAL 下只在检查点时 fsync，断电最多丢失最近的提交
+            for statement in self.schema_statements:
+                conn.execute(statement)
+            conn.commit()
+        except sqlite3.Error as e:
+            self.init_error = str(e)
+            self.ready.set()
+            return
+        self.ready.set()
+
+        batch = []
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if not batch else max(0.0, deadline - time.perf_counter())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is self._STOP:
+                stopping = True
+            elif item is not None:
+                batch.append(item)
+                if len(batch) == 1:
+                    deadline = time.perf_counter() + self.flush_interval_s
+            if batch and (stopping or len(batch) >= self.batch_size or time.perf_counter() >= deadline):
+                self._commit(conn, batch)
+                batch = []
+        conn.close()
+
+    def _commit(self, conn, batch):
+        start = time.perf_counter()
+        try:
+            with conn:  # 一个事务，异常时回滚
+                for sql, params, _ in batch:
+                    conn.execute(sql, params)
+        except sqlite3.Error as e:
+            self.failed += len(batch)
+            if self.error_callback:
+                self.error_callback(f"{len(batch)} 条记录写入失败: {e}")
+            return
+        end = time.perf_counter()
+        self.written += len(batch)
+        self.batches += 1
+        self._commit_ms.append((end - start) * 1000.0)
+        self._write_ms.extend((end - submitted) * 1000.0 for _, _, submitted in batch)
+
+
+class UplinkOutbox:
+    """
+    上行数据的磁盘 FIFO (SQLite 发件箱)：断线期间把每个待发送的 JSON 行写入磁盘，
+    重连后由 peek_batch/ack 分批重放，发送成功后删除。
+    内存中只有一个小的写缓冲，积压再久也只占用磁盘；超过 max_rows 时淘汰最旧的记录。
+    """
+    def __init__(self, db_path, max_rows=2000000, buffer_size=200):
+        self.max_rows = max_rows
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._conn = sqlite3.connect(db_path, timeout=10.0, check_same_thread=False)  # 所有访问都在 _lock 内
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, line BLOB NOT NULL)')
+        self._conn.commit()
+        self._stored = self._conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+        self.captured = 0   # 写入发件箱的条数
+        self.replayed = 0   # 重放成功并删除的条数
+        self.evicted = 0    # 因超过 max_rows 被淘汰的条数
+
+    def append(self, line):
+        """(任意线程) 保存一条待发送的行 (bytes，含换行符)。"""
+        with self._lock:
+            self._buffer.append(line)
+            self.captured += 1
+            if len(self._buffer) >= self.buffer_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        with self._conn:
+            self._conn.executemany('INSERT INTO outbox (line) VALUES (?)', ((line,) for line in self._buffer))
+            self._stored += len(self._buffer)
+            self._buffer.clear()
+            overflow = self._stored - self.max_rows
+            if overflow > 0:
+                self._conn.execute('DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)', (overflow,))
+                self._stored -= overflow
+                self.evicted += overflow
+
+    def pending(self):
+        with self._lock:
+            return self._stored + len(self._buffer)
+
+    def peek_batch(self, limit):
+        """按 FIFO 顺序返回最多 limit 条 [(id, line), ...]，不删除。"""
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute('SELECT id, line FROM outbox ORDER BY id LIMIT ?', (limit,)).fetchall()
+
+    def ack(self, last_id):
+        """确认 id <= last_id 的记录已发送，从发件箱删除。"""
+        with self._lock:
+            with self._conn:
+                removed = self._conn.execute('DELETE FROM outbox WHERE id <= ?', (last_id,)).rowcount
+            self._stored -= removed
+            self.replayed += removed
+
+    def close(self):
+        with self._lock:
+            try:
+                self._flush_locked()
+            finally:
+                self._conn.close()
+
+
+class UplinkSender:
+    """
+    非阻塞、批量的上行发送线程。send() 只入队，从不等待网络；
+    发送线程把同一刷新间隔 (或攒够 batch_size 条) 内的消息合并为一次 write()。
+    队列满时按 overflow_policy 丢弃可丢弃的消息 (雷达样本)，不可丢弃的消息 (温湿度) 从不丢弃，
+    未连接或写入失败时转存到发件箱；连接空闲时按速率限制重放发件箱中的积压。
+
+    write(data) 由调用方提供：成功返回 True，未连接或连接已断开返回 False。
+    写入或发件箱出错 (例如 sqlite3.Error) 时记录日志、丢弃当前批次并计入 errors，线程继续运行。
+    """
+    OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest')
+
+    def __init__(self, write, outbox=None, flush_interval_s=0.005, batch_size=200, max_queue=2000,
+                 overflow_policy='drop_oldest', replay_batch=250, replay_rate=500.0, status_callback=None,
+                 error_backoff_s=1.0):
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢出策略: {overflow_policy}")
+        self._write = write
+        self.outbox = outbox
+        self.flush_interval_s = flush_interval_s
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.overflow_policy = overflow_policy
+        self.replay_batch = replay_batch
+        self.replay_rate = replay_rate
+        self.status_callback = status_callback
+        self.error_backoff_s = error_backoff_s  # 出错后暂停这么久再继续，避免持续出错时空转
+        self._critical = deque()     # 不可丢弃 (温湿度等)
+        self._droppable = deque()    # 可丢弃 (雷达样本)，长度受 max_queue 限制
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._next_replay = 0.0
+        self.queued = 0      # send() 接受的条数
+        self.sent = 0        # 实时发送成功的条数
+        self.dropped = 0     # 因队列满被丢弃的条数
+        self.spilled = 0     # 转存到发件箱的条数 (未连接或写入失败)
+        self.replayed = 0    # 从发件箱重放成功的条数
+        self.writes = 0      # write() 调用次数 (= 网络写入次数)
+        self.errors = 0      # 发送或发件箱操作抛出异常的次数
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="UplinkSender", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """停止线程；队列中剩余的消息尝试发送，失败则转存到发件箱。"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def send(self, line, droppable=False):
+        """(任意线程) 放入一条待发送的行 (bytes，含换行符)。返回 False 表示被丢弃。"""
+        with self._cond:
+            if droppable:
+                if len(self._droppable) >= self.max_queue:
+                    self.dropped += 1
+                    if self.overflow_policy == 'drop_newest':
+                        return False
+                    self._droppable.popleft()
+                self._droppable.append(line)
+            else:
+                self._critical.append(line)
+            self.queued += 1
+            if len(self._critical) + len(self._droppable) == 1:
+                self._cond.notify()
+        return True
+
+    def qsize(self):
+        with self._cond:
+            return len(self._critical) + len(self._droppable)
+
+    def stats(self):
+        return {
+            'pending': self.qsize(),
+            'queued': self.queued,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'replayed': self.replayed,
+            'writes': self.writes,
+            'errors': self.errors,
+            'backlog': self.outbox.pending() if self.outbox else 0,
+        }
+
+    def _take_batch(self):
+        """(持有锁) 取出最多 batch_size 条，不可丢弃的优先。"""
+        batch = []
+        for lane in (self._critical, self._droppable):
+            while lane and len(batch) < self.batch_size:
+                batch.append(lane.popleft())
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._running and not (self._critical or self._droppable):
+                    idle_wait = 0.05 if (self.outbox and self.outbox.pending()) else 0.5
+                    self._cond.wait(timeout=idle_wait)
+                # 第一条消息到达后最多再等一个刷新间隔，把这段时间内的消息合并成一次写入
+                deadline = time.perf_counter() + self.flush_interval_s
+                while self._running and 0 < len(self._critical) + len(self._droppable) < self.batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(timeout=remaining)
+                batch = self._take_batch()
+                running = self._running
+            try:
+                if batch:
+                    self._send_batch(batch)
+                elif running:
+                    self._replay_or_flush()
+            except Exception:
+                self._on_error(batch, running)
+            if not running and not self.qsize():
+                break
+
+    def _on_error(self, batch, running):
+        """发送线程是唯一的上行出口，任何异常都不能让它退出：记录并丢弃当前批次，稍后再继续。"""
+        self.errors += 1
+        self.dropped += len(batch)
+        logging.getLogger(__name__).exception(f"上行发送出错，丢弃 {len(batch)} 条")
+        self._next_replay = time.monotonic() + self.error_backoff_s
+        if running:
+            with self._cond:
+                self._cond.wait(timeout=self.error_backoff_s)
+
+    def _send_batch(self, batch):
+        self.writes += 1
+        if self._write(b''.join(batch)):
+            self.sent += len(batch)
+            return
+        # 未连接或写入失败：转存到发件箱，重连后重放
+        if self.outbox:
+            for line in batch:
+                self.outbox.append(line)
+            self.spilled += len(batch)
+        else:
+            self.dropped += len(batch)
+
+    def _replay_or_flush(self):
+        if not self.outbox:
+            return
+        if not self.outbox.pending() or time.monotonic() < self._next_replay:
+            return
+        batch = self.outbox.peek_batch(self.replay_batch)
+        if not batch:
+            return
+        self.writes += 1
+        if not self._write(b''.join(line for _, line in batch)):
+            # 仍未连接：把写缓冲落盘，稍后再试
+            self.outbox.flush()
+            self._next_replay = time.monotonic() + 1.0
+            return
+        self.outbox.ack(batch[-1][0])
+        self.replayed += len(batch)
+        self._next_replay = time.monotonic() + len(batch) / self.replay_rate
+        if self.status_callback and not self.outbox.pending():
+            self.status_callback(f"离线数据重放完成 (累计重放 {self.replayed} 条)")
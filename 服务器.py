@@ -9,12 +9,39 @@ import sys
 import json
 import math
 import time
+import os
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from 雷达 import config as radar_config
+from 雷达.data_processor import DataProcessor
 
 # --- 配置 ---
 HOST = ""  # 你本地作为服务器的设备的公网IP
 PORT = 8888
 DB_NAME = 'dht_radar_storage.db'
 LOG_FORMAT = '%(asctime)s - %(levelname)s - %(threadName)s - %(message)s'
+RADAR_NUM_ANGLES = 181  # 雷达角度数量 (0-180 度)
+STATE_SNAPSHOT_FILE = 'device_state_snapshot.json'  # 设备最新状态快照文件 (用于重启后热启动)
+STATE_SNAPSHOT_INTERVAL_S = 30.0  # 状态快照的保存间隔 (秒)
+# 每个设备每种数据流在内存中保留的最近样本数 (决定每个设备的内存上限)
+RING_BUFFER_CAPACITY = {'temp': 4096, 'humi': 4096, 'radar': 16384}
+HISTORY_MAX_QUERY_S = 30 * 24 * 3600.0  # query_history 最多回溯的秒数
+RADAR_DETECTION_WORKERS = None  # 雷达对象检测进程数 (None 表示使用 CPU 核数)
+RADAR_DETECTION_MAX_PENDING = 2  # 每个设备最多排队的扫描检测任务数，超出则丢弃该次扫描
+# 温湿度在线异常检测 (EWMA 均值/方差)
+ANOMALY_EWMA_ALPHA = 0.05          # EWMA 平滑系数 (越大越快适应新水平)
+ANOMALY_WARMUP_SAMPLES = 20        # 预热样本数，预热期间不判定尖峰
+ANOMALY_SPIKE_Z = 4.0              # 偏离均值超过多少个标准差判定为尖峰
+ANOMALY_MIN_STD = {'temp': 0.5, 'humi': 1.0}  # 标准差下限，避免 DHT11 的 1 个单位跳变被误判
+# 卡死 (flatline) 检测按传感器启用：读数在容差内保持不变超过这么多秒 (按样本时间戳) 判定为卡死。
+# DHT11 的温湿度是整数步进，稳定的房间里几个小时读数不变很正常，因此默认不启用；
+# 换用连续量传感器后可按需设置，例如 {'temp': 1800, 'humi': 1800}
+ANOMALY_FLATLINE_S = {}
+ANOMALY_FLATLINE_TOLERANCE = {}    # 视为 "不变" 的最大偏差 (相对于本段的第一个读数)，默认 0 即完全相同
+DIAGNOSTICS_MAX_TOP = 100          # query_diagnostics 最多返回多少个内存分配位置
 # -------------
 
 # --- 日志设置 ---
@@ -46,8 +73,36 @@ def init_db():
                     timestamp DATETIME NOT NULL
                 )
             ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS radar_objects (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    device_id TEXT NOT NULL,
+                    sweep_time DATETIME NOT NULL, /* 完成该次扫描的最后一个样本的时间 */
+                    start_angle INTEGER NOT NULL,
+                    end_angle INTEGER NOT NULL,
+                    center_angle INTEGER NOT NULL,
+                    distance REAL NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS environment_anomalies (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    device_id TEXT NOT NULL,
+                    sensor_type TEXT NOT NULL,
+                    flag TEXT NOT NULL CHECK(flag IN ('spike', 'flatline')),
+                    value REAL NOT NULL,
+                    score REAL, /* 尖峰: z 分数; 卡死: 连续相同值的个数 */
+                    timestamp DATETIME NOT NULL
+                )
+            ''')
+            # 旧数据库没有 anomaly 列时补上 (每行记录入库时的异常标记)
+            env_columns = [row[1] for row in cursor.execute('PRAGMA table_info(environment_data)')]
+            if 'anomaly' not in env_columns:
+                cursor.execute('ALTER TABLE environment_data ADD COLUMN anomaly TEXT')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_env_dev_time ON environment_data (device_id, timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_anomaly_dev_time ON environment_anomalies (device_id, timestamp)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_radar_dev_time ON radar_data (device_id, timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_objects_dev_time ON radar_objects (device_id, sweep_time)')
             logging.info(f"Database '{DB_NAME}' initialized successfully.")
     except sqlite3.Error as e:
         logging.error(f"Database initialization failed: {e}")
@@ -89,6 +144,526 @@ def db_execute(sql, params=()): # 移除了 fetch_one, fetch_all，因为这里
             db_semaphore.release()
     return success
 
+def db_executemany(sql, seq_of_params):
+    """批量执行插入操作 (单个事务)。成功返回 True，失败返回 False。"""
+    acquired = False
+    try:
+        db_semaphore.acquire()
+        acquired = True
+        with sqlite3.connect(DB_NAME, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES, timeout=10.0) as conn:
+            conn.executemany(sql, seq_of_params)
+            return True
+    except sqlite3.Error as e:
+        logging.error(f"DB error executing many '{sql}': {e}")
+    except Exception as e:
+         logging.error(f"Unexpected DB error executing many '{sql}': {e}")
+    finally:
+        if acquired:
+            db_semaphore.release()
+    return False
+
+def db_query(sql, params=()):
+    """执行数据库查询，处理连接和信号量。成功返回行列表，失败返回 None。"""
+    acquired = False
+    try:
+        db_semaphore.acquire()
+        acquired = True
+        with sqlite3.connect(DB_NAME, timeout=10.0) as conn:
+            return conn.execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        logging.error(f"DB error querying '{sql}' / {params}: {e}")
+    except Exception as e:
+         logging.error(f"Unexpected DB error querying '{sql}' / {params}: {e}")
+    finally:
+        if acquired:
+            db_semaphore.release()
+    return None
+
+# --- 设备最新状态缓存 ---
+def _parse_db_timestamp(value):
+    """将数据库中保存的时间戳 (ISO 字符串) 转为 epoch 秒，失败返回 NaN。"""
+    try:
+        return datetime.datetime.fromisoformat(str(value)).timestamp()
+    except (TypeError, ValueError):
+        return math.nan
+
+def _epoch_to_iso(epoch):
+    """epoch 秒转 ISO 字符串，NaN/None 返回 None。"""
+    if epoch is None or math.isnan(epoch):
+        return None
+    return datetime.datetime.fromtimestamp(epoch).isoformat()
+
+class DeviceStateCache:
+    """
+    按设备保存的最新状态表 (内存中)：
+    最新温度/湿度及其时间戳，以及每个雷达角度最新距离 (NumPy 数组，无效为 NaN)。
+    所有方法都是线程安全的。
+    """
+    def __init__(self, num_angles=RADAR_NUM_ANGLES):
+        self.num_angles = num_angles
+        self._lock = threading.Lock()
+        self._devices = {}  # device_id -> 状态字典
+
+    def _get_state(self, device_id):
+        """获取 (或创建) 设备的状态字典，调用方必须持有锁。"""
+        state = self._devices.get(device_id)
+        if state is None:
+            state = {
+                'temp': None, 'temp_ts': math.nan,
+                'humi': None, 'humi_ts': math.nan,
+                'radar': np.full(self.num_angles, np.nan),     # 每个角度的最新距离
+                'radar_ts': np.full(self.num_angles, np.nan),  # 每个角度的更新时间 (epoch 秒)
+            }
+            self._devices[device_id] = state
+        return state
+
+    def update_environment(self, device_id, sensor_type, value, timestamp_dt):
+        """更新设备的最新温度或湿度。比已保存的读数更旧的样本 (发件箱重放) 被忽略，返回 False。"""
+        ts = timestamp_dt.timestamp()
+        with self._lock:
+            state = self._get_state(device_id)
+            if ts < state[f'{sensor_type}_ts']:  # NaN 比较为 False，第一次总是写入
+                return False
+            state[sensor_type] = value
+            state[f'{sensor_type}_ts'] = ts
+            return True
+
+    def update_radar(self, device_id, angle, distance, timestamp_dt):
+        """更新设备某个雷达角度的最新距离 (distance 为 None 时记为 NaN)。比已保存的更旧的样本被忽略，返回 False。"""
+        if not (0 <= angle < self.num_angles):
+            return False
+        ts = timestamp_dt.timestamp()
+        with self._lock:
+            state = self._get_state(device_id)
+            if ts < state['radar_ts'][angle]:
+                return False
+            state['radar'][angle] = np.nan if distance is None else distance
+            state['radar_ts'][angle] = ts
+            return True
+
+    def get_radar_distances(self, device_id):
+        """返回设备雷达距离数组的副本，设备不存在时返回 None。"""
+        with self._lock:
+            state = self._devices.get(device_id)
+            return None if state is None else state['radar'].copy()
+
+    def to_dict(self, device_id=None):
+        """导出可 JSON 序列化的状态 (device_id 为 None 时导出所有设备)。"""
+        with self._lock:
+            if device_id is None:
+                items = list(self._devices.items())
+            elif device_id in self._devices:
+                items = [(device_id, self._devices[device_id])]
+            else:
+                items = []
+            result = {}
+            for dev, state in items:
+                radar_valid = ~np.isnan(state['radar'])
+                result[dev] = {
+                    'temp': state['temp'], 'temp_time': _epoch_to_iso(state['temp_ts']),
+                    'humi': state['humi'], 'humi_time': _epoch_to_iso(state['humi_ts']),
+                    # NaN 不是合法 JSON，转换为 null
+                    'radar': np.where(radar_valid, state['radar'], None).tolist(),
+                    'radar_time': np.where(np.isnan(state['radar_ts']), None, state['radar_ts']).tolist(),
+                }
+            return result
+
+    def load_dict(self, data):
+        """从 to_dict() 的输出恢复状态。"""
+        with self._lock:
+            for dev, saved in data.items():
+                state = self._get_state(dev)
+                for sensor_type in ('temp', 'humi'):
+                    state[sensor_type] = saved.get(sensor_type)
+                    ts = saved.get(f'{sensor_type}_time')
+                    state[f'{sensor_type}_ts'] = _parse_db_timestamp(ts) if ts else math.nan
+                for key, saved_key in (('radar', 'radar'), ('radar_ts', 'radar_time')):
+                    values = saved.get(saved_key) or []
+                    arr = np.array([np.nan if v is None else v for v in values[:self.num_angles]], dtype=float)
+                    state[key][:] = np.nan
+                    state[key][:len(arr)] = arr
+
+    def save_snapshot(self, path=STATE_SNAPSHOT_FILE):
+        """将状态原子地写入快照文件。成功返回 True。"""
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'saved_at': datetime.datetime.now().isoformat(), 'devices': self.to_dict()}, f)
+            os.replace(tmp_path, path)  # 原子替换，避免崩溃时留下半个文件
+            logging.debug(f"Device state snapshot saved to '{path}'.")
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            logging.error(f"Failed to save device state snapshot '{path}': {e}")
+            return False
+
+    def load_snapshot(self, path=STATE_SNAPSHOT_FILE):
+        """从快照文件恢复状态。成功返回 True，文件不存在或损坏返回 False。"""
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self.load_dict(snapshot.get('devices', {}))
+            logging.info(f"Device state warm-started from snapshot '{path}' (saved at {snapshot.get('saved_at')}).")
+            return True
+        except (OSError, ValueError, AttributeError) as e:
+            logging.error(f"Failed to load device state snapshot '{path}': {e}")
+            return False
+
+    def rebuild_from_db(self):
+        """冷启动：从数据库中每个设备/传感器/角度的最新一行重建状态。"""
+        env_rows = db_query(
+            'SELECT device_id, sensor_type, value, timestamp FROM environment_data '
+            'WHERE id IN (SELECT MAX(id) FROM environment_data GROUP BY device_id, sensor_type)')
+        radar_rows = db_query(
+            'SELECT device_id, angle, distance, timestamp FROM radar_data '
+            'WHERE id IN (SELECT MAX(id) FROM radar_data GROUP BY device_id, angle)')
+        with self._lock:
+            for dev, sensor_type, value, ts in env_rows or []:
+                state = self._get_state(dev)
+                state[sensor_type] = value
+                state[f'{sensor_type}_ts'] = _parse_db_timestamp(ts)
+            for dev, angle, distance, ts in radar_rows or []:
+                if 0 <= angle < self.num_angles:
+                    state = self._get_state(dev)
+                    state['radar'][angle] = np.nan if distance is None else distance
+                    state['radar_ts'][angle] = _parse_db_timestamp(ts)
+        logging.info(f"Device state rebuilt from DB ({len(env_rows or [])} env rows, {len(radar_rows or [])} radar rows).")
+
+device_state = DeviceStateCache()
+state_snapshot_stop = threading.Event()
+
+def state_snapshot_worker():
+    """后台线程：定期保存设备状态快照。"""
+    while not state_snapshot_stop.wait(STATE_SNAPSHOT_INTERVAL_S):
+        device_state.save_snapshot()
+
+# --- 最近历史环形缓冲区 ---
+class SampleRingBuffer:
+    """
+    固定容量、基于 NumPy 数组的环形缓冲区，保存最近 N 个样本。
+    每个样本 = 时间戳 (epoch 秒) + num_fields 个浮点值 (无效值为 NaN)。
+    样本不一定按时间顺序到达 (发件箱重放的旧数据带有原始采集时间)，查询结果会按时间排序。
+    调用方负责加锁。
+    """
+    def __init__(self, capacity, num_fields=1):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((capacity, num_fields), np.nan, dtype=np.float64)
+        self.head = 0   # 下一个写入位置
+        self.count = 0  # 当前有效样本数
+        self.first_timestamp = None          # 第一个写入样本的时间戳 (更早的数据只在数据库中)
+        self.evicted_max_timestamp = -math.inf  # 被覆盖样本的最大时间戳
+
+    def append(self, timestamp, *values):
+        """写入一个样本，缓冲区满时覆盖最旧写入的样本。"""
+        if self.count == self.capacity:
+            self.evicted_max_timestamp = max(self.evicted_max_timestamp, float(self.timestamps[self.head]))
+        elif self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.timestamps[self.head] = timestamp
+        self.values[self.head] = values
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def complete_after(self):
+        """
+        返回时间戳 T：时间戳晚于 T 的样本全部在缓冲区中 (它们写入数据库时也写入了缓冲区，且没有被覆盖)。
+        T 及更早的样本需要查询数据库。为空时返回 None。
+        """
+        if self.count == 0:
+            return None
+        return max(self.first_timestamp, self.evicted_max_timestamp)
+
+    def query(self, since_ts, until_ts=None):
+        """返回 [since_ts, until_ts] 范围内的样本 (按时间排序)：(时间戳数组, 值数组)。"""
+        order = (self.head - self.count + np.arange(self.count)) % self.capacity
+        ts = self.timestamps[order]
+        mask = ts >= since_ts
+        if until_ts is not None:
+            mask &= ts <= until_ts
+        order, ts = order[mask], ts[mask]
+        by_time = np.argsort(ts, kind='stable')
+        return ts[by_time], self.values[order[by_time]]
+
+    def nbytes(self):
+        return self.timestamps.nbytes + self.values.nbytes
+
+class RecentHistoryStore:
+    """按 (设备, 数据流) 管理环形缓冲区，回答最近时间窗口查询，较旧部分回退到 SQLite。"""
+    STREAM_FIELDS = {'temp': 1, 'humi': 1, 'radar': 2}  # radar 样本 = (角度, 距离)
+
+    def __init__(self, capacities=None):
+        self.capacities = dict(RING_BUFFER_CAPACITY if capacities is None else capacities)
+        self._lock = threading.Lock()
+        self._buffers = {}  # (device_id, stream) -> SampleRingBuffer
+
+    def append(self, device_id, stream, timestamp_dt, *values):
+        """追加一个样本 (值为 None 时记为 NaN)。"""
+        values = [np.nan if v is None else v for v in values]
+        with self._lock:
+            buf = self._buffers.get((device_id, stream))
+            if buf is None:
+                buf = SampleRingBuffer(self.capacities[stream], self.STREAM_FIELDS[stream])
+                self._buffers[(device_id, stream)] = buf
+            buf.append(timestamp_dt.timestamp(), *values)
+
+    def memory_bytes(self, device_id=None):
+        """返回缓冲区占用的字节数 (可只统计某个设备)。"""
+        with self._lock:
+            return sum(buf.nbytes() for (dev, _), buf in self._buffers.items()
+                       if device_id is None or dev == device_id)
+
+    def query(self, device_id, stream, since_ts, until_ts=None):
+        """
+        查询 [since_ts, until_ts] 的样本，返回 (时间戳数组, 值数组, 数据来源)。
+        缓冲区覆盖整个窗口时完全不访问数据库；否则只从 SQLite 读取缓冲区不完整的那一段，
+        与缓冲区中的样本合并后去掉重复 (重放的旧样本可能同时在两边)。
+        """
+        with self._lock:
+            buf = self._buffers.get((device_id, stream))
+            complete_after = buf.complete_after() if buf else None
+            if complete_after is not None:
+                mem_ts, mem_values = buf.query(since_ts, until_ts)
+        if complete_after is not None and complete_after < since_ts:
+            return mem_ts, mem_values, 'memory'
+
+        db_until = until_ts if complete_after is None else (
+            complete_after if until_ts is None else min(complete_after, until_ts))
+        db_ts, db_values = self._query_db(device_id, stream, since_ts, db_until)
+        if complete_after is None:
+            return db_ts, db_values, 'db'
+        ts, values = self._merge_unique(np.concatenate((db_ts, mem_ts)), np.concatenate((db_values, mem_values)))
+        return ts, values, 'memory+db'
+
+    @staticmethod
+    def _merge_unique(ts, values):
+        """按 (时间戳, 值) 排序并去掉完全相同的样本。"""
+        if len(ts) == 0:
+            return ts, values
+        order = np.lexsort(tuple(values[:, i] for i in range(values.shape[1] - 1, -1, -1)) + (ts,))
+        ts, values = ts[order], values[order]
+        same_values = (values[1:] == values[:-1]) | (np.isnan(values[1:]) & np.isnan(values[:-1]))
+        keep = np.ones(len(ts), dtype=bool)
+        keep[1:] = (ts[1:] != ts[:-1]) | ~same_values.all(axis=1)
+        return ts[keep], values[keep]
+
+    def _query_db(self, device_id, stream, since_ts, until_ts):
+        """从 SQLite 读取 [since_ts, until_ts] 的数据。"""
+        since_dt = datetime.datetime.fromtimestamp(since_ts)
+        until_dt = datetime.datetime.fromtimestamp(until_ts) if until_ts is not None else datetime.datetime.max
+        if stream == 'radar':
+            rows = db_query(
+                'SELECT timestamp, angle, distance FROM radar_data '
+                'WHERE device_id = ? AND timestamp >= ? AND timestamp <= ? ORDER BY timestamp',
+                (device_id, since_dt, until_dt))
+        else:
+            rows = db_query(
+                'SELECT timestamp, value FROM environment_data '
+                'WHERE device_id = ? AND sensor_type = ? AND timestamp >= ? AND timestamp <= ? ORDER BY timestamp',
+                (device_id, stream, since_dt, until_dt))
+        rows = rows or []
+        ts = np.array([_parse_db_timestamp(r[0]) for r in rows], dtype=np.float64)
+        values = np.array([[np.nan if v is None else v for v in r[1:]] for r in rows], dtype=np.float64)
+        return ts, values.reshape(len(rows), self.STREAM_FIELDS[stream])
+
+recent_history = RecentHistoryStore()
+
+# --- 服务器端雷达对象检测 ---
+_worker_processor = None  # 每个工作进程内复用的 DataProcessor
+
+def detect_sweep_objects(filtered_dists):
+    """
+    (在工作进程中运行) 对一次完整扫描的滤波距离做对象分割。
+    返回 [(起始角, 结束角, 质心角, 质心距离), ...]，角度单位为度。
+    """
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = DataProcessor(num_angles=len(filtered_dists))
+    _worker_processor.filtered_dists = np.asarray(filtered_dists, dtype=float)
+    return _sweep_object_rows(_worker_processor)
+
+def _sweep_object_rows(processor):
+    """对 processor 当前的滤波距离做对象分割，返回 detect_sweep_objects 格式的行。"""
+    angles_rad = np.arange(len(processor.filtered_dists)) * (np.pi / 180.0)
+    objects = processor.detect_objects(angles_rad)
+    # 检测结果是按字段的数组，一次性换算成度后再拼成行
+    start_deg, end_deg, center_deg = (np.rint(np.degrees(a)).astype(int).tolist()
+                                      for a in (objects.start_theta, objects.end_theta, objects.center_theta))
+    return list(zip(start_deg, end_deg, center_deg, objects.center_radius.tolist()))
+
+class RadarObjectDetector:
+    """
+    每个设备维护一个 DataProcessor 做滤波，并在检测到扫描方向反转 (一次扫描完成) 时
+    把该次扫描提交到进程池做对象分割 (没有进程池时在当前线程分割)，结果写入 radar_objects 表。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._devices = {}  # device_id -> {'processor', 'last_angle', 'direction', 'pending', 'objects'}
+        self._executor = None
+
+    def start(self, max_workers=RADAR_DETECTION_WORKERS):
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        logging.info(f"Radar object detection pool started ({max_workers or os.cpu_count()} workers).")
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def add_sample(self, device_id, angle, distance, timestamp_dt):
+        """处理一个雷达样本 (distance 为 None 表示无效)，必要时提交扫描检测任务。"""
+        dist_raw = radar_config.ARDUINO_INVALID_DIST_MARKER if distance is None else distance
+        sweep = inline_objects = executor = None
+        with self._lock:
+            dev = self._devices.get(device_id)
+            if dev is None:
+                dev = {'processor': DataProcessor(), 'last_angle': None, 'direction': 0,
+                       'pending': 0, 'objects': []}
+                self._devices[device_id] = dev
+            dev['processor'].process_new_data(angle, dist_raw)
+            last_angle = dev['last_angle']
+            dev['last_angle'] = angle
+            if last_angle is None or angle == last_angle:
+                return
+            direction = 1 if angle > last_angle else -1
+            # 方向反转说明上一次扫描已经完成
+            if dev['direction'] != 0 and direction != dev['direction']:
+                executor = self._executor
+                if executor is None:
+                    # 没有进程池 (未调用 start) 时直接在当前线程分割，向量化实现只需几十微秒
+                    inline_objects = _sweep_object_rows(dev['processor'])
+                elif dev['pending'] < RADAR_DETECTION_MAX_PENDING:
+                    dev['pending'] += 1
+                    sweep = dev['processor'].filtered_dists.copy()
+                else:
+                    logging.warning(f"Radar detection for {device_id} falling behind, dropping one sweep.")
+            dev['direction'] = direction
+        if inline_objects is not None:
+            self._store_objects(device_id, timestamp_dt, inline_objects)
+        elif sweep is not None:
+            try:
+                future = executor.submit(detect_sweep_objects, sweep)
+            except RuntimeError as e:  # 进程池已关闭 (服务器正在退出)
+                self._finish_pending(device_id)
+                logging.debug(f"Radar detection for {device_id} not submitted: {e}")
+                return
+            future.add_done_callback(lambda f: self._on_sweep_done(device_id, timestamp_dt, f))
+
+    def _finish_pending(self, device_id):
+        with self._lock:
+            if device_id in self._devices:
+                self._devices[device_id]['pending'] -= 1
+
+    def _on_sweep_done(self, device_id, sweep_dt, future):
+        """检测任务完成回调：释放排队名额，保存结果。"""
+        self._finish_pending(device_id)
+        if future.cancelled():
+            return
+        try:
+            objects = future.result()
+        except Exception as e:
+            logging.error(f"Radar object detection failed for {device_id}: {e}")
+            return
+        self._store_objects(device_id, sweep_dt, objects)
+
+    def _store_objects(self, device_id, sweep_dt, objects):
+        """保存设备最新的对象列表并写入数据库。"""
+        with self._lock:
+            if device_id in self._devices:
+                self._devices[device_id]['objects'] = objects
+        if objects and not db_executemany(
+            'INSERT INTO radar_objects (device_id, sweep_time, start_angle, end_angle, center_angle, distance) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [(device_id, sweep_dt, *obj) for obj in objects]
+        ):
+            logging.error(f"DB INSERT FAILED for radar objects from {device_id}.")
+        logging.debug(f"Radar sweep from {device_id}: {len(objects)} objects.")
+
+    def latest_objects(self, device_id):
+        """返回设备最近一次扫描检测到的对象列表。"""
+        with self._lock:
+            dev = self._devices.get(device_id)
+            return list(dev['objects']) if dev else []
+
+radar_detector = RadarObjectDetector()
+
+# --- 温湿度在线异常检测 ---
+class OnlineAnomalyDetector:
+    """
+    单个 (设备, 传感器) 的流式异常检测器，O(1) 时间/内存：
+    用 EWMA 维护均值和方差判定尖峰；flatline_s 不为 None 时，
+    读数在 flatline_tolerance 内保持不变超过 flatline_s 秒判定为卡死。
+    """
+    def __init__(self, min_std, alpha=ANOMALY_EWMA_ALPHA, spike_z=ANOMALY_SPIKE_Z,
+                 warmup=ANOMALY_WARMUP_SAMPLES, flatline_s=None, flatline_tolerance=0.0):
+        self.min_std = min_std
+        self.alpha = alpha
+        self.spike_z = spike_z
+        self.warmup = warmup
+        self.flatline_s = flatline_s
+        self.flatline_tolerance = flatline_tolerance
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.flat_value = None     # 当前不变段的第一个读数
+        self.flat_since = None     # 当前不变段开始的时间戳 (epoch 秒)
+        self.flatline_reported = False
+
+    def update(self, value, timestamp):
+        """
+        输入一个新值及其时间戳 (epoch 秒)，返回 (标记, 分数, 是否新异常)。
+        标记为 'spike'、'flatline' 或 None；卡死期间每个样本都带 'flatline' 标记，只有第一个是新异常。
+        """
+        flag, score, new = None, None, False
+        if self.flat_value is None or abs(value - self.flat_value) > self.flatline_tolerance:
+            self.flat_value, self.flat_since, self.flatline_reported = value, timestamp, False
+        elif self.flatline_s is not None and timestamp - self.flat_since >= self.flatline_s:
+            flag, score = 'flatline', timestamp - self.flat_since
+            new = not self.flatline_reported
+            self.flatline_reported = True
+
+        if self.count == 0:
+            self.mean = value
+        else:
+            # 用更新前的统计量计算 z 分数
+            diff = value - self.mean
+            z = abs(diff) / max(math.sqrt(self.var), self.min_std)
+            if self.count >= self.warmup and z > self.spike_z:
+                flag, score, new = 'spike', z, True
+            # EWMA 均值/方差增量更新
+            incr = self.alpha * diff
+            self.mean += incr
+            self.var = (1.0 - self.alpha) * (self.var + diff * incr)
+        self.count += 1
+        return flag, score, new
+
+class AnomalyRegistry:
+    """按 (设备, 传感器) 管理异常检测器。"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._detectors = {}
+
+    def update(self, device_id, sensor_type, value, timestamp):
+        with self._lock:
+            detector = self._detectors.get((device_id, sensor_type))
+            if detector is None:
+                detector = OnlineAnomalyDetector(ANOMALY_MIN_STD.get(sensor_type, 0.5),
+                                                 flatline_s=ANOMALY_FLATLINE_S.get(sensor_type),
+                                                 flatline_tolerance=ANOMALY_FLATLINE_TOLERANCE.get(sensor_type, 0.0))
+                self._detectors[(device_id, sensor_type)] = detector
+            return detector.update(value, timestamp)
+
+anomaly_detectors = AnomalyRegistry()
+
+def send_json_line(client_socket, data, device_id):
+    """将字典序列化为一行 JSON 发送给客户端。"""
+    try:
+        client_socket.sendall((json.dumps(data) + '\n').encode('utf-8'))
+    except socket.error:
+        logging.warning(f"Failed to send JSON response to {device_id} (socket error).")
+
 # --- 消息解析 ---
 def parse_message(data_str):
     """尝试将接收到的字符串解析为 JSON。"""
@@ -172,6 +747,14 @@ def handle_client_data(parsed_json_root, client_socket, client_address):
     elif data_type == 'heartbeat': # 假设客户端也可能发送心跳
          logging.info(f"Received heartbeat from {device_id}.")
          # try: client_socket.send(b"PONG_HEARTBEAT") except socket.error: pass
+    elif data_type == 'query_state':
+        handle_state_query(payload, device_id, client_socket)
+    elif data_type == 'query_history':
+        handle_history_query(payload, device_id, client_socket)
+    elif data_type == 'query_anomalies':
+        handle_anomaly_query(payload, device_id, client_socket)
+    elif data_type == 'query_diagnostics':
+        handle_diagnostics_query(payload, device_id, client_socket)
     else:
         logging.warning(f"Unknown data type '{data_type}' in payload from {device_id}.")
         try: client_socket.send(f"Error: Unknown payload type '{data_type}'".encode('utf-8'))
@@ -199,12 +782,25 @@ def handle_environment_data(payload_data, device_id, timestamp_dt, client_socket
             if math.isnan(value_float):
                 raise ValueError(f"{sensor_type} value is NaN")
 
+            # 入库时做流式异常检测，标记随数据行一起保存
+            anomaly_flag, anomaly_score, anomaly_new = anomaly_detectors.update(
+                device_id, sensor_type, value_float, timestamp_dt.timestamp())
+            # 卡死期间每一行都带标记，但异常表只在卡死开始时记录一次
+            if anomaly_new:
+                logging.warning(f"Anomaly '{anomaly_flag}' for {sensor_type} from {device_id}: {value_float} (score {anomaly_score:.1f})")
+                db_execute(
+                    'INSERT INTO environment_anomalies (device_id, sensor_type, flag, value, score, timestamp) VALUES (?, ?, ?, ?, ?, ?)',
+                    (device_id, sensor_type, anomaly_flag, value_float, anomaly_score, timestamp_dt)
+                )
+
             # 插入数据库
             if db_execute(
-                'INSERT INTO environment_data (device_id, sensor_type, value, unit, timestamp) VALUES (?, ?, ?, ?, ?)',
-                (device_id, sensor_type, value_float, unit, timestamp_dt)
+                'INSERT INTO environment_data (device_id, sensor_type, value, unit, timestamp, anomaly) VALUES (?, ?, ?, ?, ?, ?)',
+                (device_id, sensor_type, value_float, unit, timestamp_dt, anomaly_flag)
             ):
                 logging.info(f"DB INSERT OK: {sensor_type} from {device_id}: {value_float}{unit or ''} @ {timestamp_dt}")
+                device_state.update_environment(device_id, sensor_type, value_float, timestamp_dt)
+                recent_history.append(device_id, sensor_type, timestamp_dt, value_float)
                 response_msg = f"OK:{sensor_type}_recorded"
             else:
                 logging.error(f"DB INSERT FAILED for {sensor_type} from {device_id}.")
@@ -267,6 +863,9 @@ def handle_radar_data(payload_data, device_id, timestamp_dt, client_socket):
                 (device_id, angle_int, distance_val, timestamp_dt)
             ):
                 logging.info(f"DB INSERT OK: radar from {device_id}: A={angle_int}, D={distance_val if distance_val is not None else 'NULL'} @ {timestamp_dt}")
+                device_state.update_radar(device_id, angle_int, distance_val, timestamp_dt)
+                recent_history.append(device_id, 'radar', timestamp_dt, angle_int, distance_val)
+                radar_detector.add_sample(device_id, angle_int, distance_val, timestamp_dt)
                 response_msg = "OK:radar_recorded"
             else:
                 logging.error(f"DB INSERT FAILED for radar from {device_id}.")
@@ -285,6 +884,116 @@ def handle_radar_data(payload_data, device_id, timestamp_dt, client_socket):
     except socket.error:
         logging.warning(f"Failed to send response to {device_id} for radar data (socket error).")
 
+def handle_state_query(payload_data, device_id, client_socket):
+    """从内存状态表回答 "设备当前读数" 查询，不访问数据库。"""
+    # payload 可指定 'device' 查询其他设备；'device' 为 '*' 时返回所有设备
+    target = payload_data.get('device', device_id)
+    if not isinstance(target, str):
+        send_json_line(client_socket, {'type': 'error', 'error': 'Invalid device'}, device_id)
+        return
+    devices = device_state.to_dict(None if target == '*' else target)
+    for dev, state in devices.items():
+        # 最近一次扫描的对象: [起始角, 结束角, 中心角, 距离]
+        state['objects'] = [list(obj) for obj in radar_detector.latest_objects(dev)]
+    send_json_line(client_socket, {'type': 'state', 'device': target, 'devices': devices}, device_id)
+
+def handle_history_query(payload_data, device_id, client_socket):
+    """回答 "最近 N 秒" 历史查询：优先使用内存环形缓冲区，较旧部分回退到数据库。"""
+    stream = payload_data.get('stream')
+    target = payload_data.get('device', device_id)
+    if not isinstance(stream, str) or stream not in RecentHistoryStore.STREAM_FIELDS:
+        send_json_line(client_socket, {'type': 'error', 'error': f"Unknown history stream '{stream}'"}, device_id)
+        return
+    if not isinstance(target, str):
+        send_json_line(client_socket, {'type': 'error', 'error': 'Invalid device'}, device_id)
+        return
+    try:
+        seconds = float(payload_data.get('seconds', 300))
+    except (TypeError, ValueError):
+        seconds = math.nan
+    if not math.isfinite(seconds):
+        send_json_line(client_socket, {'type': 'error', 'error': 'Invalid seconds'}, device_id)
+        return
+    seconds = min(max(seconds, 0.0), HISTORY_MAX_QUERY_S)  # 限制回溯范围，避免 fromtimestamp 溢出
+    ts, values, source = recent_history.query(target, stream, time.time() - seconds)
+    if values.shape[1] == 1:
+        values = values[:, 0]  # 温湿度只有一个值，返回一维列表
+    send_json_line(client_socket, {
+        'type': 'history', 'device': target, 'stream': stream, 'source': source,
+        'timestamps': ts.tolist(),  # epoch 秒
+        'values': np.where(np.isnan(values), None, values).tolist(),
+    }, device_id)
+
+def handle_anomaly_query(payload_data, device_id, client_socket):
+    """回答 "时间范围内的异常" 查询，只读取 environment_anomalies 表，不扫描原始数据。"""
+    target = payload_data.get('device', device_id)
+    try:
+        # start/end 为 ISO 时间字符串，默认最近 24 小时
+        end_dt = datetime.datetime.fromisoformat(payload_data['end']) if payload_data.get('end') else datetime.datetime.now()
+        start_dt = datetime.datetime.fromisoformat(payload_data['start']) if payload_data.get('start') else end_dt - datetime.timedelta(days=1)
+    except (TypeError, ValueError):
+        send_json_line(client_socket, {'type': 'error', 'error': 'Invalid start/end timestamp'}, device_id)
+        return
+    sql = ('SELECT sensor_type, flag, value, score, timestamp FROM environment_anomalies '
+           'WHERE device_id = ? AND timestamp >= ? AND timestamp <= ?')
+    params = [target, start_dt, end_dt]
+    if payload_data.get('sensor') in ('temp', 'humi'):
+        sql += ' AND sensor_type = ?'
+        params.append(payload_data['sensor'])
+    rows = db_query(sql + ' ORDER BY timestamp', params)
+    if rows is None:
+        send_json_line(client_socket, {'type': 'error', 'error': 'DB query failed'}, device_id)
+        return
+    send_json_line(client_socket, {
+        'type': 'anomalies', 'device': target,
+        'anomalies': [{'sensor': r[0], 'flag': r[1], 'value': r[2], 'score': r[3], 'timestamp': r[4]} for r in rows],
+    }, device_id)
+
+
+# --- 运行诊断 (用于长时间运行的内存/资源漂移排查) ---
+def _read_rss_bytes():
+    """返回当前进程的常驻内存 (RSS) 字节数，无法获取时返回 None。"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def _count_open_fds():
+    """返回当前进程打开的文件描述符数量，无法获取时返回 None。"""
+    for fd_dir in ('/proc/self/fd', '/dev/fd'):
+        try:
+            return len(os.listdir(fd_dir))
+        except OSError:
+            continue
+    return None
+
+def handle_diagnostics_query(payload_data, device_id, client_socket):
+    """回答运行诊断查询，top 为返回的内存分配位置数 (限制在 0..DIAGNOSTICS_MAX_TOP)。"""
+    try:
+        top_n = int(payload_data.get('top', 10))
+    except (TypeError, ValueError):
+        send_json_line(client_socket, {'type': 'error', 'error': 'Invalid top'}, device_id)
+        return
+    send_json_line(client_socket, collect_diagnostics(min(max(top_n, 0), DIAGNOSTICS_MAX_TOP)), device_id)
+
+def collect_diagnostics(top_n=10):
+    """收集线程数、RSS、fd 数，以及 (若已启用 tracemalloc) 分配最多的代码位置。"""
+    diag = {
+        'type': 'diagnostics',
+        'time': time.time(),
+        'threads': threading.active_count(),
+        'rss_bytes': _read_rss_bytes(),
+        'open_fds': _count_open_fds(),
+    }
+    if tracemalloc.is_tracing():
+        diag['traced_bytes'] = tracemalloc.get_traced_memory()[0]
+        stats = tracemalloc.take_snapshot().statistics('lineno')[:top_n]
+        diag['top_allocations'] = [
+            {'where': str(stat.traceback[0]), 'size': stat.size, 'count': stat.count} for stat in stats
+        ]
+    return diag
+
 
 # --- 客户端处理线程 ---
 def client_handler(client_socket, client_address):
@@ -349,6 +1058,10 @@ def shutdown_server(signum, frame):
             server_socket.close()
         except Exception as e:
             logging.error(f"Error closing server socket: {e}")
+    # 停止快照线程并保存最后一次状态，下次启动可直接热启动
+    state_snapshot_stop.set()
+    radar_detector.shutdown()
+    device_state.save_snapshot()
     # Give threads some time to finish, then exit
     # This part can be more sophisticated depending on thread tasks
     logging.info("Waiting for active threads to complete (max 5s)...")
@@ -360,6 +1073,10 @@ def shutdown_server(signum, frame):
 def main():
     global server_socket
     init_db()
+    if not device_state.load_snapshot():
+        device_state.rebuild_from_db()
+    threading.Thread(target=state_snapshot_worker, name="StateSnapshot", daemon=True).start()
+    radar_detector.start()
 
     signal.signal(signal.SIGINT, shutdown_server)
     signal.signal(signal.SIGTERM, shutdown_server)
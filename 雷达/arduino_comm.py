@@ -1,13 +1,11 @@
 # arduino_comm.py
 # 处理与 Arduino 雷达设备的串口通信。
 
-import glob  # 用于查找串口 (Linux/Mac)
-import sys  # 用于平台判断
-import time  # 用于延时
-
 import serial  # 导入 pyserial 库
 
 from . import config
+from .command_writer import CommandWriter
+from .port_discovery import candidate_ports, discover_arduino
 
 
 class ArduinoConnection:
@@ -19,34 +17,12 @@ class ArduinoConnection:
         self.timeout = timeout          # 读取超时
         self.port = None                # 连接的端口名
         self.is_started = False         # 是否已接收到 Arduino 的启动信号
-        self.last_command_sent = {}     # 记录上次发送的指令，避免重复发送
+        self.command_writer = None      # 参数命令写入线程 (连接后创建)，负责合并、限速和应答跟踪
+        self._replay_lines = []         # 查找端口握手期间收到的行，第一次读取时处理
 
     def find_port(self):
-        """搜索可能连接着 Arduino 的可用串口。"""
-        # 根据操作系统类型确定查找串口的方式
-        if sys.platform.startswith('win'): # Windows
-            ports = ['COM{0:1.0f}'.format(ii) for ii in range(1,256)]
-        elif sys.platform.startswith('linux') or sys.platform.startswith('cygwin'): # Linux 或 Cygwin
-            ports = glob.glob('/dev/tty[A-Za-z]*')
-        elif sys.platform.startswith('darwin'): # macOS
-            ports = glob.glob('/dev/tty.*')
-        else:
-            # 如果是不支持的系统，则抛出环境错误
-            raise EnvironmentError('当前操作系统不支持 pyserial 自动搜索端口。')
-
-        arduinos = []
-        for p in ports:
-            # 尝试排除常见的非 Arduino 串口，如蓝牙
-            if 'Bluetooth' in p or 'Wireless' in p: continue
-            try:
-                # 尝试打开和关闭串口以检查其有效性
-                s = serial.Serial(p)
-                s.close()
-                arduinos.append(p) # 如果成功，则添加到列表中
-            except (OSError, serial.SerialException):
-                # 如果打开失败，则忽略这个端口
-                pass
-        return arduinos # 返回找到的可能端口列表
+        """按 USB VID/PID 列出可能连接着 Arduino 的串口 (不打开设备)。"""
+        return [p.device for p in candidate_ports()]
 
     def connect(self, selected_port=None):
         """建立到 Arduino 的串口连接。"""
@@ -55,42 +31,30 @@ class ArduinoConnection:
             print("已经连接。")
             return True
 
-        # 如果用户指定了端口，则使用指定的端口
-        if selected_port:
-            self.port = selected_port
-        else:
-            # 否则，自动搜索端口
-            available_ports = self.find_port()
-            if not available_ports:
-                print("错误：未找到可用的 Arduino 端口。")
-                return False
-            self.port = available_ports[0] # 默认使用找到的第一个端口
-            print(f"找到可用端口: {available_ports}")
-
-        print(f"尝试连接端口: {self.port}")
-        try:
-            # 创建 Serial 对象并打开端口
-            self.ser = serial.Serial(self.port, self.baud_rate, timeout=self.timeout)
-            # 清空输入和输出缓冲区，防止旧数据干扰
-            self.ser.flushInput()
-            self.ser.flushOutput()
-            print(f"成功连接到 {self.port}")
-            # 短暂等待，让 Arduino 可能完成重置并发送初始数据
-            time.sleep(2)
-            return True
-        except serial.SerialException as e:
-            # 捕获串口特定错误
-            print(f"错误：无法打开串口 {self.port}: {e}")
-            self.ser = None # 连接失败，重置 serial 对象
-            return False
-        except Exception as e:
-            # 捕获其他可能的连接错误
-            print(f"连接串口时发生错误: {e}")
-            self.ser = None
+        # 指定端口时只探测该端口；否则先试缓存的端口，再并行探测所有候选端口
+        print(f"尝试连接端口: {selected_port}" if selected_port else "正在查找 Arduino 端口...")
+        found = discover_arduino(selected_port, baud_rate=self.baud_rate, timeout=self.timeout)
+        if not found:
+            print("错误：未找到应答 PING? 的 Arduino 端口。")
             return False
+        self.ser = found.serial
+        self.port = found.device
+        print(f"成功连接到 {self.port} (握手耗时 {found.elapsed_s * 1000:.0f} ms)")
+        # 握手期间收到的行 (可能包含启动信号) 在第一次 read_data 时处理
+        self._replay_lines = list(found.lines)
+        if config.START_SIGNAL not in self._replay_lines:
+            # 板子没有复位 (例如 USB 原生串口的板子)：固件已应答 PONG!，视为已启动
+            self._replay_lines.append(config.START_SIGNAL)
+        self.command_writer = CommandWriter(self._write_raw)
+        self.command_writer.start()
+        return True
 
     def disconnect(self):
         """关闭串口连接。"""
+        if self.command_writer:
+            # 串口即将关闭，未发出的参数命令直接丢弃
+            self.command_writer.stop(flush=False)
+            self.command_writer = None
         if self.ser and self.ser.is_open:
             try:
                 self.ser.close()
@@ -99,7 +63,6 @@ class ArduinoConnection:
                 print(f"关闭串口时发生错误: {e}")
         self.ser = None         # 重置 serial 对象
         self.is_started = False # 重置启动状态
-        self.last_command_sent.clear() # 清空指令发送历史
 
     def is_connected(self):
         """检查串口连接是否处于活动状态。"""
@@ -114,13 +77,15 @@ class ArduinoConnection:
         status_message = None # 用于存储特殊状态信息 (如 "STARTED", "DISCONNECTED")
 
         try:
+            lines, self._replay_lines = self._replay_lines, []
             # 检查输入缓冲区是否有数据
             if self.ser.in_waiting > 0:
                 # 读取所有可用字节，并尝试解码为 UTF-8 字符串
                 all_incoming = self.ser.read_all().decode('utf-8', errors='ignore')
                 # 按换行符分割成多行
-                lines = all_incoming.strip().split('\n')
+                lines += all_incoming.strip().split('\n')
 
+            if lines:
                 for line in lines:
                     line = line.strip() # 去除单行首尾空白
                     if not line: continue # 跳过空行
@@ -131,7 +96,7 @@ class ArduinoConnection:
                             self.is_started = True
                             status_message = "STARTED" # 设置状态为已启动
                             print("接收到雷达启动信号。")
-                            self.last_command_sent.clear() # 清空指令历史，允许发送初始参数
+                            self.command_writer.reset() # Arduino 参数已回到默认值，允许重新发送初始参数
                         else:
                             # 在启动前忽略其他数据
                             # print(f"等待启动信号，收到: {line}") # 调试信息
@@ -140,7 +105,7 @@ class ArduinoConnection:
                         # 启动后，检查是否是 Arduino 的响应信息
                         if line.startswith("OK ") or line.startswith("ERR "):
                              print(f"Arduino 响应: {line}") # 打印响应信息
-                             # 可以考虑将此响应信息也作为状态返回
+                             self.command_writer.handle_response(line) # 记录参数是否被接受
                         elif ',' in line: # 如果包含逗号，假定为数据行
                             lines_data.append(line)
                         # else: # 启动后忽略无法识别的行
@@ -161,27 +126,21 @@ class ArduinoConnection:
         return status_message, lines_data
 
     def send_command(self, cmd_prefix, value):
-        """向 Arduino 发送指令，避免发送冗余指令。"""
-        if not self.is_connected():
+        """向 Arduino 发送参数指令 (如 'A', 120)。
+        只交给写入线程：同一前缀在发出前被新值覆盖，与已生效的值相同则不发送。"""
+        if not self.is_connected() or not self.command_writer:
             print("错误：无法发送指令，串口未连接。")
             return False
+        self.command_writer.submit(cmd_prefix, int(value))
+        return True
 
-        command_key = cmd_prefix # 使用指令前缀 (如 'A', 'a') 作为键
-        value = int(value)       # 确保值为整数，便于比较和发送
-
-        # 检查是否与上次发送的该指令的值相同
-        if command_key in self.last_command_sent and self.last_command_sent[command_key] == value:
-            return True # 值未改变，无需发送
-
-        # 格式化指令字符串 (例如 "A120\n")
-        command = f"{cmd_prefix}{value}\n"
+    def _write_raw(self, data):
+        """(写入线程) 写入一条已编码的指令。"""
         try:
-            # 将指令编码为 UTF-8 字节并发送
-            self.ser.write(command.encode('utf-8'))
-            print(f"已发送指令: {command.strip()}")
-            self.last_command_sent[command_key] = value # 更新发送历史
+            self.ser.write(data)
+            print(f"已发送指令: {data.decode('ascii').strip()}")
             return True
         except Exception as e:
-            print(f"发送指令 {command.strip()} 时发生错误: {e}")
+            print(f"发送指令 {data.decode('ascii').strip()} 时发生错误: {e}")
             # 考虑此错误是否意味着连接断开
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,182 @@
+# command_writer.py
+# 雷达参数命令 (A/a/S/D) 的后台写入线程。
+# 拖动滑块会连续产生大量中间值：同一前缀只保留最新值 (后值覆盖前值)，
+# 命令之间至少间隔 min_gap_s，同一前缀在收到 OK/ERR 应答 (或超时) 前不再发送下一条。
+
+import re
+import threading
+import time
+
+from . import config
+
+# Arduino 对参数命令的应答: "OK A120" / "ERR a200"
+ACK_PATTERN = re.compile(r'^(OK|ERR) ([A-Za-z])(-?\d+)$')
+
+
+class CommandWriter:
+    """
+    合并并限速发送参数命令，跟踪 Arduino 实际接受的参数值。
+    write(bytes) -> bool 由调用方提供 (需自行与其他串口写入互斥)，在写入线程上调用。
+    读取方把收到的每一行交给 handle_response()，应答会从 in-flight 状态转为 applied/rejected。
+    """
+    def __init__(self, write, min_gap_s=config.COMMAND_MIN_GAP_S, ack_timeout_s=config.COMMAND_ACK_TIMEOUT_S,
+                 on_ack=None, clock=time.monotonic):
+        self._write = write
+        self.min_gap_s = min_gap_s
+        self.ack_timeout_s = ack_timeout_s
+        self.on_ack = on_ack            # on_ack(前缀, 值, 是否接受, 应答延迟ms)，在调用 handle_response 的线程上调用
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._pending = {}              # 前缀 -> 等待发送的最新值
+        self._in_flight = {}            # 前缀 -> (已发送的值, 发送时间)
+        self._applied = {}              # 前缀 -> Arduino 应答 OK 的值
+        self._rejected = {}             # 前缀 -> 最近一次应答 ERR 的值
+        self._last_write = None
+        self._wait_s = None
+        self._running = False
+        self._thread = None
+        self._ack_latencies_ms = []
+        self.submitted = 0              # submit() 调用次数
+        self.coalesced = 0              # 被更新的值覆盖、没有发出的命令数
+        self.skipped = 0                # 与已生效的值相同而省略的命令数
+        self.sent = 0
+        self.failed = 0
+        self.acked = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="CommandWriter", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush=True, timeout=1.0):
+        """停止写入线程。flush=True 时先发完等待中的命令 (最多等待 timeout 秒)。"""
+        with self._cond:
+            self._running = False
+            if not flush:
+                self._pending.clear()
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, prefix, value):
+        """(任意线程) 请求把参数 prefix 设为 value，不阻塞。"""
+        with self._cond:
+            if prefix in self._pending:
+                self.coalesced += 1
+            self._pending[prefix] = int(value)
+            self.submitted += 1
+            self._cond.notify()
+
+    def handle_response(self, line):
+        """(读取线程) 处理 Arduino 的一行输出。是本写入器在等待的参数应答时返回 True。"""
+        line = line.strip()
+        if line == config.START_SIGNAL:
+            self.reset()  # Arduino 重启后参数回到固件默认值
+            return False
+        match = ACK_PATTERN.match(line)
+        if not match:
+            return False
+        status, prefix, value = match.group(1), match.group(2), int(match.group(3))
+        with self._cond:
+            flight = self._in_flight.get(prefix)
+            if flight is None or flight[0] != value:
+                return False  # 不是本写入器发出的命令，或者已经超时
+            del self._in_flight[prefix]
+            latency_ms = (self._clock() - flight[1]) * 1000.0
+            self._ack_latencies_ms.append(latency_ms)
+            del self._ack_latencies_ms[:-256]
+            accepted = status == 'OK'
+            if accepted:
+                self._applied[prefix] = value
+                self._rejected.pop(prefix, None)
+                self.acked += 1
+            else:
+                self._rejected[prefix] = value
+                self.rejected += 1
+            self._cond.notify()
+        if self.on_ack:
+            self.on_ack(prefix, value, accepted, latency_ms)
+        return True
+
+    def reset(self):
+        """忘记已生效和在途的参数 (重新连接或 Arduino 重启后调用)，等待中的命令保留。"""
+        with self._cond:
+            self._applied.clear()
+            self._rejected.clear()
+            self._in_flight.clear()
+            self._cond.notify()
+
+    def applied(self):
+        """返回 {前缀: Arduino 已接受的值}。"""
+        with self._cond:
+            return dict(self._applied)
+
+    def stats(self):
+        with self._cond:
+            latencies = sorted(self._ack_latencies_ms)
+            return {
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'skipped': self.skipped,
+                'sent': self.sent,
+                'failed': self.failed,
+                'acked': self.acked,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'pending': len(self._pending),
+                'applied': dict(self._applied),
+                'ack_ms': {'p50': latencies[len(latencies) // 2], 'max': latencies[-1]} if latencies else None,
+            }
+
+    def _next_command(self):
+        """(持有锁) 返回下一条可以立即发送的 (前缀, 值)；没有时返回 None 并设置 self._wait_s。"""
+        now = self._clock()
+        for prefix, (_, sent_at) in list(self._in_flight.items()):
+            if now - sent_at >= self.ack_timeout_s:
+                del self._in_flight[prefix]
+                self.timeouts += 1
+        ready = None
+        for prefix, value in list(self._pending.items()):
+            if prefix in self._in_flight:
+                continue  # 等待上一条同前缀命令的应答
+            if self._applied.get(prefix) == value:
+                del self._pending[prefix]
+                self.skipped += 1
+                continue
+            ready = prefix
+            break
+        if ready is None:
+            # 只剩等待应答的前缀时，最迟在最早的那条超时时醒来
+            blocked = [sent_at for prefix, (_, sent_at) in self._in_flight.items() if prefix in self._pending]
+            self._wait_s = max(0.0, min(blocked) + self.ack_timeout_s - now) if blocked else None
+            return None
+        if self._last_write is not None and now - self._last_write < self.min_gap_s:
+            self._wait_s = self._last_write + self.min_gap_s - now
+            return None
+        return ready, self._pending.pop(ready)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                command = self._next_command()
+                while command is None:
+                    if not self._running and not self._pending:
+                        return
+                    self._cond.wait(self._wait_s)
+                    command = self._next_command()
+            prefix, value = command
+            ok = self._write(f"{prefix}{value}\n".encode('ascii'))
+            with self._cond:
+                now = self._clock()
+                self._last_write = now
+                if ok:
+                    self._in_flight[prefix] = (value, now)
+                    self.sent += 1
+                else:
+                    self.failed += 1
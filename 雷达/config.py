@@ -24,11 +24,33 @@ INITIAL_ALPHA = 1.0     # 新探测点的初始透明度 (用于拖尾效果)
 ALPHA_DECAY_RATE = 0.08 # 每个更新周期透明度的衰减量 (越大衰减越快)
 OBJECT_MIN_POINTS = 3   # 识别为对象所需得最少连续点数
 OBJECT_MAX_GAP = 2      # 对象内部允许的最大连续无效点数量（以角度步长计）
+OBJECT_MAX_RANGE_JUMP = 10.0    # 相邻有效点距离差超过此值 (厘米) 时分成两个对象
+OBJECT_CLUSTER_DISTANCE = None  # 设为数值 (厘米) 时改为按笛卡尔坐标中相邻点的间距分割，代替距离差判断
 
 # --- Arduino 通信 ---
 BAUD_RATE = 115200                # 串口波特率
 SERIAL_TIMEOUT_S = 1              # 串口读取超时时间 (秒)
 START_SIGNAL = "Radar Start"      # Arduino 启动完成时发送的信号
+COMMAND_MIN_GAP_S = 0.02          # 两条参数命令之间的最小间隔 (秒)，给 Arduino 的串口解析留出时间
+COMMAND_ACK_TIMEOUT_S = 0.5       # 参数命令等待 OK/ERR 应答的时间，超时后同一前缀可以再次发送
+
+# --- 串口查找 ---
+# 常见 Arduino / USB 转串口芯片的 (VID, PID)，PID 为 None 表示该厂商的所有产品
+ARDUINO_USB_IDS = [
+    (0x2341, None),    # Arduino SA
+    (0x2A03, None),    # Arduino.org
+    (0x1A86, 0x7523),  # CH340
+    (0x0403, 0x6001),  # FTDI FT232R
+    (0x10C4, 0xEA60),  # Silicon Labs CP210x
+]
+PORT_KEYWORDS = ['CH340', 'Arduino', 'ttyACM', 'ttyUSB']  # 没有 VID/PID 匹配时按描述/设备名查找
+PROBE_COMMAND = "PING?"           # 握手命令，固件应答 PROBE_REPLY
+PROBE_REPLY = "PONG!"
+PROBE_TIMEOUT_S = 2.5             # 单个端口的握手时限 (打开串口会让 Uno 复位，bootloader 约需 1.5 秒)
+PROBE_RESEND_INTERVAL_S = 0.1     # 未收到应答时重发 PING? 的间隔
+PROBE_READ_TIMEOUT_S = 0.05       # 握手期间的串口读/写超时
+PROBE_MAX_WORKERS = 8             # 并行探测的最大端口数
+PORT_CACHE_FILE = "arduino_port_cache.json"  # 按板子序列号记录上次成功的端口
 # Arduino 发送的表示无效/超范围距离的标记值
 # 必须与 Arduino 代码中的 INVALID_DISTANCE_MARKER 匹配
 ARDUINO_INVALID_DIST_MARKER = R_MAX + 1.0
@@ -1,13 +1,39 @@
 # data_processor.py
 # 包含处理原始雷达数据的功能。
 
-from collections import deque  # 用于实现固定长度队列（滤波历史）
+from collections import namedtuple
 
 import numpy as np  # 用于数值计算和 NaN 处理
 
 from . import config
 
 
+class RadarObjects(namedtuple('RadarObjects', ['start_theta', 'end_theta', 'center_theta', 'center_radius',
+                                               'width', 'min_range', 'point_count'])):
+    """
+    一次检测出的所有对象，每个字段是长度为对象数的数组 (下标 i 对应第 i 个对象，按角度从小到大)：
+    start_theta / end_theta 为角度范围 (弧度)；center_theta / center_radius 为有效点笛卡尔质心的极坐标；
+    width 为首尾两点间的直线距离 (厘米)；min_range 为最近点的距离；point_count 为有效点数。
+    """
+    __slots__ = ()
+
+    @classmethod
+    def empty(cls):
+        return cls(*(np.empty(0, dtype=np.intp if field == 'point_count' else float) for field in cls._fields))
+
+    @property
+    def count(self):
+        """对象个数 (注意 len() 返回的是字段数)。"""
+        return len(self.center_theta)
+
+
+def _readonly_view(array):
+    """返回不复制数据的只读视图，防止调用方意外修改内部状态。"""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
 class DataProcessor:
     """处理雷达数据的过滤和对象检测。"""
 
@@ -16,22 +42,38 @@ class DataProcessor:
         self.num_angles = num_angles          # 雷达扫描的角度数量 (0-180度，共181个点)
         self.filter_window = filter_window    # 滤波窗口大小
         # 初始化数据结构
-        # 滤波历史：一个列表，每个元素是对应角度的 deque (双端队列)
-        self.filter_history = [deque(maxlen=self.filter_window) for _ in range(num_angles)]
+        # 滤波历史：(角度数, 窗口) 的二维环形缓冲，NaN 表示无效读数或尚无数据
+        self.filter_history = np.full((num_angles, filter_window), np.nan)
+        self._filter_pos = np.zeros(num_angles, dtype=np.intp)    # 每个角度下一次写入的列
+        self._filter_sum = np.zeros(num_angles)                   # 每个角度窗口内有效值之和
+        self._filter_count = np.zeros(num_angles, dtype=np.intp)  # 每个角度窗口内有效值个数
         # 存储滤波后的最新距离值，初始全部为 NaN
         self.filtered_dists = np.full((num_angles,), np.nan)
-        # 活动点列表：存储用于拖尾效果的点信息
-        self.active_points = [] # 每个元素是字典: {'theta': 弧度, 'radius': 距离, 'alpha': 透明度}
-        # 识别出的对象列表：存储识别出的对象信息
-        self.identified_objects = [] # 每个元素是字典: {'center_theta': 弧度, 'center_radius': 距离}
+        # 活动点 (用于拖尾效果)：按角度直接索引的结构数组 (SoA)，预分配 float32，更新为 O(1)
+        # 每个角度最多一个点；point_valid 为 False 的位置透明度保持为 0
+        self.point_theta = (np.arange(num_angles) * (np.pi / 180.0)).astype(np.float32) # 角度 (弧度)，固定不变
+        self.point_radius = np.zeros(num_angles, dtype=np.float32) # 距离 (滤波后)
+        self.point_alpha = np.zeros(num_angles, dtype=np.float32)  # 透明度
+        self.point_valid = np.zeros(num_angles, dtype=bool)        # 该角度是否有活动点
+        # 供绘图使用的只读视图，与上面的数组共享内存，只需创建一次
+        self._plot_views = tuple(_readonly_view(a) for a in (self.point_theta, self.point_radius, self.point_alpha))
+        # 识别出的对象 (RadarObjects，各字段为数组)
+        self.identified_objects = RadarObjects.empty()
+        # 对象检测用的三角函数表，按 detect_objects 传入的角度数组缓存
+        self._trig_angles = np.arange(num_angles) * (np.pi / 180.0)
+        self._cos_table = np.cos(self._trig_angles)
+        self._sin_table = np.sin(self._trig_angles)
 
     def reset(self):
         """重置所有存储的数据（例如，当雷达重新启动时）。"""
         self.filtered_dists.fill(np.nan) # 重置滤波距离
-        self.active_points.clear()       # 清空活动点
-        self.identified_objects.clear()  # 清空已识别对象
-        for history_deque in self.filter_history: # 清空所有角度的滤波历史
-            history_deque.clear()
+        self.point_alpha.fill(0.0)       # 清空活动点
+        self.point_valid.fill(False)
+        self.identified_objects = RadarObjects.empty() # 清空已识别对象
+        self.filter_history.fill(np.nan) # 清空所有角度的滤波历史
+        self._filter_pos.fill(0)
+        self._filter_sum.fill(0.0)
+        self._filter_count.fill(0)
         print("数据处理器已重置。")
 
     def process_new_data(self, angle_deg, dist_raw):
@@ -49,132 +91,190 @@ class DataProcessor:
             dist_processed = dist_raw # 有效距离直接使用
 
         # --- 应用移动平均滤波 ---
-        # 将当前处理后的距离（可能是 NaN）加入对应角度的历史队列
-        self.filter_history[angle_deg].append(dist_processed)
-        # 从历史队列中筛选出有效的（非 NaN）距离值
-        valid_history = [d for d in self.filter_history[angle_deg] if not np.isnan(d)]
-        # 如果历史中有有效值，计算其平均值作为滤波结果
-        if valid_history:
-            filtered_dist = np.mean(valid_history)
-            self.filtered_dists[angle_deg] = filtered_dist # 更新存储的滤波距离
-        else:
-            # 如果历史中全是 NaN，则滤波结果也是 NaN
-            filtered_dist = np.nan
-            self.filtered_dists[angle_deg] = np.nan
-
-        # --- 更新活动点列表 (用于拖尾效果) ---
-        angle_rad = angle_deg * (np.pi / 180.0) # 将角度转换为弧度
-        found = False
-        # 遍历当前活动点列表
-        for point in self.active_points:
-            # 检查是否存在对应角度的点（允许非常小的角度误差）
-            if abs(point['theta'] - angle_rad) < 0.01:
-                # 如果找到了对应角度的点
-                if not np.isnan(filtered_dist): # 并且当前滤波后的距离有效
-                    point['radius'] = filtered_dist      # 更新点的距离
-                    point['alpha'] = config.INITIAL_ALPHA # 重置点的透明度 (使其完全不透明)
-                # else: # 如果当前距离无效，则不更新，让该点自然衰减
-                found = True # 标记已找到
-                break        # 跳出循环
-
-        # 如果列表中没有找到该角度的点，并且当前滤波距离有效
-        if not found and not np.isnan(filtered_dist):
-            # 添加一个新的活动点
-            self.active_points.append({
-                'theta': angle_rad,          # 角度 (弧度)
-                'radius': filtered_dist,     # 距离 (滤波后)
-                'alpha': config.INITIAL_ALPHA # 初始透明度
-            })
+        # 用新值覆盖环形缓冲中最旧的值，并同步更新该角度的有效值之和与个数
+        pos = self._filter_pos[angle_deg]
+        oldest = self.filter_history[angle_deg, pos]
+        total = self._filter_sum[angle_deg]
+        count = self._filter_count[angle_deg]
+        if not np.isnan(oldest):
+            total -= oldest
+            count -= 1
+        if not np.isnan(dist_processed):
+            total += dist_processed
+            count += 1
+        if count == 0:
+            total = 0.0 # 窗口内没有有效值时归零，避免浮点误差累积
+        self.filter_history[angle_deg, pos] = dist_processed
+        self._filter_pos[angle_deg] = (pos + 1) % self.filter_window
+        self._filter_sum[angle_deg] = total
+        self._filter_count[angle_deg] = count
+        # 窗口内有有效值时取平均值，否则滤波结果为 NaN
+        filtered_dist = total / count if count else np.nan
+        self.filtered_dists[angle_deg] = filtered_dist # 更新存储的滤波距离
+
+        # --- 更新活动点 (用于拖尾效果) ---
+        # 当前滤波距离有效时，该角度的点更新距离并重置为完全不透明；
+        # 无效时不更新，已有的点自然衰减
+        if not np.isnan(filtered_dist):
+            self.point_radius[angle_deg] = filtered_dist
+            self.point_alpha[angle_deg] = config.INITIAL_ALPHA
+            self.point_valid[angle_deg] = True
 
         return filtered_dist # 返回当前角度的滤波后距离
 
+    def process_batch(self, angles_deg, dists_raw):
+        """
+        一次处理一批数据点 (按到达顺序)，结果与逐个调用 process_new_data 相同。
+        返回每个点的滤波后距离 (角度无效的点为 NaN)。
+        同一角度在批内出现多次时，每个点的滤波窗口由该角度之前的历史和批内更早的点组成。
+        """
+        angles = np.asarray(angles_deg, dtype=np.intp)
+        dists = np.asarray(dists_raw, dtype=float)
+        result = np.full(len(angles), np.nan)
+        in_range = (angles >= 0) & (angles <= 180)
+        if not in_range.any():
+            return result
+        index = np.flatnonzero(in_range)
+        # 无效距离标记和非正值处理为 NaN
+        values = dists[index]
+        values[(values >= config.ARDUINO_INVALID_DIST_MARKER) | (values <= 0)] = np.nan
+
+        # 按角度稳定排序：同一角度的点连续排列，且保持到达顺序
+        order = np.argsort(angles[index], kind='stable')
+        index, a_sorted, v_sorted = index[order], angles[index][order], values[order]
+        group_angles, starts, counts = np.unique(a_sorted, return_index=True, return_counts=True)
+        rank = np.arange(len(a_sorted)) - np.repeat(starts, counts) # 点在本角度批内的序号
+
+        # 每个点的窗口: 偏移 o (0 为自身) 在批内时取批内的值，否则取历史中第 (o - rank) 新的值
+        window = self.filter_window
+        offsets = np.arange(window)
+        back = rank[:, None] - offsets[None, :]
+        from_batch = back >= 0
+        batch_index = np.where(from_batch, np.repeat(starts, counts)[:, None] + back, 0)
+        history_col = (self._filter_pos[a_sorted][:, None] + back) % window # back < 0 时向前回溯
+        windows = np.where(from_batch, v_sorted[batch_index],
+                           self.filter_history[a_sorted[:, None], history_col])
+        valid_counts = np.count_nonzero(~np.isnan(windows), axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            filtered = np.where(valid_counts > 0, np.nansum(windows, axis=1) / valid_counts, np.nan)
+        result[index] = filtered
+
+        # 更新历史：每个角度只需写入批内最后 window 个点
+        keep = rank >= np.repeat(counts, counts) - window
+        columns = (self._filter_pos[a_sorted] + rank) % window
+        self.filter_history[a_sorted[keep], columns[keep]] = v_sorted[keep]
+        self._filter_pos[group_angles] = (self._filter_pos[group_angles] + counts) % window
+        # 重新计算受影响角度的和与个数 (同时消除逐点更新累积的浮点误差)
+        rows = self.filter_history[group_angles]
+        self._filter_count[group_angles] = np.count_nonzero(~np.isnan(rows), axis=1)
+        self._filter_sum[group_angles] = np.nansum(rows, axis=1)
+        last = starts + counts - 1 # 每个角度批内最后一个点
+        self.filtered_dists[group_angles] = filtered[last]
+
+        # 更新活动点：每个角度取批内最后一个滤波结果有效的点
+        has_value = ~np.isnan(filtered)
+        if has_value.any():
+            valid_angles, valid_values = a_sorted[has_value], filtered[has_value]
+            last_valid = np.flatnonzero(np.r_[valid_angles[1:] != valid_angles[:-1], True])
+            self.point_radius[valid_angles[last_valid]] = valid_values[last_valid]
+            self.point_alpha[valid_angles[last_valid]] = config.INITIAL_ALPHA
+            self.point_valid[valid_angles[last_valid]] = True
+        return result
+
     def update_fade_effect(self):
-        """更新活动点的透明度，并移除已完全褪色的点。"""
-        next_active_points = [] # 用于存储下一轮仍然活动的点
-        for point in self.active_points:
-            point['alpha'] -= config.ALPHA_DECAY_RATE # 减少透明度
-            # 如果透明度仍然大于一个很小的值（避免浮点数精度问题），则保留该点
-            if point['alpha'] > 0.01:
-                next_active_points.append(point)
-        self.active_points = next_active_points # 更新活动点列表
+        """更新活动点的透明度，并移除已完全褪色的点 (原地向量化运算，不分配新数组)。"""
+        np.subtract(self.point_alpha, config.ALPHA_DECAY_RATE, out=self.point_alpha) # 减少透明度
+        # 透明度仍然大于一个很小的值（避免浮点数精度问题）的点保留，其余清零
+        np.greater(self.point_alpha, 0.01, out=self.point_valid)
+        self.point_alpha *= self.point_valid
 
     def detect_objects(self, angles_rad):
-        """根据最新地滤波距离数据检测对象。"""
+        """根据最新地滤波距离数据检测对象，返回 RadarObjects。"""
         # 调用内部的识别逻辑函数
         self.identified_objects = self._find_objects_internal(
             angles_rad,                   # 角度数组 (弧度)
             self.filtered_dists,          # 当前滤波后的距离数组
             config.OBJECT_MIN_POINTS,     # 配置中定义的最小点数
-            config.OBJECT_MAX_GAP         # 配置中定义的最大允许间隙
+            config.OBJECT_MAX_GAP,        # 配置中定义的最大允许间隙
+            max_range_jump=config.OBJECT_MAX_RANGE_JUMP,
+            cluster_distance=config.OBJECT_CLUSTER_DISTANCE
+        )
+        return self.identified_objects # 返回识别出的对象
+
+    def _trig_tables(self, angles_rad):
+        """返回 angles_rad 对应的 (cos, sin) 表；与上次的角度数组相同时直接复用。"""
+        if len(angles_rad) != len(self._trig_angles) or not np.array_equal(angles_rad, self._trig_angles):
+            self._trig_angles = np.array(angles_rad, dtype=float)
+            self._cos_table = np.cos(self._trig_angles)
+            self._sin_table = np.sin(self._trig_angles)
+        return self._cos_table, self._sin_table
+
+    def _find_objects_internal(self, angles_rad, distances, min_points, max_gap,
+                               max_range_jump=None, cluster_distance=None):
+        """
+        向量化分割连续的有效距离段。
+        相邻两个有效点之间在以下情况下断开：
+          - 中间的无效点 (NaN) 超过 max_gap 个 (对有效点下标做 np.diff 得到游程间隔)
+          - cluster_distance 为 None 时：距离差超过 max_range_jump (为 None 时不按距离差分割)
+          - cluster_distance 不为 None 时：两点在笛卡尔坐标中的间距超过 cluster_distance
+        段的角度跨度 (含间隙) 至少 min_points 个角度步长才认为是对象。
+        """
+        angles_rad = np.asarray(angles_rad, dtype=float)
+        distances = np.asarray(distances, dtype=float)
+        valid_index = np.flatnonzero(~np.isnan(distances)) # 所有有效点的下标
+        if len(valid_index) == 0:
+            return RadarObjects.empty()
+        cos_table, sin_table = self._trig_tables(angles_rad)
+        dists = distances[valid_index]
+        xs = dists * cos_table[valid_index]
+        ys = dists * sin_table[valid_index]
+
+        # 找出相邻有效点之间的断点
+        breaks = np.diff(valid_index) - 1 > max_gap
+        if cluster_distance is not None:
+            breaks |= np.hypot(np.diff(xs), np.diff(ys)) > cluster_distance
+        elif max_range_jump is not None:
+            breaks |= np.abs(np.diff(dists)) > max_range_jump
+
+        # 每段第一个和最后一个有效点 (在 valid_index 中的位置)；各段恰好划分所有有效点，可直接按段归约
+        first = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+        last = np.concatenate((first[1:] - 1, [len(valid_index) - 1]))
+        counts = last - first + 1
+        sum_x = np.add.reduceat(xs, first)
+        sum_y = np.add.reduceat(ys, first)
+        min_range = np.minimum.reduceat(dists, first)
+
+        start_idx, end_idx = valid_index[first], valid_index[last]
+        keep = end_idx - start_idx + 1 >= min_points
+        center_x, center_y = sum_x[keep] / counts[keep], sum_y[keep] / counts[keep]
+        first, last = first[keep], last[keep]
+        return RadarObjects(
+            start_theta=angles_rad[start_idx[keep]],
+            end_theta=angles_rad[end_idx[keep]],
+            center_theta=np.arctan2(center_y, center_x),
+            center_radius=np.hypot(center_x, center_y),
+            width=np.hypot(xs[last] - xs[first], ys[last] - ys[first]),
+            min_range=min_range[keep],
+            point_count=counts[keep],
         )
-        return self.identified_objects # 返回识别出的对象列表
-
-    def _find_objects_internal(self, angles_rad, distances, min_points, max_gap):
-        """查找连续有效距离段的内部逻辑。"""
-        objects = []             # 存储找到的对象
-        in_segment = False       # 当前是否在有效段内
-        segment_start_idx = -1   # 当前有效段的起始索引
-        gap_count = 0            # 当前连续无效点的计数
-
-        # 在距离数组末尾添加一个 NaN，以确保最后一个有效段能被正确处理
-        padded_distances = np.append(distances, np.nan)
-
-        # 遍历（包含填充NaN的）距离数组
-        for i in range(len(padded_distances)):
-            # 检查当前点是否有效（非 NaN）
-            is_valid = not np.isnan(padded_distances[i])
-
-            if is_valid:
-                gap_count = 0 # 如果有效，重置间隙计数
-                if not in_segment: # 如果之前不在段内，说明新段开始
-                    in_segment = True
-                    segment_start_idx = i
-            else: # 当前点无效
-                if in_segment: # 如果之前在段内
-                    gap_count += 1 # 增加间隙计数
-                    # 如果间隙超过允许值，或者到达数组末尾，则结束当前段
-                    if gap_count > max_gap or i == len(padded_distances) - 1:
-                        # 计算段的结束索引（不包括导致结束的无效点）
-                        segment_end_idx = i - gap_count
-                        # 检查段的长度是否满足最小点数要求
-                        if (segment_end_idx - segment_start_idx + 1) >= min_points:
-                            # 如果满足，认为是一个对象
-                            # 计算对象中心（简单取段的中间索引）
-                            center_idx = segment_start_idx + (segment_end_idx - segment_start_idx) // 2
-                            # 再次确认中心点的距离值是有效的
-                            if 0 <= center_idx <= segment_end_idx and not np.isnan(distances[center_idx]):
-                                # 添加对象信息到列表
-                                objects.append({
-                                    'center_theta': angles_rad[center_idx], # 中心角度
-                                    'center_radius': distances[center_idx], # 中心距离
-                                    'start_theta': angles_rad[segment_start_idx], # 起始角度
-                                    'end_theta': angles_rad[segment_end_idx]   # 结束角度
-                                })
-                        # 重置段追踪状态
-                        in_segment = False
-                        segment_start_idx = -1
-                        gap_count = 0
-        return objects # 返回找到的对象列表
 
     def get_plot_data_fade(self):
-        """返回用于绘制拖尾效果散点图的数据。"""
-        if not self.active_points: # 如果没有活动点
+        """
+        返回用于绘制拖尾效果散点图的数据 (角度, 半径, 透明度, 颜色)。
+        返回的是内部数组的只读视图 (不复制)，覆盖所有角度，没有活动点的位置透明度为 0；
+        视图在下一次 process_new_data / update_fade_effect 时会变化，需要保留时请自行复制。
+        """
+        if not self.point_valid.any(): # 如果没有活动点
             return [], [], [], []  # 返回空列表
-        # 从 active_points 列表中提取角度、半径、透明度和颜色数据
-        thetas = np.array([p['theta'] for p in self.active_points])
-        radii = np.array([p['radius'] for p in self.active_points])
-        alphas = np.array([p['alpha'] for p in self.active_points])
+        thetas, radii, alphas = self._plot_views
         colors = radii # 使用半径（距离）作为颜色映射的依据
         return thetas, radii, alphas, colors
 
     def get_plot_data_objects(self):
-        """返回用于绘制对象标记的数据。"""
-        if not self.identified_objects: # 如果没有识别出对象
+        """返回用于绘制对象标记的数据 (对象中心的角度和半径数组)。"""
+        if self.identified_objects.count == 0: # 如果没有识别出对象
             return [], []             # 返回空列表
-        # 从 identified_objects 列表中提取中心角度和半径
-        thetas = np.array([obj['center_theta'] for obj in self.identified_objects])
-        radii = np.array([obj['center_radius'] for obj in self.identified_objects])
-        return thetas, radii
+        return self.identified_objects.center_theta, self.identified_objects.center_radius
 
     def get_filtered_data_for_saving(self):
          """返回适合保存到文件的当前过滤后的数据。"""
@@ -1,13 +1,12 @@
 # gui_manager.py
 # 管理 GUI 元素（按钮、滑块）及其回调函数。
-import time
-
 import matplotlib.pyplot as plt        # 主要用于创建 Axes 对象
 from matplotlib.widgets import Button, Slider # 导入按钮和滑块控件
 from . import config
 
 
 # 注意：这个模块不直接导入 arduino_comm，而是通过初始化时传入连接对象
+# 滑块回调只把新值交给连接对象的写入线程 (见 command_writer.py)，拖动时不会阻塞界面
 
 class GuiManager:
     """创建和管理 GUI 控件，并将它们连接到相应的动作。"""
@@ -136,11 +135,8 @@ class GuiManager:
     def set_initial_arduino_params(self):
          """将当前滑块的初始值发送给 Arduino。"""
          print("正在发送初始参数给 Arduino...")
-         # 依次发送每个参数，中间加少量延迟确保 Arduino 能处理
+         # 写入线程会按最小间隔依次发出，这里不需要等待
          self._update_min_angle(self.slider_min_angle.val)
-         time.sleep(0.1)
          self._update_max_angle(self.slider_max_angle.val)
-         time.sleep(0.1)
          self._update_scan_step(self.slider_scan_step.val)
-         time.sleep(0.1)
          self._update_scan_delay(self.slider_scan_delay.val)
\ No newline at end of file
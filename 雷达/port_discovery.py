@@ -0,0 +1,174 @@
+# port_discovery.py
+# 快速查找 Arduino 串口：
+#   1. 按 USB VID/PID (serial.tools.list_ports 的元数据) 过滤候选端口，不逐个打开 /dev/tty*
+#   2. 上次成功的端口按板子序列号缓存，先单独探测 (设备名变化时也能找到)
+#   3. 其余候选并行探测，发送 PING? 并等待 PONG!，第一个应答的端口胜出
+# 握手成功即说明固件已在运行，调用方不需要再固定 sleep 等待复位。
+
+import datetime
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import serial
+import serial.tools.list_ports
+
+from . import config
+
+# serial: 已打开并完成握手的 Serial 对象；lines: 握手期间收到的其他行 (如启动信息)，调用方可按需重放
+DiscoveredPort = namedtuple('DiscoveredPort', ['device', 'serial', 'serial_number', 'lines', 'elapsed_s'])
+
+
+def candidate_ports(usb_ids=config.ARDUINO_USB_IDS, keywords=config.PORT_KEYWORDS):
+    """返回可能是 Arduino 的端口 (ListPortInfo 列表)，不打开设备。
+    优先按 VID/PID 匹配；一个都没有时退回按描述和设备名中的关键字匹配。"""
+    ports = serial.tools.list_ports.comports()
+    matched = [p for p in ports
+               if p.vid is not None and any(p.vid == vid and pid in (None, p.pid) for vid, pid in usb_ids)]
+    if matched:
+        return matched
+    return [p for p in ports
+            if any(k.lower() in (p.description or "").lower() or k.lower() in (p.device or "").lower()
+                   for k in keywords)]
+
+
+def probe_port(device, baud_rate=config.BAUD_RATE, timeout=config.SERIAL_TIMEOUT_S,
+               probe_timeout_s=config.PROBE_TIMEOUT_S, cancel=None):
+    """打开 device，反复发送 PING? 直到收到 PONG!。
+    成功返回 (Serial, 其他行)，Serial 的读超时恢复为 timeout；失败、超时或 cancel 被设置时关闭端口并返回 None。"""
+    start = time.monotonic()
+    try:
+        ser = serial.Serial(device, baud_rate, timeout=config.PROBE_READ_TIMEOUT_S,
+                            write_timeout=config.PROBE_READ_TIMEOUT_S)
+    except (OSError, serial.SerialException, ValueError):
+        return None
+    if cancel and cancel.is_set():
+        ser.close()  # 打开期间已经有其他端口胜出
+        return None
+    lines, buffer, next_ping = [], b'', 0.0
+    try:
+        while time.monotonic() - start < probe_timeout_s and not (cancel and cancel.is_set()):
+            now = time.monotonic()
+            if now >= next_ping:
+                # 板子复位期间 bootloader 不会应答，按间隔重发直到固件开始处理命令
+                ser.write(f"{config.PROBE_COMMAND}\n".encode('ascii'))
+                next_ping = now + config.PROBE_RESEND_INTERVAL_S
+            buffer += ser.read(ser.in_waiting or 1)
+            while b'\n' in buffer:
+                raw, buffer = buffer.split(b'\n', 1)
+                line = raw.decode('utf-8', errors='ignore').strip()
+                if line == config.PROBE_REPLY:
+                    ser.timeout = timeout
+                    ser.write_timeout = None
+                    return ser, lines
+                if line:
+                    lines.append(line)
+    except (OSError, serial.SerialException):
+        pass
+    ser.close()
+    return None
+
+
+def _cache_key(port):
+    """缓存键：有序列号时用序列号 (换 USB 口后设备名会变)，否则退回设备名。"""
+    return port.serial_number or f"device:{port.device}"
+
+
+def load_port_cache(cache_file=config.PORT_CACHE_FILE):
+    try:
+        with open(cache_file, encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_port_cache(cache, cache_file=config.PORT_CACHE_FILE):
+    """原子写入缓存文件，失败时忽略 (缓存只影响查找速度)。"""
+    try:
+        temp_file = f"{cache_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, cache_file)
+    except OSError as e:
+        print(f"警告：无法写入串口缓存 {cache_file}: {e}")
+
+
+def _probe_parallel(devices, baud_rate, timeout, probe_timeout_s):
+    """并行探测 devices，返回第一个握手成功的 (设备名, Serial, 其他行)，都失败时返回 None。
+    胜出后不等待其余探测 (某些设备的 open() 会阻塞)，它们稍后成功时由回调关闭。"""
+    if not devices:
+        return None
+    cancel = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=min(len(devices), config.PROBE_MAX_WORKERS),
+                                  thread_name_prefix="PortProbe")
+    futures = {executor.submit(probe_port, device, baud_rate, timeout, probe_timeout_s, cancel): device
+               for device in devices}
+
+    def close_late(future):
+        result = None if future.cancelled() or future.exception() else future.result()
+        if result:
+            result[0].close()
+
+    winner = None
+    try:
+        for future in as_completed(futures):
+            result = future.result()
+            if result:
+                winner = (futures[future],) + result
+                break
+    finally:
+        cancel.set()
+        for future in futures:
+            if winner is None or futures[future] != winner[0]:
+                future.add_done_callback(close_late)
+        executor.shutdown(wait=False, cancel_futures=True)
+    return winner
+
+
+def discover_arduino(preferred_port=None, baud_rate=config.BAUD_RATE, timeout=config.SERIAL_TIMEOUT_S,
+                     probe_timeout_s=config.PROBE_TIMEOUT_S, cache_file=config.PORT_CACHE_FILE):
+    """
+    查找并打开 Arduino 串口，返回 DiscoveredPort，找不到时返回 None。
+    preferred_port 不为空时只探测该端口 (例如环境变量 ARDUINO_PORT 指定的虚拟串口)。
+    """
+    start = time.monotonic()
+    if preferred_port:
+        result = probe_port(preferred_port, baud_rate, timeout, probe_timeout_s)
+        if not result:
+            return None
+        return DiscoveredPort(preferred_port, result[0], None, result[1], time.monotonic() - start)
+
+    ports = candidate_ports()
+    cache = load_port_cache(cache_file)
+    by_device = {p.device: p for p in ports}
+    # 缓存命中的端口按上次成功时间从新到旧单独探测，通常第一个就能握手成功
+    cached = sorted((p for p in ports if _cache_key(p) in cache),
+                    key=lambda p: cache[_cache_key(p)].get('last_seen', ''), reverse=True)
+    found = None
+    for port in cached:
+        result = probe_port(port.device, baud_rate, timeout, probe_timeout_s)
+        if result:
+            found = (port.device,) + result
+            break
+    if not found:
+        cached_devices = {p.device for p in cached}
+        found = _probe_parallel([p.device for p in ports if p.device not in cached_devices],
+                                baud_rate, timeout, probe_timeout_s)
+    if not found:
+        return None
+
+    device, ser, lines = found
+    port = by_device[device]
+    cache[_cache_key(port)] = {
+        'device': device,
+        'vid': port.vid,
+        'pid': port.pid,
+        'description': port.description,
+        'last_seen': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    save_port_cache(cache, cache_file)
+    return DiscoveredPort(device, ser, port.serial_number, lines, time.monotonic() - start)